@@ -1,71 +1,221 @@
 # kalk/ast_nodes.py
 
+import operator
+from collections.abc import MutableMapping
+from functools import partial
+
+from .numfmt import format_value
+
+BIN_OPS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.floordiv,
+    "%": operator.mod,
+}
+
+CMP_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+# tipurile care pot fi declarate la CITESTE: "CITESTE n : INTREG"
+INPUT_KINDS = ("INTREG", "REAL", "TEXT")
+
+
+def coerce(value, kind, var):
+    """Converteste o valoare citita la tipul declarat; None = nicio conversie."""
+    if kind is None:
+        return value
+    try:
+        if kind == "TEXT":
+            return str(value)
+        if kind == "REAL":
+            return float(value)
+        if type(value) is int:
+            return value
+        if isinstance(value, str):
+            value = value.strip()
+            if value.lstrip("+-").isdigit():
+                return int(value)
+            value = float(value)
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+    except (TypeError, ValueError):
+        pass
+    raise Exception(f"Valoare invalida pentru {var}: {value!r} (se astepta {kind})")
+
+
+class Memory(MutableMapping):
+    """Vedere nume -> valoare peste sloturile unui Context (pentru GUI)."""
+    __slots__ = ("ctx",)
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def __getitem__(self, name):
+        return self.ctx.slots[self.ctx.names[name]]
+
+    def get(self, name, default=None):
+        idx = self.ctx.names.get(name)
+        return default if idx is None else self.ctx.slots[idx]
+
+    def __setitem__(self, name, value):
+        self.ctx.slots[self.ctx.slot(name)] = value
+
+    def __delitem__(self, name):
+        raise TypeError("Variabilele nu pot fi sterse")
+
+    def __iter__(self):
+        return iter(self.ctx.names)
+
+    def __len__(self):
+        return len(self.ctx.names)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def no_input():
+    raise Exception("Nu există provider de input")
+
+
 class Context:
-    def __init__(self, input_provider=None):
-        self.mem = {}
-        self.output = []
-        self.input_provider = input_provider
+    def __init__(self, input_provider=None, channel=None, output=None):
+        self.names = {}   # nume -> slot
+        self.slots = []   # valorile variabilelor, indexate dupa slot
+        self.mem = Memory(self)
+        # orice obiect cu append(linie) (sinks.py); implicit o lista
+        self.output = output if output is not None else []
+        self.readers = {}   # variabila -> functie fara argumente pentru CITESTE
+        # un canal (channels.py) are prioritate fata de input_provider(var)
+        self._channel = channel
+        self._input_provider = input_provider
+        # meter.Meter pentru rularile masurate (pasi, oprire din alt fir)
+        self.meter = None
+
+    @property
+    def input_provider(self):
+        return self._input_provider
+
+    @input_provider.setter
+    def input_provider(self, provider):
+        self._input_provider = provider
+        self.readers = {}
+
+    @property
+    def channel(self):
+        return self._channel
+
+    @channel.setter
+    def channel(self, channel):
+        self._channel = channel
+        self.readers = {}
+
+    def reader(self, var):
+        """Functia care da urmatoarea valoare citita pentru var (ceruta o data per variabila)."""
+        r = self.readers.get(var)
+        if r is None:
+            if self._channel is not None:
+                r = self._channel.reader(var)
+            elif self._input_provider is not None:
+                r = partial(self._input_provider, var)
+            else:
+                r = no_input
+            self.readers[var] = r
+        return r
+
+    def read(self, var):
+        return self.reader(var)()
+
+    def slot(self, name):
+        idx = self.names.get(name)
+        if idx is None:
+            idx = self.names[name] = len(self.slots)
+            self.slots.append(0)
+        return idx
+
+    def bind(self, symbols):
+        """Aliniaza sloturile cu tabela de simboluri a unui program rezolvat."""
+        common = min(len(self.names), len(symbols))
+        if list(self.names)[:common] != symbols[:common]:
+            # alta ordine: renumerotam, pastrand valorile deja existente
+            old = dict(self.mem)
+            self.names = {}
+            self.slots = []
+            for name in symbols:
+                self.slot(name)
+            for name, value in old.items():
+                self.slots[self.slot(name)] = value
+            return
+        for name in symbols[common:]:
+            self.slot(name)
 
 # -------- EXPRESSII --------
 
 class Expr:
+    __slots__ = ()
+    # adancimea arborelui; folosita de modul "stack" din Engine
+    depth = 1
+
     def eval(self, ctx):
         raise NotImplementedError
 
 class Number(Expr):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def eval(self, ctx):
         return self.value
 
 class Variable(Expr):
+    __slots__ = ("name",)
     def __init__(self, name):
         self.name = name
     def eval(self, ctx):
         return ctx.mem.get(self.name, 0)
 
 class BinExpr(Expr):
+    __slots__ = ("op", "left", "right", "depth")
     def __init__(self, op, left, right):
         self.op = op
         self.left = left
         self.right = right
+        self.depth = max(left.depth, right.depth) + 1
     def eval(self, ctx):
-        a, b = self.left.eval(ctx), self.right.eval(ctx)
-        return {
-            "+": a + b,
-            "-": a - b,
-            "*": a * b,
-            "/": a // b,
-            "%": a % b
-        }[self.op]
+        return BIN_OPS[self.op](self.left.eval(ctx), self.right.eval(ctx))
 
 # -------- CONDITII --------
 
 class Condition:
+    __slots__ = ()
+    depth = 1
+
     def eval(self, ctx):
         raise NotImplementedError
 
 class CompareCond(Condition):
+    __slots__ = ("op", "left", "right", "depth")
     def __init__(self, op, left, right):
         self.op = op
         self.left = left
         self.right = right
+        self.depth = max(left.depth, right.depth) + 1
     def eval(self, ctx):
-        a, b = self.left.eval(ctx), self.right.eval(ctx)
-        return {
-            "==": a == b,
-            "!=": a != b,
-            "<": a < b,
-            "<=": a <= b,
-            ">": a > b,
-            ">=": a >= b
-        }[self.op]
+        return CMP_OPS[self.op](self.left.eval(ctx), self.right.eval(ctx))
 
 class LogicalCond(Condition):
+    __slots__ = ("op", "left", "right", "depth")
     def __init__(self, op, left, right):
         self.op = op
         self.left = left
         self.right = right
+        self.depth = max(left.depth, right.depth) + 1
     def eval(self, ctx):
         if self.op == "SI":
             return self.left.eval(ctx) and self.right.eval(ctx)
@@ -74,53 +224,178 @@ class LogicalCond(Condition):
 # -------- INSTRUCTIUNI --------
 
 class Instr:
+    # linia din sursa (de la 1) pe care incepe instructiunea; 0 daca nu se stie
+    __slots__ = ("line",)
+    # adancimea expresiei evaluate direct de instructiune
+    depth = 0
+
     def exec(self, ctx):
         raise NotImplementedError
 
 class InputInstr(Instr):
-    def __init__(self, var):
+    __slots__ = ("var", "kind")
+    def __init__(self, var, kind=None, line=0):
         self.var = var
+        self.kind = kind   # tipul declarat (din INPUT_KINDS) sau None
+        self.line = line
 
     def exec(self, ctx):
-        if ctx.input_provider is None:
-            raise Exception("Nu există provider de input")
-        ctx.mem[self.var] = ctx.input_provider(self.var)
+        ctx.mem[self.var] = coerce(ctx.read(self.var), self.kind, self.var)
 
 class DeclInstr(Instr):
-    def __init__(self, var, expr):
+    __slots__ = ("var", "expr", "depth")
+    def __init__(self, var, expr, line=0):
         self.var = var
         self.expr = expr
+        self.depth = expr.depth
+        self.line = line
     def exec(self, ctx):
         ctx.mem[self.var] = self.expr.eval(ctx)
 
 class AssignInstr(Instr):
-    def __init__(self, var, expr):
+    __slots__ = ("var", "expr", "depth")
+    def __init__(self, var, expr, line=0):
         self.var = var
         self.expr = expr
+        self.depth = expr.depth
+        self.line = line
     def exec(self, ctx):
         ctx.mem[self.var] = self.expr.eval(ctx)
 
 class OutputInstr(Instr):
-    def __init__(self, expr):
+    __slots__ = ("expr", "depth")
+    def __init__(self, expr, line=0):
         self.expr = expr
+        self.depth = expr.depth
+        self.line = line
     def exec(self, ctx):
-        ctx.output.append(str(self.expr.eval(ctx)))
+        ctx.output.append(format_value(self.expr.eval(ctx)))
 
 class IfInstr(Instr):
-    def __init__(self, cond, then_body, else_body):
+    __slots__ = ("cond", "then_body", "else_body")
+    def __init__(self, cond, then_body, else_body, line=0):
         self.cond = cond
         self.then_body = then_body
         self.else_body = else_body
+        self.line = line
     def exec(self, ctx):
         body = self.then_body if self.cond.eval(ctx) else self.else_body
         for instr in body:
             instr.exec(ctx)
 
 class WhileInstr(Instr):
-    def __init__(self, cond, body):
+    __slots__ = ("cond", "body")
+    def __init__(self, cond, body, line=0):
         self.cond = cond
         self.body = body
+        self.line = line
     def exec(self, ctx):
         while self.cond.eval(ctx):
             for instr in self.body:
                 instr.exec(ctx)
+
+# -------- NODURI REZOLVATE --------
+# produse de resolver.resolve: un nod per operator si variabile pe sloturi
+
+class SlotVar(Variable):
+    __slots__ = ("slot",)
+    def __init__(self, name, slot):
+        self.name = name
+        self.slot = slot
+    def eval(self, ctx):
+        return ctx.slots[self.slot]
+
+class Add(BinExpr):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) + self.right.eval(ctx)
+
+class Sub(BinExpr):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) - self.right.eval(ctx)
+
+class Mul(BinExpr):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) * self.right.eval(ctx)
+
+class Div(BinExpr):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) // self.right.eval(ctx)
+
+class Mod(BinExpr):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) % self.right.eval(ctx)
+
+class Eq(CompareCond):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) == self.right.eval(ctx)
+
+class Ne(CompareCond):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) != self.right.eval(ctx)
+
+class Lt(CompareCond):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) < self.right.eval(ctx)
+
+class Le(CompareCond):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) <= self.right.eval(ctx)
+
+class Gt(CompareCond):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) > self.right.eval(ctx)
+
+class Ge(CompareCond):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) >= self.right.eval(ctx)
+
+class And(LogicalCond):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) and self.right.eval(ctx)
+
+class Or(LogicalCond):
+    __slots__ = ()
+    def eval(self, ctx):
+        return self.left.eval(ctx) or self.right.eval(ctx)
+
+class SlotInput(InputInstr):
+    __slots__ = ("slot",)
+    def __init__(self, var, slot, kind=None, line=0):
+        super().__init__(var, kind, line)
+        self.slot = slot
+    def exec(self, ctx):
+        ctx.slots[self.slot] = coerce(ctx.read(self.var), self.kind, self.var)
+
+class SlotDecl(DeclInstr):
+    __slots__ = ("slot",)
+    def __init__(self, var, expr, slot, line=0):
+        super().__init__(var, expr, line)
+        self.slot = slot
+    def exec(self, ctx):
+        ctx.slots[self.slot] = self.expr.eval(ctx)
+
+class SlotAssign(AssignInstr):
+    __slots__ = ("slot",)
+    def __init__(self, var, expr, slot, line=0):
+        super().__init__(var, expr, line)
+        self.slot = slot
+    def exec(self, ctx):
+        ctx.slots[self.slot] = self.expr.eval(ctx)
+
+NODES = {
+    "+": Add, "-": Sub, "*": Mul, "/": Div, "%": Mod,
+    "==": Eq, "!=": Ne, "<": Lt, "<=": Le, ">": Gt, ">=": Ge,
+    "SI": And, "SAU": Or,
+}
@@ -0,0 +1,72 @@
+# kalk/background.py
+#
+# Rularea unui program intr-un fir de fundal, pentru interfete care nu au voie
+# sa se blocheze (GUI). Firul interfetei:
+#   - citeste iesirea pe masura ce apare, din RingSink-ul din ctx.output;
+#   - vede pasii executati in ctx.meter.steps;
+#   - raspunde la CITESTE prin answer() (cererea vine prin on_input(var));
+#   - opreste rularea cu stop().
+#
+#     run = BackgroundRun(engine, text, ctx, on_done=..., on_input=...)
+#     run.start()
+
+import queue
+import threading
+
+from .meter import Meter, Stopped
+
+# raspunsul pus in coada de stop(), daca firul asteapta o valoare
+CANCELLED = object()
+
+
+class BackgroundRun(threading.Thread):
+    """Ruleaza engine.run_source(text, ctx) intr-un fir separat.
+
+    on_done(eroare sau None) si on_input(var) sunt apelate din firul rularii;
+    in GUI sunt emit-uri de Signal, deci ajung pe firul interfetei.
+    """
+
+    def __init__(self, engine, text, ctx, on_done=None, on_input=None):
+        super().__init__(name="kalk-run", daemon=True)
+        self.engine = engine
+        self.text = text
+        self.ctx = ctx
+        self.on_done = on_done
+        self.on_input = on_input
+        self.answers = queue.SimpleQueue()
+        if ctx.meter is None:
+            ctx.meter = Meter()
+        if on_input is not None:
+            ctx.input_provider = self.ask
+
+    @property
+    def steps(self):
+        return self.ctx.meter.steps
+
+    def run(self):
+        error = None
+        try:
+            self.engine.run_source(self.text, self.ctx)
+        except Exception as e:
+            error = e
+        if self.on_done is not None:
+            self.on_done(error)
+
+    def ask(self, var=None):
+        # CITESTE: cererea pleaca spre interfata, firul asteapta raspunsul
+        self.on_input(var)
+        value = self.answers.get()
+        if value is CANCELLED:
+            raise Stopped("Executie oprita")
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def answer(self, value):
+        """Valoarea pentru CITESTE-ul in asteptare; o exceptie e ridicata in
+        firul rularii (ex. dialog anulat)."""
+        self.answers.put(value)
+
+    def stop(self):
+        self.ctx.meter.stop()
+        self.answers.put(CANCELLED)
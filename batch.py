@@ -0,0 +1,257 @@
+# kalk/batch.py
+#
+# Executia aceluiasi program pe multe intrari deodata, cu NumPy. Fiecare
+# variabila e un vector cu cate o valoare pe "banda" (o intrare); DACA si
+# CATTIMP lucreaza cu masti de benzi active, deci o bucla se repeta cat
+# timp mai exista o banda care nu a terminat-o. SCRIE e colectat pe banda.
+#
+# Aritmetica merge pe int64 cu detectie de depasire; la prima depasire
+# lotul e reluat pe vectori de obiecte (int-uri Python, fara limita). O
+# eroare (ex. impartire la zero) opreste doar banda ei.
+
+try:
+    import numpy as np
+except ImportError:  # dependinta optionala
+    np = None
+
+from .ast_nodes import *
+from .resolver import Program, resolve
+from .engine import Engine
+from .numfmt import format_value
+from . import optimizer
+
+INT64_MIN = -2 ** 63
+# un produs peste aceasta limita (calculat in float) poate depasi int64
+MUL_LIMIT = 2.0 ** 62
+# o bucla cu mai putin de 1/COMPACT benzi active continua pe un lot
+# restrans doar la ele
+COMPACT = 4
+MIN_COMPACT = 256
+
+
+class Overflow(Exception):
+    pass
+
+
+class BatchResult:
+    __slots__ = ("outputs", "errors")
+
+    def __init__(self, outputs, errors):
+        self.outputs = outputs   # lista de linii SCRIE pentru fiecare banda
+        self.errors = errors     # mesajul erorii pe banda, sau None
+
+    def __len__(self):
+        return len(self.outputs)
+
+
+class Lanes:
+    def __init__(self, program, inputs, count, dtype):
+        self.count = count
+        self.dtype = dtype
+        self.inputs = inputs
+        self.vals = [np.zeros(count, dtype=dtype) for _ in program.symbols]
+        self.alive = np.ones(count, dtype=bool)
+        self.errors = [None] * count
+        self.events = []   # (indici benzi, valori) pentru fiecare SCRIE
+
+    def truth(self, value):
+        return np.broadcast_to(np.asarray(value, dtype=bool), (self.count,))
+
+    def fail(self, where, message):
+        for i in np.flatnonzero(where):
+            self.errors[i] = message
+        self.alive &= ~where
+
+    # -------- EXPRESII --------
+    def eval(self, node, mask):
+        if isinstance(node, Number):
+            return node.value
+        if isinstance(node, Variable):
+            return self.vals[node.slot]
+
+        if isinstance(node, LogicalCond):
+            left = self.truth(self.eval(node.left, mask))
+            # dreapta doar pe benzile unde conteaza, ca la scurtcircuit
+            need = mask & (left if node.op == "SI" else ~left)
+            if not need.any():
+                return left
+            right = self.truth(self.eval(node.right, need))
+            if node.op == "SI":
+                return left & right
+            return left | right
+
+        a = self.eval(node.left, mask)
+        b = self.eval(node.right, mask)
+        if isinstance(node, CompareCond):
+            return np.asarray(CMP_OPS[node.op](a, b), dtype=bool)
+        return self.binary(node.op, a, b, mask)
+
+    def binary(self, op, a, b, mask):
+        if op in ("/", "%"):
+            zero = mask & (np.asarray(b) == 0)
+            if zero.any():
+                self.fail(zero, "integer division or modulo by zero")
+                mask = mask & ~zero
+            # divizor fals pe benzile inactive, ca sa nu ridice exceptii
+            b = np.where(np.asarray(b) == 0, 1, b)
+        if self.dtype is object:
+            return BIN_OPS[op](np.asarray(a, dtype=object), b)
+
+        r = BIN_OPS[op](a, b)
+        if op == "+":
+            bad = ((a ^ r) & (b ^ r)) < 0
+        elif op == "-":
+            bad = ((a ^ b) & (a ^ r)) < 0
+        elif op == "*":
+            bad = np.abs(np.asarray(a, dtype=np.float64) * b) >= MUL_LIMIT
+        elif op == "/":
+            bad = (np.asarray(a) == INT64_MIN) & (np.asarray(b) == -1)
+        else:
+            return r
+        if (mask & bad).any():
+            raise Overflow
+        return r
+
+    # -------- INSTRUCTIUNI --------
+    def run(self, body, mask):
+        for instr in body:
+            mask = mask & self.alive
+            if not mask.any():
+                return
+            if isinstance(instr, InputInstr):
+                self.vals[instr.slot] = np.where(mask, self.inputs[instr.var], self.vals[instr.slot])
+            elif isinstance(instr, (DeclInstr, AssignInstr)):
+                value = self.eval(instr.expr, mask)
+                self.vals[instr.slot] = np.where(mask & self.alive, value, self.vals[instr.slot])
+            elif isinstance(instr, OutputInstr):
+                value = np.broadcast_to(self.eval(instr.expr, mask), (self.count,))
+                mask = mask & self.alive
+                self.events.append((np.flatnonzero(mask), value[mask]))
+            elif isinstance(instr, IfInstr):
+                cond = self.truth(self.eval(instr.cond, mask))
+                self.run(instr.then_body, mask & cond)
+                self.run(instr.else_body, mask & ~cond)
+            elif isinstance(instr, WhileInstr):
+                active = mask & self.truth(self.eval(instr.cond, mask))
+                while active.any():
+                    if self.count >= MIN_COMPACT and active.sum() * COMPACT < self.count:
+                        self.compact(instr, active)
+                        break
+                    self.run(instr.body, active)
+                    active = active & self.alive
+                    active = active & self.truth(self.eval(instr.cond, active))
+
+    def compact(self, loop, active):
+        idx = np.flatnonzero(active)
+        sub = Lanes.__new__(Lanes)
+        sub.count = len(idx)
+        sub.dtype = self.dtype
+        sub.inputs = {var: values[idx] for var, values in self.inputs.items()}
+        sub.vals = [values[idx] for values in self.vals]
+        sub.alive = np.ones(sub.count, dtype=bool)
+        sub.errors = [None] * sub.count
+        sub.events = []
+        sub.run([loop], sub.alive.copy())
+
+        for values, part in zip(self.vals, sub.vals):
+            values[idx] = part
+        self.alive[idx] &= sub.alive
+        for i, error in zip(idx.tolist(), sub.errors):
+            if error is not None:
+                self.errors[i] = error
+        self.events += [(idx[lanes], values) for lanes, values in sub.events]
+
+    def result(self):
+        outputs = [[] for _ in range(self.count)]
+        for lanes, values in self.events:
+            for i, v in zip(lanes.tolist(), values.tolist()):
+                outputs[i].append(format_value(v))
+        return BatchResult(outputs, self.errors)
+
+
+def prepare(program, passes=optimizer.DEFAULT_PASSES):
+    if not isinstance(program, Program):
+        program = resolve(program)
+        if passes:
+            optimizer.optimize(program, passes)
+    return program
+
+
+def run_batch(program, inputs, passes=optimizer.DEFAULT_PASSES):
+    """Ruleaza programul o data pentru fiecare banda din inputs.
+
+    inputs: {variabila CITESTE: secventa de valori}, toate de aceeasi
+    lungime. Intoarce un BatchResult cu iesirea si eroarea fiecarei benzi.
+    """
+    if np is None:
+        raise Exception("Modul batch necesita NumPy (pip install numpy)")
+    program = prepare(program, passes)
+
+    kinds = {}
+    for body in optimizer.bodies(program.body):
+        for instr in body:
+            if isinstance(instr, InputInstr):
+                kinds[instr.var] = instr.kind
+    missing = [var for var in kinds if var not in inputs]
+    if missing:
+        raise Exception(f"Lipsesc valorile pentru: {', '.join(missing)}")
+
+    columns = {}
+    for var, kind in kinds.items():
+        values = list(inputs[var])
+        if kind is not None:
+            values = [coerce(v, kind, var) for v in values]
+        columns[var] = values
+    sizes = {len(v) for v in columns.values()}
+    if len(sizes) > 1:
+        raise Exception("Toate variabilele trebuie sa aiba acelasi numar de valori")
+    count = sizes.pop() if sizes else 1
+
+    # int64 doar daca toate valorile si constantele sunt int-uri mici
+    small = all(type(v) is int and INT64_MIN <= v < 2 ** 63 for col in columns.values() for v in col)
+    small = small and all(
+        type(node.value) is int and abs(node.value) < 2 ** 62
+        for node in constants(program)
+    )
+    for dtype in ((np.int64, object) if small else (object,)):
+        arrays = {var: np.array(col, dtype=dtype) for var, col in columns.items()}
+        lanes = Lanes(program, arrays, count, dtype)
+        try:
+            with np.errstate(all="ignore"):
+                lanes.run(program.body, np.ones(count, dtype=bool))
+        except Overflow:
+            continue
+        except Exception:
+            if dtype is not object:
+                raise
+            # eroare pe vectori de obiecte (ex. tipuri amestecate): nu stim
+            # banda, deci rulam benzile pe rand
+            return run_scalar(program, columns, count)
+        return lanes.result()
+
+
+def run_scalar(program, columns, count):
+    engine = Engine("closure", passes=())
+    outputs, errors = [], []
+    for lane in range(count):
+        ctx = Context(lambda var: columns[var][lane])
+        try:
+            engine.run(program, ctx)
+            errors.append(None)
+        except Exception as e:
+            errors.append(str(e))
+        outputs.append(ctx.output)
+    return BatchResult(outputs, errors)
+
+
+def constants(program):
+    todo = []
+    for body in optimizer.bodies(program.body):
+        for instr in body:
+            todo += [getattr(instr, attr) for attr in optimizer.exprs_of(instr)]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, Number):
+            yield node
+        elif not isinstance(node, Variable):
+            todo += [node.left, node.right]
@@ -0,0 +1,455 @@
+# kalk/bytecode.py
+#
+# Bytecode compact pentru programele KALK: un array de cuvinte in care
+# fiecare instructiune e un opcode urmat de un numar fix de argumente,
+# plus un pool de constante. Blocurile DACA/CATTIMP devin salturi, deci
+# masina virtuala e o singura bucla fara recursie. Pe langa instructiunile
+# de stiva exista forme "registru" care lucreaza direct pe sloturi
+# (x <- y + 1, CATTIMP i <= n), ca sa scada numarul de dispatch-uri.
+
+import struct
+import sys
+from array import array
+
+from .ast_nodes import *
+
+MAGIC = b"KALKBC"
+VERSION = 1
+
+# (nume, numar de argumente)
+OPCODES = [
+    ("LOAD_VAR", 1), ("LOAD_CONST", 1), ("STORE_VAR", 1), ("BINARY", 1),
+    ("JUMP", 1), ("POP_JUMP_IF_FALSE", 1), ("POP_JUMP_IF_TRUE", 1),
+    ("JUMP_IF_FALSE_OR_POP", 1), ("JUMP_IF_TRUE_OR_POP", 1),
+    ("INPUT", 1), ("PRINT", 0), ("HALT", 0),
+    # forme registru: V = slot, C = index in pool-ul de constante
+    ("LOAD_VV", 3), ("LOAD_VC", 3),
+    ("STORE_V", 2), ("STORE_C", 2), ("STORE_VV", 4), ("STORE_VC", 4),
+    ("JUMP_IF_VV", 4), ("JUMP_IF_VC", 4),
+    ("JUMP_UNLESS_VV", 4), ("JUMP_UNLESS_VC", 4),
+    # S = operandul stang e scos de pe stiva (ex. i * i <= n)
+    ("JUMP_IF_SV", 3), ("JUMP_IF_SC", 3),
+    ("JUMP_UNLESS_SV", 3), ("JUMP_UNLESS_SC", 3),
+    # CITESTE cu tip declarat: slot, index in INPUT_KINDS
+    ("INPUT_AS", 2),
+]
+
+(LOAD_VAR, LOAD_CONST, STORE_VAR, BINARY,
+ JUMP, POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE,
+ JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP,
+ INPUT, PRINT, HALT,
+ LOAD_VV, LOAD_VC,
+ STORE_V, STORE_C, STORE_VV, STORE_VC,
+ JUMP_IF_VV, JUMP_IF_VC,
+ JUMP_UNLESS_VV, JUMP_UNLESS_VC,
+ JUMP_IF_SV, JUMP_IF_SC,
+ JUMP_UNLESS_SV, JUMP_UNLESS_SC,
+ INPUT_AS) = range(len(OPCODES))
+
+ARITY = [n for _, n in OPCODES]
+
+# operatorii binari si de comparatie, dupa indexul folosit in bytecode
+FUNC_NAMES = list(BIN_OPS) + list(CMP_OPS)
+FUNCS = [*BIN_OPS.values(), *CMP_OPS.values()]
+FUNC_INDEX = {op: i for i, op in enumerate(FUNC_NAMES)}
+
+JUMPS = {JUMP, POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE,
+         JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP,
+         JUMP_IF_VV, JUMP_IF_VC, JUMP_UNLESS_VV, JUMP_UNLESS_VC,
+         JUMP_IF_SV, JUMP_IF_SC, JUMP_UNLESS_SV, JUMP_UNLESS_SC}
+
+
+class Bytecode:
+    __slots__ = ("code", "consts", "symbols")
+
+    def __init__(self, code, consts, symbols):
+        self.code = code         # array("q"): opcode, argument, opcode, ...
+        self.consts = consts     # constantele (int), indexate de LOAD_CONST
+        self.symbols = symbols   # numele variabilelor, in ordinea sloturilor
+
+    # ---------- SERIALIZARE ----------
+
+    def dumps(self):
+        parts = [MAGIC, struct.pack("<HI", VERSION, len(self.symbols))]
+        for name in self.symbols:
+            raw = name.encode("utf-8")
+            parts.append(struct.pack("<H", len(raw)))
+            parts.append(raw)
+
+        parts.append(struct.pack("<I", len(self.consts)))
+        for value in self.consts:
+            raw = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+            parts.append(struct.pack("<I", len(raw)))
+            parts.append(raw)
+
+        code = array("q", self.code)
+        if sys.byteorder == "big":
+            code.byteswap()
+        parts.append(struct.pack("<I", len(code)))
+        parts.append(code.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def loads(cls, data):
+        data = memoryview(data)
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise Exception("Fisierul nu contine bytecode KALK")
+        pos = len(MAGIC)
+        version, count = struct.unpack_from("<HI", data, pos)
+        pos += 6
+        if version != VERSION:
+            raise Exception(f"Versiune de bytecode nesuportata: {version}")
+
+        symbols = []
+        for _ in range(count):
+            size, = struct.unpack_from("<H", data, pos)
+            pos += 2
+            symbols.append(str(data[pos:pos + size], "utf-8"))
+            pos += size
+
+        consts = []
+        count, = struct.unpack_from("<I", data, pos)
+        pos += 4
+        for _ in range(count):
+            size, = struct.unpack_from("<I", data, pos)
+            pos += 4
+            consts.append(int.from_bytes(data[pos:pos + size], "little", signed=True))
+            pos += size
+
+        count, = struct.unpack_from("<I", data, pos)
+        pos += 4
+        code = array("q")
+        code.frombytes(data[pos:pos + 8 * count])
+        if sys.byteorder == "big":
+            code.byteswap()
+        return cls(code, consts, symbols)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.dumps())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.loads(f.read())
+
+
+# =========================================================
+# COMPILATOR
+# =========================================================
+
+class Label:
+    __slots__ = ("pos",)
+
+    def __init__(self):
+        self.pos = None
+
+
+_EMIT, _MARK = "emit", "mark"
+
+
+def compile_program(program):
+    """Compileaza un resolver.Program in Bytecode."""
+    code = array("q")
+    consts = []
+    const_index = {}
+    fixups = []
+
+    def const(value):
+        idx = const_index.get(value)
+        if idx is None:
+            idx = const_index[value] = len(consts)
+            consts.append(value)
+        return idx
+
+    def emit(op, *args):
+        for i, arg in enumerate(args):
+            if isinstance(arg, Label):
+                fixups.append((len(code) + 1 + i, arg))
+        code.append(op)
+        code.extend(0 if isinstance(arg, Label) else arg for arg in args)
+
+    def registers(node):
+        # (functie, slot stang, operand drept, este_constanta) pentru "v op v/c"
+        if not isinstance(node, (BinExpr, CompareCond)) or not isinstance(node.left, SlotVar):
+            return None
+        if isinstance(node.right, SlotVar):
+            return FUNC_INDEX[node.op], node.left.slot, node.right.slot, False
+        if isinstance(node.right, Number):
+            return FUNC_INDEX[node.op], node.left.slot, const(node.right.value), True
+        return None
+
+    def branch(cond, target, when):
+        # secventa care sare la target cand conditia are valoarea when
+        reg = registers(cond)
+        if reg:
+            fn, a, b, is_const = reg
+            if when:
+                op = JUMP_IF_VC if is_const else JUMP_IF_VV
+            else:
+                op = JUMP_UNLESS_VC if is_const else JUMP_UNLESS_VV
+            return [(_EMIT, op, (fn, a, b, target))]
+        if isinstance(cond, CompareCond) and isinstance(cond.right, (SlotVar, Number)):
+            fn = FUNC_INDEX[cond.op]
+            if isinstance(cond.right, SlotVar):
+                b, op = cond.right.slot, (JUMP_IF_SV if when else JUMP_UNLESS_SV)
+            else:
+                b, op = const(cond.right.value), (JUMP_IF_SC if when else JUMP_UNLESS_SC)
+            return [cond.left, (_EMIT, op, (fn, b, target))]
+        return [cond, (_EMIT, POP_JUMP_IF_TRUE if when else POP_JUMP_IF_FALSE, (target,))]
+
+    # lista de lucru explicita: noduri de compilat, ("emit", op, args) sau
+    # ("mark", eticheta); se scoate de la coada, deci se adauga in ordine inversa
+    todo = list(reversed(program.body))
+    while todo:
+        item = todo.pop()
+
+        if type(item) is tuple:
+            if item[0] is _EMIT:
+                emit(item[1], *item[2])
+            else:
+                item[1].pos = len(code)
+            continue
+
+        if isinstance(item, Number):
+            emit(LOAD_CONST, const(item.value))
+        elif isinstance(item, SlotVar):
+            emit(LOAD_VAR, item.slot)
+        elif isinstance(item, (BinExpr, CompareCond)):
+            reg = registers(item)
+            if reg:
+                fn, a, b, is_const = reg
+                emit(LOAD_VC if is_const else LOAD_VV, fn, a, b)
+            else:
+                todo += [(_EMIT, BINARY, (FUNC_INDEX[item.op],)), item.right, item.left]
+        elif isinstance(item, LogicalCond):
+            end = Label()
+            op = JUMP_IF_FALSE_OR_POP if item.op == "SI" else JUMP_IF_TRUE_OR_POP
+            todo += [(_MARK, end), item.right, (_EMIT, op, (end,)), item.left]
+        elif isinstance(item, SlotInput):
+            if item.kind is None:
+                emit(INPUT, item.slot)
+            else:
+                emit(INPUT_AS, item.slot, INPUT_KINDS.index(item.kind))
+        elif isinstance(item, (SlotDecl, SlotAssign)):
+            expr = item.expr
+            reg = registers(expr)
+            if reg:
+                fn, a, b, is_const = reg
+                emit(STORE_VC if is_const else STORE_VV, item.slot, fn, a, b)
+            elif isinstance(expr, SlotVar):
+                emit(STORE_V, item.slot, expr.slot)
+            elif isinstance(expr, Number):
+                emit(STORE_C, item.slot, const(expr.value))
+            else:
+                todo += [(_EMIT, STORE_VAR, (item.slot,)), expr]
+        elif isinstance(item, OutputInstr):
+            todo += [(_EMIT, PRINT, ()), item.expr]
+        elif isinstance(item, IfInstr):
+            other, end = Label(), Label()
+            seq = branch(item.cond, other, False) + item.then_body
+            if item.else_body:
+                seq += [(_EMIT, JUMP, (end,)), (_MARK, other), *item.else_body, (_MARK, end)]
+            else:
+                seq.append((_MARK, other))
+            todo += reversed(seq)
+        elif isinstance(item, WhileInstr):
+            # conditia la coada buclei: un singur salt pe iteratie
+            top, test = Label(), Label()
+            seq = [(_EMIT, JUMP, (test,)), (_MARK, top), *item.body, (_MARK, test)]
+            seq += branch(item.cond, top, True)
+            todo += reversed(seq)
+        else:
+            raise Exception(f"Nod necunoscut: {item}")
+
+    emit(HALT)
+    for pos, label in fixups:
+        code[pos] = label.pos
+    return Bytecode(code, consts, list(program.symbols))
+
+
+def instructions(code):
+    """Genereaza (pozitie, opcode, argumente) pentru fiecare instructiune."""
+    pc = 0
+    while pc < len(code):
+        op = code[pc]
+        n = ARITY[op]
+        yield pc, op, list(code[pc + 1:pc + 1 + n])
+        pc += 1 + n
+
+
+# =========================================================
+# MASINA VIRTUALA
+# =========================================================
+
+def execute(bc, ctx):
+    code = bc.code.tolist()
+    consts = bc.consts
+    fns = FUNCS
+    s = ctx.slots
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+
+    while True:
+        op = code[pc]
+
+        if op == STORE_VC:
+            s[code[pc + 1]] = fns[code[pc + 2]](s[code[pc + 3]], consts[code[pc + 4]])
+            pc += 5
+        elif op == STORE_VV:
+            s[code[pc + 1]] = fns[code[pc + 2]](s[code[pc + 3]], s[code[pc + 4]])
+            pc += 5
+        elif op == JUMP_IF_VC:
+            if fns[code[pc + 1]](s[code[pc + 2]], consts[code[pc + 3]]):
+                pc = code[pc + 4]
+            else:
+                pc += 5
+        elif op == JUMP_IF_VV:
+            if fns[code[pc + 1]](s[code[pc + 2]], s[code[pc + 3]]):
+                pc = code[pc + 4]
+            else:
+                pc += 5
+        elif op == JUMP_UNLESS_VC:
+            if fns[code[pc + 1]](s[code[pc + 2]], consts[code[pc + 3]]):
+                pc += 5
+            else:
+                pc = code[pc + 4]
+        elif op == JUMP_UNLESS_VV:
+            if fns[code[pc + 1]](s[code[pc + 2]], s[code[pc + 3]]):
+                pc += 5
+            else:
+                pc = code[pc + 4]
+        elif op == LOAD_VV:
+            push(fns[code[pc + 1]](s[code[pc + 2]], s[code[pc + 3]]))
+            pc += 4
+        elif op == JUMP_IF_SV:
+            if fns[code[pc + 1]](pop(), s[code[pc + 2]]):
+                pc = code[pc + 3]
+            else:
+                pc += 4
+        elif op == JUMP_IF_SC:
+            if fns[code[pc + 1]](pop(), consts[code[pc + 2]]):
+                pc = code[pc + 3]
+            else:
+                pc += 4
+        elif op == JUMP_UNLESS_SV:
+            if fns[code[pc + 1]](pop(), s[code[pc + 2]]):
+                pc += 4
+            else:
+                pc = code[pc + 3]
+        elif op == JUMP_UNLESS_SC:
+            if fns[code[pc + 1]](pop(), consts[code[pc + 2]]):
+                pc += 4
+            else:
+                pc = code[pc + 3]
+        elif op == LOAD_VAR:
+            push(s[code[pc + 1]])
+            pc += 2
+        elif op == LOAD_CONST:
+            push(consts[code[pc + 1]])
+            pc += 2
+        elif op == LOAD_VC:
+            push(fns[code[pc + 1]](s[code[pc + 2]], consts[code[pc + 3]]))
+            pc += 4
+        elif op == BINARY:
+            b = pop()
+            stack[-1] = fns[code[pc + 1]](stack[-1], b)
+            pc += 2
+        elif op == STORE_VAR:
+            s[code[pc + 1]] = pop()
+            pc += 2
+        elif op == STORE_V:
+            s[code[pc + 1]] = s[code[pc + 2]]
+            pc += 3
+        elif op == STORE_C:
+            s[code[pc + 1]] = consts[code[pc + 2]]
+            pc += 3
+        elif op == JUMP:
+            pc = code[pc + 1]
+        elif op == POP_JUMP_IF_TRUE:
+            pc = code[pc + 1] if pop() else pc + 2
+        elif op == POP_JUMP_IF_FALSE:
+            pc = pc + 2 if pop() else code[pc + 1]
+        elif op == JUMP_IF_FALSE_OR_POP:
+            if stack[-1]:
+                pop()
+                pc += 2
+            else:
+                pc = code[pc + 1]
+        elif op == JUMP_IF_TRUE_OR_POP:
+            if stack[-1]:
+                pc = code[pc + 1]
+            else:
+                pop()
+                pc += 2
+        elif op == INPUT:
+            slot = code[pc + 1]
+            s[slot] = ctx.read(bc.symbols[slot])
+            pc += 2
+        elif op == INPUT_AS:
+            slot = code[pc + 1]
+            name = bc.symbols[slot]
+            s[slot] = coerce(ctx.read(name), INPUT_KINDS[code[pc + 2]], name)
+            pc += 3
+        elif op == PRINT:
+            ctx.output.append(format_value(pop()))
+            pc += 1
+        elif op == HALT:
+            return
+        else:
+            raise Exception(f"Opcode necunoscut: {op}")
+
+
+# =========================================================
+# DEZASAMBLOR
+# =========================================================
+
+def disassemble(bc, start=0, end=None):
+    """Listing text al bytecode-ului; tintele salturilor sunt marcate cu >>."""
+    listing = list(instructions(bc.code))
+    targets = {args[-1] for _, op, args in listing if op in JUMPS}
+
+    def var(slot):
+        return f"{slot}({bc.symbols[slot]})"
+
+    def cst(idx):
+        return f"#{idx}({bc.consts[idx]})"
+
+    lines = []
+    for pc, op, args in listing:
+        if pc < start or (end is not None and pc >= end):
+            continue
+        name = OPCODES[op][0]
+        mark = ">>" if pc in targets else "  "
+
+        if op in (LOAD_VAR, STORE_VAR, INPUT):
+            detail = var(args[0])
+        elif op == INPUT_AS:
+            detail = f"{var(args[0])} : {INPUT_KINDS[args[1]]}"
+        elif op == LOAD_CONST:
+            detail = cst(args[0])
+        elif op == BINARY:
+            detail = FUNC_NAMES[args[0]]
+        elif op in (JUMP_IF_SV, JUMP_IF_SC, JUMP_UNLESS_SV, JUMP_UNLESS_SC):
+            right = cst(args[1]) if op in (JUMP_IF_SC, JUMP_UNLESS_SC) else var(args[1])
+            detail = f"<stiva> {FUNC_NAMES[args[0]]} {right}"
+        elif op in (LOAD_VV, LOAD_VC, JUMP_IF_VV, JUMP_IF_VC, JUMP_UNLESS_VV, JUMP_UNLESS_VC):
+            right = cst(args[2]) if op in (LOAD_VC, JUMP_IF_VC, JUMP_UNLESS_VC) else var(args[2])
+            detail = f"{var(args[1])} {FUNC_NAMES[args[0]]} {right}"
+        elif op in (STORE_VV, STORE_VC):
+            right = cst(args[3]) if op == STORE_VC else var(args[3])
+            detail = f"{var(args[0])} <- {var(args[2])} {FUNC_NAMES[args[1]]} {right}"
+        elif op == STORE_V:
+            detail = f"{var(args[0])} <- {var(args[1])}"
+        elif op == STORE_C:
+            detail = f"{var(args[0])} <- {cst(args[1])}"
+        else:
+            detail = ""
+
+        if op in JUMPS:
+            target = args[-1]
+            detail = (detail + " " if detail else "") + f"-> {target}" + (" (inapoi)" if target <= pc else "")
+        lines.append(f"{mark} {pc:5d}  {name:<22}{detail}".rstrip())
+    return "\n".join(lines)
@@ -0,0 +1,183 @@
+# kalk/channels.py
+#
+# Surse de valori pentru CITESTE. Un canal da, pentru fiecare variabila, un
+# "cititor" fara argumente; Context il cere o singura data per variabila si
+# apoi fiecare CITESTE e doar un apel al lui. Cititorii canalelor de mai jos
+# sunt metode __next__ ale unor iteratori din C (liste, map, repeat), deci
+# citirea nu trece prin nicio functie Python.
+#
+#     ctx = Context(channel=ListInput([10, 20, 30]))
+#     ctx = Context(channel=KeyedInput({"n": 100, "x": [1, 2, 3]}))
+#     ctx = Context(channel=MappedInput("numere.txt"))
+
+import itertools
+import mmap
+import re
+import sys
+
+SPACE_RE = re.compile(rb"\s")
+# fisierul mapat e impartit in bucati de atata, taiate la un spatiu
+CHUNK = 1 << 20
+
+
+def parse_number(token):
+    # int daca se poate, altfel float (ca la citirea din GUI)
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+
+def frozen(value):
+    """Forma hashabila a unei valori de intrare, pentru memo; None daca nu are."""
+    if isinstance(value, (list, tuple, range)):
+        items = tuple(frozen(v) for v in value)
+        return None if None in items else items
+    if type(value) in (int, float, str, bool):
+        return value
+    return None
+
+
+def missing(var):
+    def reader():
+        raise Exception(f"Lipseste valoarea pentru {var}")
+    return reader
+
+
+class InputChannel:
+    """Baza canalelor: reader(var) intoarce o functie fara argumente."""
+
+    def reader(self, var):
+        raise NotImplementedError
+
+    def memo_key(self):
+        """Valorile ce vor fi citite, ca cheie pentru memo.ResultCache; None
+        daca nu se cunosc dinainte."""
+        return None
+
+    def close(self):
+        pass
+
+
+class IteratorInput(InputChannel):
+    """Valorile unui iterabil, in ordinea citirilor, indiferent de variabila."""
+
+    def __init__(self, values):
+        self.next = iter(values).__next__
+
+    def reader(self, var):
+        return self.next
+
+
+class ListInput(IteratorInput):
+    """Valori preincarcate, consumate in ordinea citirilor."""
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.started = False
+        super().__init__(self.values)
+
+    def reader(self, var):
+        self.started = True
+        return self.next
+
+    def memo_key(self):
+        if self.started:
+            return None
+        values = frozen(self.values)
+        return None if values is None else ("list", values)
+
+
+class KeyedInput(InputChannel):
+    """Valori legate de numele variabilei.
+
+    O valoare simpla e intoarsa la fiecare citire a variabilei; o lista (sau
+    alt iterabil, in afara de text) e consumata cate un element per citire.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self.readers = {}
+
+    def reader(self, var):
+        r = self.readers.get(var)
+        if r is None:
+            if var not in self.values:
+                return missing(var)
+            value = self.values[var]
+            if isinstance(value, (list, tuple, range)) or hasattr(value, "__next__"):
+                r = iter(value).__next__
+            else:
+                r = itertools.repeat(value).__next__
+            self.readers[var] = r
+        return r
+
+    def memo_key(self):
+        if self.readers:
+            return None
+        items = tuple(sorted((str(k), frozen(v)) for k, v in self.values.items()))
+        if any(v is None for _, v in items):
+            return None
+        return ("keyed", items)
+
+
+class StdinInput(IteratorInput):
+    """Numere (sau cuvinte) separate prin spatii, citite lenes dintr-un flux text."""
+
+    def __init__(self, stream=None):
+        stream = stream if stream is not None else sys.stdin
+        tokens = (word for line in stream for word in line.split())
+        super().__init__(map(self.parse, tokens))
+
+    @staticmethod
+    def parse(word):
+        # ca main.parse_vars: numar daca se poate, altfel cuvantul ramane text
+        try:
+            return parse_number(word)
+        except ValueError:
+            return word
+
+
+class MappedInput(IteratorInput):
+    """Numerele dintr-un fisier mapat in memorie, parsate pe masura citirii.
+
+    number: functia de conversie (int daca fisierul are doar intregi, care
+    evita incercarea cu int si revenirea la float).
+    """
+
+    def __init__(self, path, number=parse_number):
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # fisier gol: mmap nu accepta lungime zero
+            self.map = b""
+        words = itertools.chain.from_iterable(self.chunks())
+        super().__init__(map(number, words))
+
+    def chunks(self):
+        # bytes.split pe bucati mari: un singur pas Python per bucata
+        data, pos, size = self.map, 0, len(self.map)
+        while pos < size:
+            end = pos + CHUNK
+            if end < size:
+                m = SPACE_RE.search(data, end)
+                end = m.end() if m else size
+            yield data[pos:end].split()
+            pos = end
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+
+class CallbackInput(InputChannel):
+    """Adaptor pentru un input_provider clasic: provider(var) la fiecare citire."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def reader(self, var):
+        provider = self.provider
+        return lambda: provider(var)
@@ -0,0 +1,190 @@
+# kalk/closures.py
+#
+# Compileaza un program rezolvat intr-un arbore de closure-uri Python.
+# Expresiile primesc lista de sloturi, instructiunile (ctx, sloturi);
+# operatorii sunt functii din modulul operator legate direct, deci la
+# executie nu se mai apeleaza nicio metoda eval/exec.
+
+from .ast_nodes import *
+from .induction import InductionLoop
+
+# compilarea si executia sunt recursive pe stiva Python: fiecare bloc
+# imbricat si fiecare nivel de expresie e un cadru in plus
+MAX_NESTING = 100
+MAX_DEPTH = 200
+
+
+def supported(body):
+    """Verifica imbricarea blocurilor si adancimea expresiilor dintr-un corp."""
+    stack = [(body, 0)]
+    while stack:
+        body, level = stack.pop()
+        for instr in body:
+            if isinstance(instr, IfInstr):
+                if level >= MAX_NESTING or instr.cond.depth > MAX_DEPTH:
+                    return False
+                stack.append((instr.then_body, level + 1))
+                stack.append((instr.else_body, level + 1))
+            elif isinstance(instr, WhileInstr):
+                if level >= MAX_NESTING or instr.cond.depth > MAX_DEPTH:
+                    return False
+                stack.append((instr.body, level + 1))
+            elif instr.depth > MAX_DEPTH:
+                return False
+    return True
+
+
+def compile_program(program):
+    """Intoarce o functie run(ctx) pentru un resolver.Program, sau None daca
+    programul e prea adanc pentru stiva Python."""
+    if not supported(program.body):
+        return None
+    body = compile_body(program.body)
+
+    def run(ctx):
+        s = ctx.slots
+        for f in body:
+            f(ctx, s)
+
+    return run
+
+
+def compile_body(body):
+    return tuple(compile_instr(instr) for instr in body)
+
+
+def compile_instr(instr):
+    if isinstance(instr, SlotInput):
+        i, var, kind = instr.slot, instr.var, instr.kind
+
+        if kind is not None:
+            def read(ctx, s):
+                s[i] = coerce(ctx.read(var), kind, var)
+            return read
+
+        def read(ctx, s):
+            s[i] = ctx.read(var)
+        return read
+
+    if isinstance(instr, (SlotDecl, SlotAssign)):
+        return compile_store(instr.slot, instr.expr)
+
+    if isinstance(instr, OutputInstr):
+        e = compile_expr(instr.expr)
+
+        def write(ctx, s):
+            ctx.output.append(format_value(e(s)))
+        return write
+
+    if isinstance(instr, IfInstr):
+        cond = compile_expr(instr.cond)
+        then_body = compile_body(instr.then_body)
+        else_body = compile_body(instr.else_body)
+
+        def branch(ctx, s):
+            for f in then_body if cond(s) else else_body:
+                f(ctx, s)
+        return branch
+
+    if isinstance(instr, InductionLoop):
+        # forma inchisa, cu bucla compilata ca rezerva
+        jump = instr.jump
+        plain = compile_instr(WhileInstr(instr.cond, instr.body, instr.line))
+
+        def closed(ctx, s):
+            if not jump(ctx):
+                plain(ctx, s)
+        return closed
+
+    if isinstance(instr, WhileInstr):
+        cond = compile_expr(instr.cond)
+        body = compile_body(instr.body)
+        if len(body) == 1:
+            only = body[0]
+
+            def loop(ctx, s):
+                while cond(s):
+                    only(ctx, s)
+            return loop
+
+        def loop(ctx, s):
+            while cond(s):
+                for f in body:
+                    f(ctx, s)
+        return loop
+
+    raise Exception(f"Instructiune necunoscuta: {instr}")
+
+
+def compile_store(i, expr):
+    # cazurile frecvente "x <- y + 1" si "x <- 0" fara closure intermediar
+    if isinstance(expr, Number):
+        v = expr.value
+
+        def store(ctx, s):
+            s[i] = v
+        return store
+
+    if isinstance(expr, BinExpr) and isinstance(expr.left, SlotVar):
+        fn, j = BIN_OPS[expr.op], expr.left.slot
+        if isinstance(expr.right, Number):
+            c = expr.right.value
+
+            def store(ctx, s):
+                s[i] = fn(s[j], c)
+            return store
+        if isinstance(expr.right, SlotVar):
+            k = expr.right.slot
+
+            def store(ctx, s):
+                s[i] = fn(s[j], s[k])
+            return store
+
+    e = compile_expr(expr)
+
+    def store(ctx, s):
+        s[i] = e(s)
+    return store
+
+
+def compile_expr(node):
+    if isinstance(node, SlotVar):
+        i = node.slot
+        return lambda s: s[i]
+
+    if isinstance(node, Number):
+        v = node.value
+        return lambda s: v
+
+    if isinstance(node, LogicalCond):
+        left, right = compile_expr(node.left), compile_expr(node.right)
+        if node.op == "SI":
+            return lambda s: left(s) and right(s)
+        return lambda s: left(s) or right(s)
+
+    if isinstance(node, BinExpr):
+        fn = BIN_OPS[node.op]
+    elif isinstance(node, CompareCond):
+        fn = CMP_OPS[node.op]
+    else:
+        raise Exception(f"Expresie necunoscuta: {node}")
+
+    # operanzi frunza legati direct, fara apel de closure
+    l, r = node.left, node.right
+    if isinstance(l, SlotVar):
+        i = l.slot
+        if isinstance(r, Number):
+            c = r.value
+            return lambda s: fn(s[i], c)
+        if isinstance(r, SlotVar):
+            j = r.slot
+            return lambda s: fn(s[i], s[j])
+    left = compile_expr(l)
+    if isinstance(r, Number):
+        c = r.value
+        return lambda s: fn(left(s), c)
+    if isinstance(r, SlotVar):
+        j = r.slot
+        return lambda s: fn(left(s), s[j])
+    right = compile_expr(r)
+    return lambda s: fn(left(s), right(s))
@@ -0,0 +1,207 @@
+# kalk/debugger.py
+#
+# Depanare cu breakpoint-uri si pas cu pas, fara cost pentru instructiunile
+# pe care nu se opreste nimic. Nu exista o verificare in fiecare exec:
+# instructiunile de pe liniile cu breakpoint (si, cat timp se asteapta un
+# pas, instructiunile care pot urma) sunt inlocuite in corpurile lor cu
+# versiuni care se opresc inainte de executie. La DACA / CATTIMP se
+# inlocuieste conditia, deci un breakpoint pe antetul unei bucle opreste la
+# fiecare evaluare a ei. La sfarsitul rularii programul e refacut.
+#
+#     debugger = Debugger({3, 7}, on_pause=...)
+#     engine = Engine("stack", passes=(), metered=True, debugger=debugger)
+#     engine.run_source(text, ctx)      # intr-un fir separat (BackgroundRun)
+#     ...                               # din alt fir, dupa on_pause(linie):
+#     dict(ctx.mem)                     # variabilele in momentul opririi
+#     debugger.resume()                 # pana la urmatorul breakpoint
+#     debugger.step()                   # pana la urmatoarea instructiune
+#
+# Fara pasele optimizatorului (passes=()) instructiunile corespund exact
+# liniilor din sursa.
+
+import queue
+import threading
+
+from .ast_nodes import Condition, IfInstr, Instr, WhileInstr
+from .meter import Stopped
+
+RESUME = "resume"
+STEP = "step"
+STOP = "stop"
+
+
+class Pause(Instr):
+    """Pusa in corp in locul unei instructiuni simple: opreste, apoi o executa."""
+    __slots__ = ("instr", "debugger")
+
+    def __init__(self, instr, debugger):
+        self.instr = instr
+        self.debugger = debugger
+        self.line = instr.line
+
+    def exec(self, ctx):
+        self.debugger.pause(self.instr, ctx)
+        self.instr.exec(ctx)
+
+
+class PauseCond(Condition):
+    """Conditia unui DACA / CATTIMP cu breakpoint: opreste, apoi o evalueaza."""
+    __slots__ = ("cond", "instr", "debugger", "depth")
+
+    def __init__(self, cond, instr, debugger):
+        self.cond = cond
+        self.instr = instr
+        self.debugger = debugger
+        self.depth = cond.depth
+
+    def eval(self, ctx):
+        self.debugger.pause(self.instr, ctx)
+        return self.cond.eval(ctx)
+
+
+def original(node):
+    return node.instr if type(node) is Pause else node
+
+
+class Debugger:
+    """Breakpoint-uri pe linii (de la 1) si pasi, comandate din alt fir.
+
+    on_pause(linie) e apelat din firul rularii, care asteapta apoi resume(),
+    step() sau stop(); cat timp e oprit, ctx-ul rularii poate fi citit.
+    """
+
+    def __init__(self, lines=(), on_pause=None):
+        self.lines = set(lines)
+        self.on_pause = on_pause
+        self.commands = queue.SimpleQueue()
+        # breakpoint-urile se pot schimba din alt fir in timpul rularii
+        self.lock = threading.Lock()
+        self.places = {}      # instructiune -> (corp, indice, blocul care o contine)
+        self.at_line = {}     # linie -> [instructiuni]
+        self.armed = set()    # instructiunile inlocuite acum
+        self.stepping = set() # tinta pasului in asteptare
+        self.line = None      # linia pe care e oprita rularea
+
+    # ---------- RULARE ----------
+
+    def run(self, engine, program, ctx):
+        if engine.mode not in ("tree", "stack"):
+            raise Exception("Depanarea ruleaza arborele programului (modurile tree sau stack)")
+        self.attach(program)
+        try:
+            getattr(engine, "run_" + engine.mode)(program, ctx)
+        finally:
+            self.detach()
+
+    def attach(self, program):
+        todo = [(program.body, None)]
+        while todo:
+            body, owner = todo.pop()
+            for index, instr in enumerate(body):
+                self.places[instr] = (body, index, owner)
+                self.at_line.setdefault(instr.line, []).append(instr)
+                if isinstance(instr, IfInstr):
+                    todo += ((instr.then_body, instr), (instr.else_body, instr))
+                elif isinstance(instr, WhileInstr):
+                    todo.append((instr.body, instr))
+        with self.lock:
+            for line in self.lines:
+                for instr in self.at_line.get(line, ()):
+                    self.update(instr)
+
+    def detach(self):
+        with self.lock:
+            lines, self.lines = self.lines, set()
+            self.stepping = set()
+            for instr in list(self.armed):
+                self.update(instr)
+            self.lines = lines
+            self.places = {}
+            self.at_line = {}
+
+    # ---------- INLOCUIRE ----------
+
+    def update(self, instr):
+        """Pune sau scoate versiunea care se opreste, dupa cum e nevoie de ea."""
+        wanted = instr.line in self.lines or instr in self.stepping
+        if wanted == (instr in self.armed):
+            return
+        block = isinstance(instr, (IfInstr, WhileInstr))
+        if wanted:
+            self.armed.add(instr)
+            if block:
+                instr.cond = PauseCond(instr.cond, instr, self)
+            else:
+                body, index, _ = self.places[instr]
+                body[index] = Pause(instr, self)
+        else:
+            self.armed.discard(instr)
+            if block:
+                instr.cond = instr.cond.cond
+            else:
+                body, index, _ = self.places[instr]
+                body[index] = instr
+
+    def successors(self, instr):
+        """Instructiunile la care se poate ajunge direct dupa instr."""
+        if isinstance(instr, IfInstr):
+            found = [original(body[0]) for body in (instr.then_body, instr.else_body) if body]
+            if len(found) < 2:
+                # o ramura goala trece direct mai departe
+                found += self.after(instr)
+            return found
+        if isinstance(instr, WhileInstr):
+            first = [original(instr.body[0])] if instr.body else [instr]
+            return first + self.after(instr)
+        return self.after(instr)
+
+    def after(self, instr):
+        """Ce urmeaza dupa ce instr (cu tot blocul ei) s-a terminat."""
+        while True:
+            body, index, owner = self.places[instr]
+            if index + 1 < len(body):
+                return [original(body[index + 1])]
+            if owner is None:
+                return []
+            if isinstance(owner, WhileInstr):
+                # conditia buclei e evaluata din nou
+                return [owner]
+            instr = owner
+
+    # ---------- OPRIRE ----------
+
+    def pause(self, instr, ctx):
+        with self.lock:
+            # pasul s-a facut: tintele lui revin la forma obisnuita
+            stepping, self.stepping = self.stepping, set()
+            for other in stepping:
+                self.update(other)
+            self.line = instr.line
+        if self.on_pause is not None:
+            self.on_pause(instr.line)
+        command = self.commands.get()
+        self.line = None
+        if command == STOP:
+            raise Stopped("Executie oprita")
+        if command == STEP:
+            with self.lock:
+                self.stepping = set(self.successors(instr))
+                for other in self.stepping:
+                    self.update(other)
+
+    def resume(self):
+        self.commands.put(RESUME)
+
+    def step(self):
+        self.commands.put(STEP)
+
+    def stop(self):
+        # o rulare care nu e oprita intr-un breakpoint se opreste prin ctx.meter
+        self.commands.put(STOP)
+
+    def set_breakpoints(self, lines):
+        with self.lock:
+            old, self.lines = self.lines, set(lines)
+            for line in old ^ self.lines:
+                for instr in self.at_line.get(line, ()):
+                    self.update(instr)
@@ -1,9 +1,272 @@
 # kalk/engine.py
 
-from .ast_nodes import Context
+import time
+
+from .ast_nodes import *
+from .induction import InductionLoop
+from .resolver import Program, resolve
+from . import bytecode, closures, optimizer, progcache, transpiler
+
+# expresiile mai adanci de atat sunt evaluate iterativ in modul "stack"
+DEEP_EXPR = 200
+
+# in modul "tiered", dupa atatea iteratii o bucla e compilata in closure-uri
+TIER_THRESHOLD = 200
+
+
+class TierEvent:
+    """O bucla promovata de la interpretare la codul compilat."""
+    __slots__ = ("loop", "iterations", "seconds")
+
+    def __init__(self, loop, iterations, seconds):
+        self.loop = loop               # WhileInstr-ul promovat
+        self.iterations = iterations   # iteratii interpretate pana la promovare
+        self.seconds = seconds         # timpul de compilare
+
+    def __repr__(self):
+        return f"TierEvent({self.iterations} iteratii, {self.seconds * 1000:.3f} ms)"
+
+
+def eval_iterative(node, ctx):
+    """Evalueaza o expresie sau conditie fara recursie pe stiva Python."""
+    values = []
+    todo = [node]
+    while todo:
+        item = todo.pop()
+
+        if type(item) is tuple:
+            fn, arg = item
+            if fn is None:
+                # SI / SAU dupa evaluarea operandului stang
+                a = values[-1]
+                if (arg.op == "SI") == bool(a):
+                    values.pop()
+                    todo.append(arg.right)
+                continue
+            b = values.pop()
+            values[-1] = fn(values[-1], b)
+            continue
+
+        if isinstance(item, LogicalCond):
+            todo.append((None, item))
+            todo.append(item.left)
+        elif isinstance(item, BinExpr):
+            todo.append((BIN_OPS[item.op], None))
+            todo.append(item.right)
+            todo.append(item.left)
+        elif isinstance(item, CompareCond):
+            todo.append((CMP_OPS[item.op], None))
+            todo.append(item.right)
+            todo.append(item.left)
+        else:
+            values.append(item.eval(ctx))
+
+    return values[0]
+
 
 class Engine:
+    MODES = ("tree", "stack", "closure", "vm", "python", "tiered")
+
+    def __init__(self, mode="tree", passes=optimizer.DEFAULT_PASSES,
+                 threshold=TIER_THRESHOLD, on_tier_up=None, memo=None, metered=False,
+                 profiler=None, debugger=None):
+        if mode not in self.MODES:
+            raise Exception(f"Mod de executie necunoscut: {mode}")
+        self.mode = mode
+        self.passes = passes
+        # {pasa: noduri eliminate} pentru ultimul program optimizat
+        self.report = {}
+        # modul "tiered": pragul de promovare si evenimentele produse
+        self.threshold = threshold
+        self.on_tier_up = on_tier_up
+        self.tier_events = []
+        # memo.ResultCache: run_source raspunde din cache pentru intrari deja vazute
+        self.memo = memo
+        # modul "python": codul numara pasii in ctx.meter (meter.py)
+        self.metered = metered
+        # profiler.LineProfiler / SamplingProfiler: rularile trec prin el si
+        # rezultatul ramane in profiler.result
+        self.profiler = profiler
+        # debugger.Debugger: rularile (tree / stack) se opresc la breakpoint-uri
+        self.debugger = debugger
+
     def run(self, program, ctx):
+        try:
+            tools = self.profiler is not None or self.debugger is not None
+            if tools and isinstance(program, (bytecode.Bytecode, transpiler.PyProgram)):
+                # fara arbore nu se stiu liniile instructiunilor
+                raise Exception("Profilarea si depanarea au nevoie de sursa sau de arborele programului")
+            if isinstance(program, bytecode.Bytecode):
+                # bytecode incarcat de pe disc: nu mai trece prin front-end
+                ctx.bind(program.symbols)
+                bytecode.execute(program, ctx)
+                return
+            if isinstance(program, transpiler.PyProgram):
+                ctx.bind(program.symbols)
+                program.run(ctx)
+                return
+            if not isinstance(program, Program):
+                program = resolve(program)
+                if self.passes:
+                    self.report = optimizer.optimize(program, self.passes)
+            ctx.bind(program.symbols)
+            if self.profiler is not None:
+                self.profiler.run(self, program, ctx)
+            elif self.debugger is not None:
+                self.debugger.run(self, program, ctx)
+            else:
+                getattr(self, "run_" + self.mode)(program, ctx)
+        except StopIteration:
+            # un canal de intrare (channels.py) s-a terminat
+            raise Exception("Nu mai sunt valori de intrare") from None
+        finally:
+            flush = getattr(ctx.output, "flush", None)
+            if flush is not None:
+                flush()
+
+    def run_tree(self, program, ctx):
         for instr in program:
             instr.exec(ctx)
 
+    def run_stack(self, program, ctx):
+        # fiecare cadru: (iterator peste un corp, bucla care il detine sau None)
+        # pe stiva se pune doar la intrarea intr-un bloc, nu la fiecare instructiune
+        stack = [(iter(program), None)]
+        # rezerva modului "python" masurat: pasii se numara per iteratie
+        meter = ctx.meter if self.metered else None
+        while stack:
+            body, loop = stack[-1]
+            for instr in body:
+                kind = type(instr)
+                if kind is IfInstr:
+                    cond = instr.cond
+                    ok = cond.eval(ctx) if cond.depth <= DEEP_EXPR else eval_iterative(cond, ctx)
+                    block = instr.then_body if ok else instr.else_body
+                    if block:
+                        stack.append((iter(block), None))
+                        break
+                elif kind is WhileInstr:
+                    cond = instr.cond
+                    ok = cond.eval(ctx) if cond.depth <= DEEP_EXPR else eval_iterative(cond, ctx)
+                    if ok:
+                        if meter is not None:
+                            meter.tick(len(instr.body) + 1)
+                        stack.append((iter(instr.body), instr))
+                        break
+                elif instr.depth <= DEEP_EXPR:
+                    instr.exec(ctx)
+                else:
+                    self.exec_deep(instr, ctx)
+            else:
+                stack.pop()
+                if loop is not None:
+                    cond = loop.cond
+                    if cond.eval(ctx) if cond.depth <= DEEP_EXPR else eval_iterative(cond, ctx):
+                        if meter is not None:
+                            meter.tick(len(loop.body) + 1)
+                        stack.append((iter(loop.body), loop))
+
+    def run_closure(self, program, ctx):
+        if "closure" not in program.compiled:
+            program.compiled["closure"] = closures.compile_program(program)
+        run = program.compiled["closure"]
+        if run is None:
+            # imbricare sau expresii prea adanci pentru closure-uri
+            self.run_stack(program, ctx)
+        else:
+            run(ctx)
+
+    def run_tiered(self, program, ctx):
+        if "tiered_ok" not in program.compiled:
+            program.compiled["tiered_ok"] = closures.supported(program.body)
+        if not program.compiled["tiered_ok"]:
+            # interpretorul si buclele promovate sunt recursive, ca closure-urile
+            self.run_stack(program, ctx)
+            return
+        # buclele compilate si iteratiile numarate raman pe program, deci
+        # o rulare noua porneste direct cu buclele deja promovate
+        compiled = program.compiled.setdefault("tiered", {})
+        counts = program.compiled.setdefault("tier_counts", {})
+        self.exec_tiered(program.body, ctx, compiled, counts)
+
+    def exec_tiered(self, body, ctx, compiled, counts):
+        for instr in body:
+            if type(instr) is IfInstr:
+                block = instr.then_body if instr.cond.eval(ctx) else instr.else_body
+                self.exec_tiered(block, ctx, compiled, counts)
+            elif isinstance(instr, WhileInstr):
+                self.loop_tiered(instr, ctx, compiled, counts)
+            else:
+                instr.exec(ctx)
+
+    def loop_tiered(self, loop, ctx, compiled, counts):
+        fn = compiled.get(loop)
+        if fn is not None:
+            fn(ctx, ctx.slots)
+            return
+        if isinstance(loop, InductionLoop) and loop.jump(ctx):
+            return
+
+        count = counts.get(loop, 0)
+        cond, body = loop.cond, loop.body
+        while cond.eval(ctx):
+            self.exec_tiered(body, ctx, compiled, counts)
+            count += 1
+            if count >= self.threshold:
+                # promovare intre doua iteratii: bucla compilata reia de la
+                # conditie, pe aceleasi sloturi din ctx
+                fn = self.tier_up(loop, count, compiled)
+                fn(ctx, ctx.slots)
+                return
+        counts[loop] = count
+
+    def tier_up(self, loop, count, compiled):
+        start = time.perf_counter()
+        fn = compiled[loop] = closures.compile_instr(loop)
+        event = TierEvent(loop, count, time.perf_counter() - start)
+        self.tier_events.append(event)
+        if self.on_tier_up is not None:
+            self.on_tier_up(event)
+        return fn
+
+    def run_vm(self, program, ctx):
+        bc = program.compiled.get("vm")
+        if bc is None:
+            bc = program.compiled["vm"] = bytecode.compile_program(program)
+        bytecode.execute(bc, ctx)
+
+    def run_python(self, program, ctx):
+        # varianta masurata numara pasii in ctx.meter, deci se tine separat
+        key = "python_metered" if self.metered else "python"
+        if key not in program.compiled:
+            program.compiled[key] = transpiler.compile_program(program, self.metered)
+        prog = program.compiled[key]
+        if prog is None:
+            # imbricare prea adanca pentru CPython
+            self.run_stack(program, ctx)
+        else:
+            prog.run(ctx)
+
+    def run_source(self, text, ctx):
+        if self.profiler is not None:
+            # etichetele din profil folosesc textul liniilor
+            self.profiler.source = text
+            self.run(self.load_source(text), ctx)
+        elif self.memo is not None and self.debugger is None:
+            self.memo.run_source(self, text, ctx)
+        else:
+            self.run(self.load_source(text), ctx)
+
+    def load_source(self, text):
+        if self.mode == "python" and self.profiler is None:
+            # codul compilat e refolosit dupa hash-ul sursei
+            return transpiler.from_source(text, self.passes, self.metered)
+        # programul rezolvat si optimizat vine din cache-ul de pe disc
+        return progcache.load_program(text, self.passes)
+
+    def exec_deep(self, instr, ctx):
+        value = eval_iterative(instr.expr, ctx)
+        if isinstance(instr, OutputInstr):
+            ctx.output.append(format_value(value))
+        else:
+            ctx.mem[instr.var] = value
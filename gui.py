@@ -3,7 +3,8 @@ from PySide6.QtWidgets import (
     QPushButton, QListWidget,
     QVBoxLayout, QHBoxLayout, QLabel,
     QMessageBox, QInputDialog, QPlainTextEdit,
-    QTextEdit
+    QTextEdit, QComboBox, QFileDialog, QToolTip,
+    QTableWidget, QTableWidgetItem
 )
 
 from PySide6.QtGui import (
@@ -13,20 +14,39 @@ from PySide6.QtGui import (
     QTextCursor
 )
 
-from PySide6.QtCore import Qt, QRect, QSize
+from PySide6.QtCore import Qt, QEvent, QRect, QSize, QTimer, Signal
 
-from .lexer import Lexer
-from .parser import Parser
-from .engine import Engine
 from .ast_nodes import Context
+from .engine import Engine
+from .profiler import LineProfiler, SamplingProfiler
+from .sinks import RingSink
+from .numfmt import BIG_BITS, DISPLAY_MODES, display, format_value, scientific
+from .library import LibraryIndex, LibraryWatcher
+from .background import BackgroundRun
+from .debugger import Debugger
+from .sandbox import SandboxEngine, SandboxPool
 
 import sys
 import os
 import re
+import threading
+import time
 
 
 STD_DIR = "kalk/programs"
 USR_DIR = "kalk/user_programs"
+# panoul de iesire pastreaza doar ultimele linii scrise
+OUTPUT_LINES = 10000
+# cat asteapta inchiderea ferestrei dupa firul bibliotecii, in secunde
+POLL_JOIN = 2.0
+# in timpul rularii, iesirea noua si viteza sunt afisate o data la atatea ms
+REFRESH_MS = 100
+# memoria pe care o poate folosi un program rulat din IDE
+RUN_MEMORY = 1 << 30
+# profilarea ruleaza in procesul IDE-ului (are nevoie de codul generat)
+PROFILE_MODES = {"exact": LineProfiler, "esantioane": SamplingProfiler}
+# culoarea liniilor in harta timpilor; intensitatea urmeaza timpul propriu
+HEAT_COLOR = (220, 80, 40)
 
 
 # =========================================================
@@ -42,18 +62,20 @@ class LineNumberArea(QWidget):
         return QSize(self.editor.line_number_width(), 0)
 
     def mousePressEvent(self, event):
-        block = self.editor.firstVisibleBlock()
-        top = int(self.editor.blockBoundingGeometry(block)
-                  .translated(self.editor.contentOffset()).top())
-
-        while block.isValid():
-            bottom = top + int(self.editor.blockBoundingRect(block).height())
-            if top <= event.pos().y() <= bottom:
-                line = block.blockNumber()
-                self.editor.toggle_breakpoint(line)
-                break
-            block = block.next()
-            top = bottom
+        line = self.editor.line_at(event.pos().y())
+        if line >= 0:
+            self.editor.toggle_breakpoint(line)
+
+    def event(self, event):
+        if event.type() == QEvent.ToolTip:
+            text = self.editor.heat_tooltip(self.editor.line_at(event.pos().y()))
+            if text:
+                QToolTip.showText(event.globalPos(), text, self)
+            else:
+                QToolTip.hideText()
+                event.ignore()
+            return True
+        return super().event(event)
 
     def paintEvent(self, event):
         self.editor.line_number_area_paint(event)
@@ -64,15 +86,25 @@ class LineNumberArea(QWidget):
 # =========================================================
 
 class CodeEditor(QPlainTextEdit):
+    breakpoints_changed = Signal()
+
     def __init__(self):
         super().__init__()
 
         self.breakpoints = set()
+        # linia (numarul blocului) pe care e oprit debugger-ul, sau -1
+        self.paused_line = -1
+        # profilul ultimei rulari: numarul blocului (linia - 1) -> LineStat
+        self.heat = {}
+        self.heat_max = 0.0
+        self.profile = None
         self.lineNumberArea = LineNumberArea(self)
 
         self.blockCountChanged.connect(self.update_line_number_width)
         self.updateRequest.connect(self.update_line_number_area)
         self.cursorPositionChanged.connect(self.highlight_current_line)
+        # dupa o editare liniile nu mai corespund profilului
+        self.textChanged.connect(self.clear_heat)
 
         self.update_line_number_width(0)
         self.setViewportMargins(self.line_number_width(), 0, 0, 0)
@@ -119,6 +151,13 @@ class CodeEditor(QPlainTextEdit):
             if block.isVisible() and bottom >= event.rect().top():
                 number = str(blockNumber + 1)
 
+                # harta timpilor
+                stat = self.heat.get(blockNumber)
+                if stat is not None and self.heat_max > 0:
+                    alpha = int(255 * min(stat.self / self.heat_max, 1.0))
+                    painter.fillRect(0, top, self.lineNumberArea.width(),
+                                     bottom - top, QColor(*HEAT_COLOR, alpha))
+
                 # breakpoint
                 if blockNumber in self.breakpoints:
                     painter.setBrush(QColor("red"))
@@ -139,12 +178,62 @@ class CodeEditor(QPlainTextEdit):
             bottom = top + int(self.blockBoundingRect(block).height())
             blockNumber += 1
 
+    def line_at(self, y):
+        """Numarul blocului afisat la inaltimea y, sau -1."""
+        block = self.firstVisibleBlock()
+        top = int(self.blockBoundingGeometry(block)
+                  .translated(self.contentOffset()).top())
+
+        while block.isValid():
+            bottom = top + int(self.blockBoundingRect(block).height())
+            if top <= y <= bottom:
+                return block.blockNumber()
+            block = block.next()
+            top = bottom
+        return -1
+
     def toggle_breakpoint(self, line):
         if line in self.breakpoints:
             self.breakpoints.remove(line)
         else:
             self.breakpoints.add(line)
         self.lineNumberArea.update()
+        self.breakpoints_changed.emit()
+
+    def show_paused(self, line):
+        self.paused_line = line
+        if line >= 0:
+            # linia opririi devine vizibila
+            self.setTextCursor(QTextCursor(self.document().findBlockByNumber(line)))
+        self.highlight_current_line()
+
+    # ---------- PROFILE HEAT MAP ----------
+
+    def show_heat(self, profile):
+        self.profile = profile
+        self.heat = {line - 1: stat for line, stat in profile.lines().items()}
+        self.heat_max = max((stat.self for stat in self.heat.values()), default=0.0)
+        self.lineNumberArea.update()
+
+    def clear_heat(self):
+        if self.profile is None:
+            return
+        self.profile = None
+        self.heat = {}
+        self.heat_max = 0.0
+        self.lineNumberArea.update()
+
+    def heat_tooltip(self, line):
+        stat = self.heat.get(line)
+        if stat is None:
+            return None
+        share = stat.self / self.profile.elapsed * 100 if self.profile.elapsed else 0.0
+        text = (f"executari: {stat.count:,}\n"
+                f"timp propriu: {stat.self * 1000:.3f} ms ({share:.1f}%)\n"
+                f"timp total: {stat.total * 1000:.3f} ms")
+        if self.profile.mode == "sample":
+            text += "\n(timpi estimati din esantioane)"
+        return text
 
     # ---------- CURRENT LINE HIGHLIGHT ----------
 
@@ -157,8 +246,16 @@ class CodeEditor(QPlainTextEdit):
         selection.format.setProperty(QTextFormat.FullWidthSelection, True)
         selection.cursor = self.textCursor()
         selection.cursor.clearSelection()
+        selections = [selection]
+
+        if self.paused_line >= 0:
+            paused = QTextEdit.ExtraSelection()
+            paused.format.setBackground(QColor("#4b4b18"))
+            paused.format.setProperty(QTextFormat.FullWidthSelection, True)
+            paused.cursor = QTextCursor(self.document().findBlockByNumber(self.paused_line))
+            selections.append(paused)
 
-        self.setExtraSelections([selection])
+        self.setExtraSelections(selections)
 
     # ---------- AUTO INDENT + TAB ----------
 
@@ -241,6 +338,15 @@ class KalkHighlighter(QSyntaxHighlighter):
 # =========================================================
 
 class KalkWindow(QMainWindow):
+    # emis din firul LibraryWatcher; Qt il livreaza pe firul GUI
+    library_changed = Signal()
+    # emis din firul care citeste programul ales: (cale, text, eroare)
+    program_loaded = Signal(str, object, object)
+    # emise din firul rularii (BackgroundRun)
+    run_finished = Signal(object)
+    input_needed = Signal(object)
+    paused = Signal(object)
+
     def __init__(self):
         super().__init__()
 
@@ -252,25 +358,82 @@ class KalkWindow(QMainWindow):
 
         self.output = QPlainTextEdit()
         self.output.setReadOnly(True)
+        self.output.setMaximumBlockCount(OUTPUT_LINES)
 
         font = QFont("Consolas")
         font.setPointSize(11)
         self.editor.setFont(font)
         self.output.setFont(font)
 
+        # numerele foarte lungi pot fi afisate prescurtat sau stiintific
+        self.display_mode = QComboBox()
+        self.display_mode.addItems(list(DISPLAY_MODES))
+        self.display_mode.currentTextChanged.connect(self.show_output)
+        self.output_lines = []
+
         self.highlighter = KalkHighlighter(self.editor.document())
 
         self.std_list = QListWidget()
         self.usr_list = QListWidget()
 
+        # listele vin din index; watcher-ul il actualizeaza si precompileaza in fundal
+        os.makedirs(STD_DIR, exist_ok=True)
+        os.makedirs(USR_DIR, exist_ok=True)
+        self.library = LibraryIndex()
         self.load_program_lists()
-
-        run_btn = QPushButton("Run")
+        self.library_changed.connect(self.load_program_lists)
+        self.loading = None
+        self.program_loaded.connect(self.show_program)
+        self.watcher = LibraryWatcher(self.library, (STD_DIR, USR_DIR), self.library_changed.emit)
+        self.watcher.start()
+
+        # programul ruleaza intr-un worker izolat (pregatit de la pornire),
+        # urmarit dintr-un fir separat; interfata ramane libera
+        self.sandbox = SandboxPool(1, memory=RUN_MEMORY)
+        self.run = None
+        self.live = None
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh_run)
+        self.run_finished.connect(self.finish_run)
+        self.input_needed.connect(self.ask_input)
+        self.speed = QLabel("")
+
+        self.run_btn = QPushButton("Run")
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.setEnabled(False)
+        self.profile_btn = QPushButton("Profile")
+        self.profile_mode = QComboBox()
+        self.profile_mode.addItems(list(PROFILE_MODES))
+        self.export_btn = QPushButton("Export Profile")
+        self.export_btn.setEnabled(False)
+        self.profiler = None
+        self.debug_btn = QPushButton("Debug")
+        self.continue_btn = QPushButton("Continue")
+        self.step_btn = QPushButton("Step")
+        self.continue_btn.setEnabled(False)
+        self.step_btn.setEnabled(False)
+        self.debugger = None
+        self.paused.connect(self.pause_run)
+        self.editor.breakpoints_changed.connect(self.update_breakpoints)
+
+        # variabilele programului depanat (Context.mem)
+        self.variables = QTableWidget(0, 2)
+        self.variables.setHorizontalHeaderLabels(["Variabila", "Valoare"])
+        self.variables.horizontalHeader().setStretchLastSection(True)
+        self.variables.verticalHeader().setVisible(False)
+        self.variables.setEditTriggers(QTableWidget.NoEditTriggers)
         save_btn = QPushButton("Save to My Library")
         load_std_btn = QPushButton("Load Standard")
         load_usr_btn = QPushButton("Load Personal")
 
-        run_btn.clicked.connect(self.run_program)
+        self.run_btn.clicked.connect(lambda: self.run_program())
+        self.stop_btn.clicked.connect(self.stop_program)
+        self.profile_btn.clicked.connect(self.profile_program)
+        self.export_btn.clicked.connect(self.export_profile)
+        self.debug_btn.clicked.connect(self.debug_program)
+        self.continue_btn.clicked.connect(self.continue_program)
+        self.step_btn.clicked.connect(self.step_program)
         save_btn.clicked.connect(self.save_program)
         load_std_btn.clicked.connect(lambda: self.load_selected(self.std_list, STD_DIR))
         load_usr_btn.clicked.connect(lambda: self.load_selected(self.usr_list, USR_DIR))
@@ -281,7 +444,19 @@ class KalkWindow(QMainWindow):
         left = QVBoxLayout()
         left.addWidget(QLabel("Editor"))
         left.addWidget(self.editor)
-        left.addWidget(run_btn)
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.run_btn)
+        buttons.addWidget(self.stop_btn)
+        buttons.addWidget(self.profile_btn)
+        buttons.addWidget(self.profile_mode)
+        buttons.addWidget(self.export_btn)
+        left.addLayout(buttons)
+        debug_buttons = QHBoxLayout()
+        debug_buttons.addWidget(self.debug_btn)
+        debug_buttons.addWidget(self.continue_btn)
+        debug_buttons.addWidget(self.step_btn)
+        left.addLayout(debug_buttons)
+        left.addWidget(self.speed)
         left.addWidget(save_btn)
 
         right = QVBoxLayout()
@@ -294,8 +469,12 @@ class KalkWindow(QMainWindow):
         right.addWidget(load_usr_btn)
 
         right.addWidget(QLabel("Output"))
+        right.addWidget(self.display_mode)
         right.addWidget(self.output)
 
+        right.addWidget(QLabel("Variables"))
+        right.addWidget(self.variables)
+
         root = QHBoxLayout()
         root.addLayout(left, 2)
         root.addLayout(right, 1)
@@ -358,106 +537,239 @@ class KalkWindow(QMainWindow):
     # ---------- FILE MANAGEMENT ----------
 
     def load_program_lists(self):
-        os.makedirs(STD_DIR, exist_ok=True)
-        os.makedirs(USR_DIR, exist_ok=True)
-
-        self.std_list.clear()
-        self.usr_list.clear()
-
-        for f in os.listdir(STD_DIR):
-            if f.endswith(".kalk"):
-                self.std_list.addItem(f)
-
-        for f in os.listdir(USR_DIR):
-            if f.endswith(".kalk"):
-                self.usr_list.addItem(f)
+        for widget, directory in ((self.std_list, STD_DIR), (self.usr_list, USR_DIR)):
+            current = widget.currentItem()
+            current = current.text() if current else None
+            widget.clear()
+            for program in self.library.programs(directory):
+                widget.addItem(program.name)
+                item = widget.item(widget.count() - 1)
+                if program.inputs:
+                    item.setToolTip("CITESTE " + ", ".join(program.inputs))
+                if not program.ok and program.hash is not None:
+                    item.setToolTip(program.status)
+                    item.setForeground(QColor("#f48771"))
+                if program.name == current:
+                    widget.setCurrentItem(item)
+
+    def closeEvent(self, event):
+        if self.run is not None:
+            self.stop_program()
+            self.run.join(POLL_JOIN)
+        self.sandbox.close()
+        self.watcher.stop()
+        self.watcher.join(POLL_JOIN)
+        self.library.close()
+        super().closeEvent(event)
 
     def load_selected(self, widget, directory):
         item = widget.currentItem()
         if not item:
             return
-        path = os.path.join(directory, item.text())
-        with open(path, "r") as file:
-            self.editor.setPlainText(file.read())
+        # citirea (un disc lent, un fisier mare) nu tine firul GUI
+        self.loading = os.path.join(directory, item.text())
+        threading.Thread(target=self.read_program, args=(self.loading,), daemon=True).start()
+
+    def read_program(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.program_loaded.emit(path, f.read(), None)
+        except (OSError, UnicodeDecodeError) as e:
+            self.program_loaded.emit(path, None, str(e))
+
+    def show_program(self, path, text, error):
+        if path != self.loading:
+            # intre timp a fost ales alt program
+            return
+        self.loading = None
+        if error is not None:
+            self.output.appendPlainText(f"{os.path.basename(path)}: {error}")
+        else:
+            self.editor.setPlainText(text)
 
     def save_program(self):
         name, ok = QInputDialog.getText(self, "Save", "Program name:")
         if ok and name:
             if not name.endswith(".kalk"):
                 name += ".kalk"
-            with open(os.path.join(USR_DIR, name), "w") as f:
+            with open(os.path.join(USR_DIR, name), "w", encoding="utf-8") as f:
                 f.write(self.editor.toPlainText())
-            self.load_program_lists()
+            self.watcher.poke()
 
     # ---------- EXECUTION ----------
 
-    def run_program(self):
+    def run_program(self, profiler=None, debugger=None):
+        if self.run is not None:
+            return
         self.output.clear()
-        text = self.editor.toPlainText()
-
-        try:
-            lexer = Lexer(text)
-            tokens = []
-            while True:
-                t = lexer.next_token()
-                tokens.append(t)
-                if t.type == "EOF":
-                    break
-
-            parser = Parser(tokens)
-            program = parser.parse_program()
-
-            ctx = Context()
-
-            # ===============================
-            # INPUT PROVIDER DEFINITIV FIX
-            # ===============================
-
-            def gui_input_provider(var_name=None):
-                label = f"Introduceți valoarea:"
-                if var_name:
-                    label = f"Introduceți valoarea pentru {var_name}:"
-
-                value, ok = QInputDialog.getText(
-                    self,
-                    "Input necesar",
-                    label
-                )
-
-                if not ok:
-                    raise Exception("Input anulat de utilizator")
-
-                # conversie automată numerică
-                if value.isdigit():
-                    return int(value)
-
-                try:
-                    return float(value)
-                except:
-                    return value
-
-            # punem provider-ul peste tot unde ar putea fi folosit
-            ctx.input_provider = gui_input_provider
-
-            engine = Engine()
-            engine.input_provider = gui_input_provider
-
-            # dacă engine caută în context prin metodă
-            if hasattr(ctx, "set_input_provider"):
-                ctx.set_input_provider(gui_input_provider)
-
-            # dacă engine caută metodă directă
-            if hasattr(ctx, "get_input"):
-                ctx.get_input = gui_input_provider
+        self.output_lines = []
+        self.live = RingSink(OUTPUT_LINES)
+        ctx = Context(output=self.live)
+
+        if profiler is not None:
+            # profilarea ruleaza aici, in firul de fundal, fara limita de memorie
+            engine = Engine("python", metered=True, profiler=profiler)
+        elif debugger is not None:
+            # arborele neoptimizat, ca instructiunile sa corespunda liniilor
+            engine = Engine("stack", passes=(), metered=True, debugger=debugger)
+        else:
+            # workerul pastreaza codul compilat cat timp textul nu se schimba si
+            # numara pasii (viteza afisata); Stop il opreste si il inlocuieste
+            engine = SandboxEngine(self.sandbox)
+        self.profiler = profiler
+        self.debugger = debugger
+        self.variables.setRowCount(0)
+        self.run_text = self.editor.toPlainText()
+        self.run = BackgroundRun(engine, self.run_text, ctx,
+                                 on_done=self.run_finished.emit,
+                                 on_input=self.input_needed.emit)
+        self.run_btn.setEnabled(False)
+        self.profile_btn.setEnabled(False)
+        self.debug_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.speed.setText("")
+        self.started = self.last_time = time.perf_counter()
+        self.last_steps = 0
+        self.refresh_timer.start()
+        self.run.start()
+
+    def profile_program(self):
+        self.run_program(PROFILE_MODES[self.profile_mode.currentText()]())
+
+    def export_profile(self):
+        profile = self.editor.profile
+        if profile is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Profile", "profile.json",
+            "JSON (*.json);;Flamegraph collapsed (*.folded)")
+        if path:
+            profile.save(path)
+
+    def debug_program(self):
+        lines = {block + 1 for block in self.editor.breakpoints}
+        self.run_program(debugger=Debugger(lines, on_pause=self.paused.emit))
+
+    def update_breakpoints(self):
+        if self.debugger is not None:
+            self.debugger.set_breakpoints({block + 1 for block in self.editor.breakpoints})
+
+    def pause_run(self, line):
+        # firul rularii asteapta: ctx-ul poate fi citit fara grija
+        if self.run is None:
+            return
+        self.refresh_run()
+        self.editor.show_paused(line - 1)
+        self.continue_btn.setEnabled(True)
+        self.step_btn.setEnabled(True)
+
+    def continue_program(self):
+        self.leave_pause()
+        self.debugger.resume()
+
+    def step_program(self):
+        self.leave_pause()
+        self.debugger.step()
+
+    def leave_pause(self):
+        self.continue_btn.setEnabled(False)
+        self.step_btn.setEnabled(False)
+        self.editor.show_paused(-1)
+
+    def show_variables(self, ctx):
+        mode = self.display_mode.currentText()
+        values = list(ctx.mem.items())
+        self.variables.setRowCount(len(values))
+        for row, (name, value) in enumerate(values):
+            if type(value) is int and value.bit_length() > BIG_BITS:
+                # fara conversia completa a numerelor foarte mari
+                text = scientific(value)
+            else:
+                text = display([format_value(value)], mode)
+            self.variables.setItem(row, 0, QTableWidgetItem(name))
+            self.variables.setItem(row, 1, QTableWidgetItem(text))
+
+    def stop_program(self):
+        if self.run is not None:
+            self.run.stop()
+        if self.debugger is not None:
+            self.debugger.stop()
+
+    def refresh_run(self):
+        # iesirea noua, pe loturi: o singura actualizare a panoului per interval
+        lines = self.live.drain()
+        if lines:
+            self.output_lines += lines
+            del self.output_lines[:-OUTPUT_LINES]
+            self.output.appendPlainText(display(lines, self.display_mode.currentText()))
+
+        if self.run is not None:
+            now = time.perf_counter()
+            steps = self.run.steps
+            rate = (steps - self.last_steps) / max(now - self.last_time, 1e-9)
+            self.last_steps, self.last_time = steps, now
+            self.speed.setText(f"{rate:,.0f} instr/s")
+            if self.debugger is not None:
+                self.show_variables(self.run.ctx)
+
+    def finish_run(self, error):
+        self.refresh_timer.stop()
+        self.refresh_run()
+        steps = self.run.steps
+        self.run.join()
+        if self.debugger is not None:
+            self.show_variables(self.run.ctx)
+            self.leave_pause()
+            self.debugger = None
+        self.run = None
+        self.run_btn.setEnabled(True)
+        self.profile_btn.setEnabled(True)
+        self.debug_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.speed.setText(f"{steps:,} instr in {time.perf_counter() - self.started:.2f} s")
+        if error is not None:
+            self.output.appendPlainText(str(error))
+
+        # si o rulare oprita are profilul de pana atunci; daca textul s-a
+        # schimbat intre timp, liniile nu mai corespund
+        profile = self.profiler.result if self.profiler is not None else None
+        self.profiler = None
+        if profile is not None and self.editor.toPlainText() == self.run_text:
+            self.editor.show_heat(profile)
+        self.export_btn.setEnabled(self.editor.profile is not None)
+
+    def ask_input(self, var_name=None):
+        # CITESTE din firul rularii: dialogul e deschis aici, pe firul GUI
+        if self.run is None:
+            return
+        label = f"Introduceți valoarea:"
+        if var_name:
+            label = f"Introduceți valoarea pentru {var_name}:"
+
+        value, ok = QInputDialog.getText(
+            self,
+            "Input necesar",
+            label
+        )
 
-            # ===============================
+        if self.run is None:
+            return
+        if not ok:
+            self.run.answer(Exception("Input anulat de utilizator"))
+            return
 
-            engine.run(program, ctx)
+        # conversie automată numerică
+        if value.isdigit():
+            self.run.answer(int(value))
+            return
 
-            self.output.setPlainText("\n".join(ctx.output))
+        try:
+            self.run.answer(float(value))
+        except:
+            self.run.answer(value)
 
-        except Exception as e:
-            self.output.setPlainText(str(e))
+    def show_output(self, *_):
+        self.output.setPlainText(display(self.output_lines, self.display_mode.currentText()))
 
 
 # =========================================================
@@ -0,0 +1,274 @@
+# kalk/induction.py
+#
+# Accelerarea buclelor cu variabila de inductie. O bucla de forma
+#
+#     CATTIMP i <= n EXECUTA
+#         ... atribuiri afine (s <- s + i, a <- b, t <- a + b) ...
+#         f <- f * i
+#         i <- i + 1
+#     SFARSIT
+#
+# e o transformare afina a starii repetata de K ori, cu K calculat din
+# conditie. Partea afina se calculeaza prin ridicare la putere de matrice
+# (O(log K) inmultiri), iar acumulatorii de produs ca produs pe o
+# progresie aritmetica, prin injumatatire. Daca la executie valorile nu
+# sunt toate int, se ruleaza bucla obisnuita.
+
+import math
+
+from .ast_nodes import *
+
+MAX_DEPTH = 200
+# sub atatea iteratii bucla obisnuita e mai ieftina
+MIN_TRIP = 16
+
+DIRECTION = {"<": 1, "<=": 1, ">": -1, ">=": -1}
+
+
+class InductionLoop(WhileInstr):
+    __slots__ = ("counter", "step", "bound", "assigns", "state")
+
+    def __init__(self, loop, counter, step, assigns, state):
+        super().__init__(loop.cond, loop.body, loop.line)
+        self.counter = counter   # slotul variabilei de inductie
+        self.step = step         # pasul constant al contorului
+        self.bound = loop.cond.right
+        # (slot, expresie, None) pentru atribuiri afine sau
+        # (slot, factor, decalaj) pentru acumulatori "f <- f * factor"
+        self.assigns = assigns
+        self.state = state       # sloturile cu actualizare afina
+
+    def exec(self, ctx):
+        if not self.jump(ctx):
+            WhileInstr.exec(self, ctx)
+
+    def trip_count(self, start, bound):
+        op, step = self.cond.op, abs(self.step)
+        if self.step < 0:
+            start, bound = -start, -bound
+        if op in ("<=", ">="):
+            return max(0, (bound - start) // step + 1)
+        return max(0, (bound - start + step - 1) // step)
+
+    def jump(self, ctx):
+        """Aplica forma inchisa; intoarce False daca trebuie rulata bucla obisnuita."""
+        s = ctx.slots
+        start = s[self.counter]
+        bound = self.bound.eval(ctx)
+        if type(start) is not int or type(bound) is not int:
+            return False
+        trips = self.trip_count(start, bound)
+        if trips < MIN_TRIP:
+            return False
+        if any(type(s[slot]) is not int for slot, _, _ in self.assigns):
+            return False
+
+        index = {slot: k for k, slot in enumerate(self.state)}
+        one = len(self.state)
+        size = one + 1
+        # randul k al matricei: valoarea curenta a variabilei k, ca
+        # combinatie afina de valorile de la intrarea in iteratie
+        matrix = [[int(r == c) for c in range(size)] for r in range(size)]
+        products = []
+        try:
+            for slot, expr, offset in self.assigns:
+                if offset is not None:
+                    products.append((slot, affine(expr, s, index), offset))
+                    continue
+                coeffs, const = affine(expr, s, index)
+                row = [const * v for v in matrix[one]]
+                for k, a in coeffs.items():
+                    if a:
+                        row = [x + a * y for x, y in zip(row, matrix[k])]
+                matrix[index[slot]] = row
+        except (ArithmeticError, TypeError):
+            return False
+
+        vector = [s[slot] for slot in self.state] + [1]
+        power = matrix
+        n = trips
+        while n:
+            if n & 1:
+                vector = [sum(a * v for a, v in zip(row, vector) if a) for row in power]
+            n >>= 1
+            if n:
+                power = mat_mul(power, power)
+
+        for slot, (coeffs, const), offset in products:
+            # factorul e a * i + b, cu i = start + offset + step * k
+            a = coeffs.get(index[self.counter], 0)
+            first = a * (start + offset) + const
+            delta = a * self.step
+            if delta:
+                s[slot] *= range_product(range(first, first + delta * trips, delta))
+            else:
+                s[slot] *= first ** trips
+
+        for slot, value in zip(self.state, vector):
+            s[slot] = value
+        return True
+
+
+def mat_mul(a, b):
+    cols = list(zip(*b))
+    return [[sum(x * y for x, y in zip(row, col) if x and y) for col in cols] for row in a]
+
+
+def range_product(r):
+    # produs prin injumatatire: factori de marimi apropiate, ca la math.factorial
+    if len(r) <= 16:
+        return math.prod(r)
+    mid = len(r) // 2
+    return range_product(r[:mid]) * range_product(r[mid:])
+
+
+def affine(node, s, index):
+    """(coeficienti pe indexul din stare, constanta) pentru o expresie afina."""
+    if isinstance(node, Number):
+        if type(node.value) is not int:
+            raise TypeError
+        return {}, node.value
+    if isinstance(node, Variable):
+        k = index.get(node.slot)
+        if k is not None:
+            return {k: 1}, 0
+        value = s[node.slot]
+        if type(value) is not int:
+            raise TypeError
+        return {}, value
+
+    lc, lk = affine(node.left, s, index)
+    rc, rk = affine(node.right, s, index)
+    if node.op == "+":
+        return merge(lc, rc, 1), lk + rk
+    if node.op == "-":
+        return merge(lc, rc, -1), lk - rk
+    if node.op == "*":
+        if lc:
+            return {k: a * rk for k, a in lc.items()}, lk * rk
+        return {k: a * lk for k, a in rc.items()}, lk * rk
+    # "/" si "%" doar intre invarianti (verificat la compilare)
+    return {}, BIN_OPS[node.op](lk, rk)
+
+
+def merge(left, right, sign):
+    out = dict(left)
+    for k, a in right.items():
+        out[k] = out.get(k, 0) + sign * a
+    return out
+
+
+# =========================================================
+# ANALIZA
+# =========================================================
+
+def variables(node):
+    if isinstance(node, Variable):
+        return {node.slot}
+    if isinstance(node, Number):
+        return set()
+    return variables(node.left) | variables(node.right)
+
+
+def affine_shape(node, variant):
+    # structura permisa: +, - oriunde; * cu cel putin un operand invariant;
+    # / si % doar intre invarianti
+    if isinstance(node, (Number, Variable)):
+        return True
+    if not isinstance(node, BinExpr):
+        return False
+    if node.op in ("+", "-"):
+        return affine_shape(node.left, variant) and affine_shape(node.right, variant)
+    left_var = bool(variables(node.left) & variant)
+    right_var = bool(variables(node.right) & variant)
+    if node.op == "*":
+        if left_var and right_var:
+            return False
+        return affine_shape(node.left, variant) and affine_shape(node.right, variant)
+    return not (left_var or right_var)
+
+
+def analyze(loop):
+    """Argumentele pentru InductionLoop, sau None daca bucla nu se potriveste."""
+    cond = loop.cond
+    if not isinstance(cond, CompareCond) or cond.op not in DIRECTION:
+        return None
+    if not isinstance(cond.left, SlotVar) or not loop.body:
+        return None
+    if cond.depth > MAX_DEPTH:
+        return None
+    if not all(isinstance(i, (DeclInstr, AssignInstr)) and i.depth <= MAX_DEPTH for i in loop.body):
+        return None
+
+    counter = cond.left.slot
+    assigned = [instr.slot for instr in loop.body]
+    variant = set(assigned)
+    if variables(cond.right) & variant or assigned.count(counter) != 1:
+        return None
+
+    # contorul: i <- i + c sau i <- i - c, cu pasul in sensul conditiei
+    at = assigned.index(counter)
+    update = loop.body[at].expr
+    if not (isinstance(update, BinExpr) and update.op in ("+", "-")
+            and isinstance(update.left, SlotVar) and update.left.slot == counter
+            and isinstance(update.right, Number) and type(update.right.value) is int):
+        return None
+    step = update.right.value if update.op == "+" else -update.right.value
+    if step * DIRECTION[cond.op] <= 0:
+        return None
+
+    # acumulatori de produs: f <- f * factor, cu factorul depinzand doar de
+    # contor si f necitit in rest
+    products = {}
+    for k, instr in enumerate(loop.body):
+        expr = instr.expr
+        if k == at or not isinstance(expr, BinExpr) or expr.op != "*":
+            continue
+        for own, factor in ((expr.left, expr.right), (expr.right, expr.left)):
+            if isinstance(own, SlotVar) and own.slot == instr.slot:
+                break
+        else:
+            continue
+        others = [i for j, i in enumerate(loop.body) if j != k]
+        if (assigned.count(instr.slot) == 1
+                and variables(factor) & variant <= {counter}
+                and not any(instr.slot in variables(i.expr) for i in others)
+                and instr.slot not in variables(cond)
+                and affine_shape(factor, variant)):
+            products[k] = factor
+
+    assigns = []
+    for k, instr in enumerate(loop.body):
+        if k in products:
+            offset = step if at < k else 0
+            assigns.append((instr.slot, products[k], offset))
+        elif affine_shape(instr.expr, variant):
+            assigns.append((instr.slot, instr.expr, None))
+        else:
+            return None
+
+    state = sorted({slot for slot, _, offset in assigns if offset is None})
+    return counter, step, assigns, state
+
+
+def accelerate_loops(program):
+    """Pasa de optimizare: inlocuieste buclele potrivite cu InductionLoop.
+
+    Intoarce numarul de noduri scoase de pe drumul fiecarei iteratii.
+    """
+    removed = 0
+    stack = [program.body]
+    while stack:
+        body = stack.pop()
+        for k, instr in enumerate(body):
+            if isinstance(instr, IfInstr):
+                stack.append(instr.then_body)
+                stack.append(instr.else_body)
+            elif isinstance(instr, WhileInstr) and not isinstance(instr, InductionLoop):
+                plan = analyze(instr)
+                if plan is None:
+                    stack.append(instr.body)
+                    continue
+                body[k] = InductionLoop(instr, *plan)
+                removed += 1 + len(instr.body)
+    return removed
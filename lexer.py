@@ -1,5 +1,8 @@
 # kalk/lexer.py
 
+import mmap
+import re
+
 KEYWORDS = {
     "CITESTE", "DECLAR", "VALOARE",
     "DACA", "ATUNCI", "ALTFEL",
@@ -7,54 +10,112 @@ KEYWORDS = {
     "SCRIE", "SI", "SAU"
 }
 
-OPERATORS = {"<-", "+", "-", "*", "/", "%", "==", "!=", "<=", ">=", "<", ">"}
+OPERATORS = {"<-", ":", "+", "-", "*", "/", "%", "==", "!=", "<=", ">=", "<", ">"}
+
+# un singur pattern compilat o data; operatorii lungi inaintea celor scurti
+_OPS = "|".join(re.escape(op) for op in sorted(OPERATORS, key=len, reverse=True))
+
+TOKEN_RE = re.compile(
+    r"(?P<NL>\n)"
+    r"|(?P<WS>[^\S\n]+)"
+    r"|(?P<NUMBER>\d+)"
+    r"|(?P<NAME>[^\W\d_][^\W_]*)"
+    r"|(?P<OP>" + _OPS + r")"
+    r"|(?P<ERR>.)"
+)
+
 
 class Token:
-    def __init__(self, type_, value):
+    __slots__ = ("type", "value", "line", "col")
+
+    def __init__(self, type_, value, line=0, col=0):
         self.type = type_
         self.value = value
+        self.line = line
+        self.col = col
 
     def __repr__(self):
         return f"{self.type}({self.value})"
 
 
+def _scan(text, line):
+    # genereaza tokenii fara EOF; intoarce (linie, coloana) de la final
+    line_start = 0
+    for m in TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "WS":
+            continue
+        if kind == "NL":
+            line += 1
+            line_start = m.end()
+            continue
+
+        start = m.start()
+        value = m.group()
+        col = start - line_start + 1
+
+        if kind == "NUMBER":
+            yield Token("NUMBER", int(value), line, col)
+        elif kind == "NAME":
+            upper = value.upper()
+            if upper in KEYWORDS:
+                yield Token("KEYWORD", upper, line, col)
+            else:
+                yield Token("IDENT", value, line, col)
+        elif kind == "OP":
+            yield Token("OP", value, line, col)
+        else:
+            raise Exception(f"Caracter necunoscut: {value} (linia {line}, coloana {col})")
+
+    return line, len(text) - line_start + 1
+
+
+def tokenize(text, line=1):
+    """Genereaza tokenii din text, cu linie si coloana (numerotate de la 1)."""
+    line, col = yield from _scan(text, line)
+    yield Token("EOF", "", line, col)
+
+
+def tokenize_lines(lines):
+    """Ca tokenize, dar pe o sursa data linie cu linie (cu terminatorul inclus)."""
+    line, col = 1, 1
+    for number, text in enumerate(lines, 1):
+        line, col = yield from _scan(text, number)
+    yield Token("EOF", "", line, col)
+
+
+def read_lines(path, encoding="utf-8"):
+    """Citeste un fisier .kalk linie cu linie, prin mmap cand se poate."""
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # fisier gol sau care nu se poate mapa: citire bufferata
+            for raw in f:
+                yield raw.decode(encoding)
+            return
+        with mm:
+            for raw in iter(mm.readline, b""):
+                yield raw.decode(encoding)
+
+
+def tokenize_file(path, encoding="utf-8"):
+    return tokenize_lines(read_lines(path, encoding))
+
+
 class Lexer:
     def __init__(self, text):
         self.text = text
-        self.pos = 0
-
-    def peek(self):
-        return self.text[self.pos] if self.pos < len(self.text) else None
+        self._stream = None
 
-    def advance(self):
-        self.pos += 1
+    def tokens(self):
+        return tokenize(self.text)
 
     def next_token(self):
-        while self.peek() and self.peek().isspace():
-            self.advance()
-
-        if self.peek() is None:
+        if self._stream is None:
+            self._stream = self.tokens()
+        tok = next(self._stream, None)
+        if tok is None:
+            # dupa EOF raspundem tot cu EOF, ca varianta veche
             return Token("EOF", "")
-
-        if self.peek().isdigit():
-            num = ""
-            while self.peek() and self.peek().isdigit():
-                num += self.peek()
-                self.advance()
-            return Token("NUMBER", int(num))
-
-        if self.peek().isalpha():
-            ident = ""
-            while self.peek() and self.peek().isalnum():
-                ident += self.peek()
-                self.advance()
-            if ident.upper() in KEYWORDS:
-                return Token("KEYWORD", ident.upper())
-            return Token("IDENT", ident)
-
-        for op in sorted(OPERATORS, key=len, reverse=True):
-            if self.text[self.pos:self.pos+len(op)] == op:
-                self.pos += len(op)
-                return Token("OP", op)
-
-        raise Exception(f"Caracter necunoscut: {self.peek()}")
+        return tok
@@ -0,0 +1,250 @@
+# kalk/library.py
+#
+# Indexul bibliotecilor de programe (programs/, user_programs/): un fisier
+# SQLite cu numele, hash-ul, marimea, variabilele citite si starea
+# parsarii fiecarui .kalk. Lista de programe vine din index, fara
+# os.listdir, deci o biblioteca mare se deschide imediat; un LibraryWatcher
+# tine indexul la zi in fundal si precompileaza programele noi sau
+# modificate in cache-ul de pe disc (progcache), ca prima rulare sa nu mai
+# treaca prin front-end.
+#
+#     index = LibraryIndex()
+#     watcher = LibraryWatcher(index, ["programs"], on_change=refresh)
+#     watcher.start()
+#     index.names("programs")
+
+import os
+import sqlite3
+import threading
+
+from .ast_nodes import InputInstr
+from .optimizer import DEFAULT_PASSES, bodies
+from . import progcache, transpiler
+
+INDEX_FILE = "library.sqlite"
+SUFFIX = ".kalk"
+# intervalul de verificare a directoarelor, in secunde
+POLL_INTERVAL = 1.0
+# rezultatele analizei sunt scrise in index pe loturi (o tranzactie per lot)
+BATCH = 64
+PENDING = "necompilat"
+OK = "ok"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS programs (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    inputs TEXT,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS programs_by_dir ON programs (directory, name);
+"""
+
+
+def index_path():
+    directory = progcache.cache_dir()
+    if directory is None:
+        # cache dezactivat: indexul traieste doar cat procesul
+        return ":memory:"
+    return os.path.join(directory, INDEX_FILE)
+
+
+class ProgramInfo:
+    __slots__ = ("path", "name", "size", "hash", "inputs", "status")
+
+    def __init__(self, path, name, size, hash, inputs, status):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.hash = hash         # source_key al textului, None pana la analiza
+        self.inputs = inputs     # variabilele din CITESTE: ["n", "x:INTREG", ...]
+        self.status = status     # OK, PENDING sau mesajul erorii de parsare
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    def __repr__(self):
+        return f"ProgramInfo({self.name!r}, {self.status!r})"
+
+
+class LibraryIndex:
+    """Indexul SQLite; sigur de folosit din mai multe fire (o conexiune, un lock)."""
+
+    def __init__(self, path=None, passes=DEFAULT_PASSES):
+        self.path = path or index_path()
+        self.passes = passes
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.db:
+            if self.path != ":memory:":
+                # cititorii (GUI) nu asteapta dupa scrierile watcher-ului
+                self.db.execute("PRAGMA journal_mode = WAL")
+                self.db.execute("PRAGMA synchronous = NORMAL")
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # ---------- INTEROGARI ----------
+
+    def programs(self, directory):
+        directory = os.path.abspath(directory)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT path, name, size, hash, inputs, status FROM programs"
+                " WHERE directory = ? ORDER BY name", (directory,)).fetchall()
+        return [ProgramInfo(path, name, size, h, inputs.split(",") if inputs else [], status)
+                for path, name, size, h, inputs, status in rows]
+
+    def names(self, directory):
+        directory = os.path.abspath(directory)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT name FROM programs WHERE directory = ? ORDER BY name", (directory,)).fetchall()
+        return [name for name, in rows]
+
+    def info(self, path):
+        path = os.path.abspath(path)
+        for program in self.programs(os.path.dirname(path)):
+            if program.path == path:
+                return program
+        return None
+
+    # ---------- ACTUALIZARE ----------
+
+    def sync(self, directory):
+        """Aduce indexul la zi cu directorul, doar pe baza stat(); fisierele
+        noi sau modificate raman PENDING pana la analyze(). Intoarce True
+        daca s-a schimbat ceva."""
+        directory = os.path.abspath(directory)
+        seen = {}
+        try:
+            with os.scandir(directory) as it:
+                for e in it:
+                    if e.name.endswith(SUFFIX) and e.is_file():
+                        st = e.stat()
+                        seen[e.path] = (e.name, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+
+        with self.lock, self.db:
+            known = {path: (size, mtime) for path, size, mtime in self.db.execute(
+                "SELECT path, size, mtime_ns FROM programs WHERE directory = ?", (directory,))}
+            gone = [(path,) for path in known if path not in seen]
+            changed = [
+                (path, directory, name, size, mtime, PENDING)
+                for path, (name, size, mtime) in seen.items()
+                if known.get(path) != (size, mtime)
+            ]
+            self.db.executemany("DELETE FROM programs WHERE path = ?", gone)
+            self.db.executemany(
+                "INSERT INTO programs (path, directory, name, size, mtime_ns, status)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (path) DO UPDATE SET size = excluded.size,"
+                " mtime_ns = excluded.mtime_ns, status = excluded.status", changed)
+        return bool(gone or changed)
+
+    def pending(self):
+        with self.lock:
+            return [path for path, in self.db.execute(
+                "SELECT path FROM programs WHERE status = ?", (PENDING,))]
+
+    def analyze(self, path):
+        """Parseaza si precompileaza un program; intoarce (hash, variabile
+        citite, stare, cale) pentru store(), sau None daca fisierul a disparut."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            # sters intre timp: urmatorul sync il scoate din index
+            return None
+        key = transpiler.source_key(text)
+        inputs = []
+        try:
+            program, _ = transpiler.compile_source(text, self.passes)
+            for body in bodies(program.body):
+                for instr in body:
+                    if isinstance(instr, InputInstr):
+                        inputs.append(instr.var if instr.kind is None else f"{instr.var}:{instr.kind}")
+            status = OK
+        except Exception as e:
+            status = str(e) or type(e).__name__
+        return key, ",".join(dict.fromkeys(inputs)), status, path
+
+    def store(self, results):
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE programs SET hash = ?, inputs = ?, status = ? WHERE path = ?",
+                [r for r in results if r is not None])
+
+    def analyze_pending(self, stopped=lambda: False):
+        """Analizeaza programele PENDING, pe loturi; intoarce cate au fost."""
+        pending = self.pending()
+        for start in range(0, len(pending), BATCH):
+            if stopped():
+                break
+            self.store([self.analyze(path) for path in pending[start:start + BATCH]])
+        return len(pending)
+
+    def refresh(self, directories):
+        """sync + analiza pentru toate directoarele; True daca s-a schimbat ceva."""
+        changed = False
+        for directory in directories:
+            changed |= self.sync(directory)
+        return bool(self.analyze_pending()) or changed
+
+
+class LibraryWatcher(threading.Thread):
+    """Fir de fundal care verifica periodic directoarele si tine indexul la zi.
+
+    on_change() e apelat (din acest fir) dupa fiecare schimbare: o data cand
+    lista de nume e gata si inca o data dupa analiza programelor noi.
+    """
+
+    def __init__(self, index, directories, on_change=None, interval=POLL_INTERVAL):
+        super().__init__(name="kalk-library", daemon=True)
+        self.index = index
+        self.directories = list(directories)
+        self.on_change = on_change
+        self.interval = interval
+        self.wake = threading.Event()
+        self.stopped = False
+
+    def run(self):
+        while not self.stopped:
+            try:
+                self.check()
+            except sqlite3.Error:
+                # indexul a fost inchis (ex. la iesirea din GUI)
+                return
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    def check(self):
+        changed = False
+        for directory in self.directories:
+            changed |= self.index.sync(directory)
+        if changed:
+            self.notify()
+        if self.index.analyze_pending(lambda: self.stopped):
+            self.notify()
+
+    def notify(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def poke(self):
+        """Verificare imediata (ex. dupa salvarea unui program)."""
+        self.wake.set()
+
+    def stop(self):
+        self.stopped = True
+        self.wake.set()
@@ -1,4 +1,185 @@
-from .gui import start_gui
+# kalk/main.py
+#
+# Punctul de intrare al pachetului:
+#
+#     python -m kalk run programs/fib.kalk < intrari.txt
+#     python -m kalk run programs/fib.kalk --var n=30
+#     python -m kalk check programs/prim.kalk
+#     python -m kalk compile programs/fib.kalk -o fib.kbc
+#     python -m kalk                      # interfata grafica (sau: ide)
+#
+# Comenzile din linia de comanda importa doar front-end-ul si motorul;
+# PySide6 se incarca numai cand e ceruta interfata grafica.
+
+import sys
+from types import SimpleNamespace
+
+from .ast_nodes import Context
+from .engine import Engine
+from .optimizer import DEFAULT_PASSES
+from .parser import parse_file
+
+# pentru o singura rulare closure-urile pornesc cel mai repede: nu trec
+# prin compile() ca modul "python", iar programele prea adanci pentru ele
+# trec singure pe walker-ul cu stiva explicita
+RUN_MODE = "closure"
+BYTECODE_SUFFIX = ".kbc"
+# sub atatia octeti de sursa front-end-ul e mai rapid decat importurile
+# (pickle, zlib, hashlib) de care are nevoie cache-ul de pe disc
+CACHE_MIN_SOURCE = 4096
+
+
+def load_program(path):
+    """Bytecode (.kbc) sau AST-ul unui fisier .kalk."""
+    if path.endswith(BYTECODE_SUFFIX):
+        from .bytecode import Bytecode
+        return Bytecode.load(path)
+    return parse_file(path)
+
+
+def parse_vars(items):
+    from .channels import parse_number
+    values = {}
+    for item in items:
+        name, sep, text = item.partition("=")
+        if not sep:
+            raise Exception(f"Asteptam nume=valoare, nu {item!r}")
+        try:
+            values[name] = parse_number(text)
+        except ValueError:
+            values[name] = text
+    return values
+
+
+# ---------- COMENZI ----------
+
+def cmd_run(args):
+    from .channels import KeyedInput, StdinInput
+    from .sinks import StreamSink
+
+    passes = () if args.no_opt else DEFAULT_PASSES
+    channel = KeyedInput(parse_vars(args.var)) if args.var else StdinInput()
+    ctx = Context(channel=channel, output=StreamSink(sys.stdout))
+    engine = Engine(args.mode, passes)
+    if args.program.endswith(BYTECODE_SUFFIX):
+        engine.run(load_program(args.program), ctx)
+    else:
+        with open(args.program, encoding="utf-8") as f:
+            text = f.read()
+        if len(text) < CACHE_MIN_SOURCE:
+            from . import progcache
+            progcache.set_default(None)
+        engine.run_source(text, ctx)
+    return 0
+
+
+def cmd_check(args):
+    from .resolver import resolve
+    from . import typecheck
+
+    report = typecheck.check(resolve(parse_file(args.program)))
+    for message in report.errors:
+        print(f"{args.program}: eroare: {message}")
+    for message in report.warnings:
+        print(f"{args.program}: avertisment: {message}")
+    if not report.analyzed:
+        print(f"{args.program}: program prea imbricat pentru verificarea tipurilor")
+    return 1 if report.errors else 0
+
+
+def cmd_compile(args):
+    from .resolver import resolve
+    from . import bytecode, optimizer
+
+    program = resolve(parse_file(args.program))
+    if not args.no_opt:
+        optimizer.optimize(program)
+    bc = bytecode.compile_program(program)
+    if args.dis:
+        print(bytecode.disassemble(bc))
+        return 0
+    out = args.output or args.program.rsplit(".", 1)[0] + BYTECODE_SUFFIX
+    bc.save(out)
+    return 0
+
+
+def cmd_ide(args):
+    from .gui import start_gui
+    start_gui()
+    return 0
+
+
+def build_parser():
+    import argparse
+    ap = argparse.ArgumentParser(prog="kalk", description="Limbajul KALK.")
+    sub = ap.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="ruleaza un program (.kalk sau .kbc)")
+    run.add_argument("program")
+    run.add_argument("-m", "--mode", choices=Engine.MODES, default=RUN_MODE,
+                     help=f"modul de executie (implicit {RUN_MODE})")
+    run.add_argument("--var", action="append", default=[], metavar="NUME=VALOARE",
+                     help="valoarea citita de CITESTE NUME (altfel: stdin)")
+    run.add_argument("--no-opt", action="store_true", help="fara pasele de optimizare")
+    run.set_defaults(fn=cmd_run)
+
+    check = sub.add_parser("check", help="verifica sintaxa si tipurile")
+    check.add_argument("program")
+    check.set_defaults(fn=cmd_check)
+
+    comp = sub.add_parser("compile", help="compileaza in bytecode")
+    comp.add_argument("program")
+    comp.add_argument("-o", "--output", help=f"fisierul {BYTECODE_SUFFIX} (implicit langa sursa)")
+    comp.add_argument("--dis", action="store_true", help="afiseaza bytecode-ul in loc sa-l scrie")
+    comp.add_argument("--no-opt", action="store_true", help="fara pasele de optimizare")
+    comp.set_defaults(fn=cmd_compile)
+
+    ide = sub.add_parser("ide", help="porneste interfata grafica")
+    ide.set_defaults(fn=cmd_ide)
+    return ap
+
+
+def quick_run_args(argv):
+    """Argumentele unui "run" simplu, fara argparse (care singur dubleaza
+    timpul de pornire); None pentru orice altceva, lasat lui argparse."""
+    if len(argv) < 2 or argv[0] != "run" or argv[1].startswith("-"):
+        return None
+    args = SimpleNamespace(fn=cmd_run, program=argv[1], mode=RUN_MODE, var=[], no_opt=False)
+    rest = iter(argv[2:])
+    for arg in rest:
+        if arg == "--no-opt":
+            args.no_opt = True
+        elif arg in ("-m", "--mode", "--var"):
+            value = next(rest, None)
+            if value is None or (arg != "--var" and value not in Engine.MODES):
+                return None
+            if arg == "--var":
+                args.var.append(value)
+            else:
+                args.mode = value
+        else:
+            return None
+    return args
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    args = quick_run_args(argv) or build_parser().parse_args(argv)
+    fn = getattr(args, "fn", cmd_ide)
+    try:
+        return fn(args)
+    except BrokenPipeError:
+        # ex. python -m kalk run ... | head: cititorul a inchis fluxul
+        sys.stderr.close()
+        return 0
+    except OSError as e:
+        print(f"kalk: {e}", file=sys.stderr)
+        return 2
+    except Exception as e:
+        print(f"{getattr(args, 'program', 'kalk')}: {e}", file=sys.stderr)
+        return 1
+
 
 if __name__ == "__main__":
-    start_gui()
\ No newline at end of file
+    sys.exit(main())
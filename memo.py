@@ -0,0 +1,232 @@
+# kalk/memo.py
+#
+# Memorarea rezultatelor. Singurul efect al unui program KALK e SCRIE, deci
+# iesirea (si eventuala eroare) depinde doar de sursa si de valorile citite.
+# Cand acestea se cunosc dinainte (un canal KeyedInput sau ListInput
+# neinceput, ori niciun canal), Engine(memo=ResultCache()) raspunde din
+# cache fara sa mai ruleze programul:
+#
+#     engine = Engine("python", memo=ResultCache(path="rezultate.memo"))
+#     engine.run_source(text, Context(channel=KeyedInput({"n": 97})))
+#
+# Cache-ul e LRU, limitat in intrari si in octeti; cu path e incarcat la
+# creare si scris pe disc de save().
+
+import hashlib
+import os
+from collections import OrderedDict
+
+from .ast_nodes import *
+from .resolver import Program
+
+# schimbat cand se schimba forma intrarilor; cheile vechi (si fisierele
+# scrise de save()) nu mai sunt gasite
+FORMAT = 1
+MAX_ENTRIES = 10000
+MAX_BYTES = 32 << 20
+# costul aproximativ al unei intrari, in afara textului memorat
+ENTRY_BYTES = 160
+
+# instructiunile fara alte efecte decat SCRIE si variabilele programului
+DETERMINISTIC = (InputInstr, DeclInstr, AssignInstr, OutputInstr, IfInstr, WhileInstr)
+# erori care tin de mediu (memorie, stiva), nu de program
+TRANSIENT = (MemoryError, RecursionError)
+
+
+def program_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def deterministic(program):
+    """True daca rezultatul programului depinde doar de valorile citite."""
+    if not isinstance(program, Program):
+        # PyProgram / Bytecode: generate din aceleasi noduri
+        return True
+    todo = [program.body]
+    while todo:
+        for instr in todo.pop():
+            if not isinstance(instr, DETERMINISTIC):
+                return False
+            if isinstance(instr, IfInstr):
+                todo += [instr.then_body, instr.else_body]
+            elif isinstance(instr, WhileInstr):
+                todo.append(instr.body)
+    return True
+
+
+def input_key(ctx):
+    """Valorile pe care le va citi programul, ca cheie; None daca nu se stiu
+    dinainte (ex. dialogul din GUI) sau daca contextul are deja variabile."""
+    if ctx.names:
+        return None
+    channel = ctx.channel
+    if channel is None:
+        return () if ctx.input_provider is None else None
+    memo_key = getattr(channel, "memo_key", None)
+    return memo_key() if memo_key is not None else None
+
+
+class Recorder:
+    """Destinatie intermediara: transmite liniile si le pastreaza pentru memo."""
+
+    def __init__(self, output, limit):
+        self.output = output
+        self.lines = []
+        self.size = 0
+        self.limit = limit
+
+    def append(self, line):
+        self.output.append(line)
+        lines = self.lines
+        if lines is not None:
+            self.size += len(line)
+            if self.size > self.limit:
+                self.lines = None   # prea mare pentru cache
+            else:
+                lines.append(line)
+
+    def flush(self):
+        flush = getattr(self.output, "flush", None)
+        if flush is not None:
+            flush()
+
+
+class ResultCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries = OrderedDict()   # cheie -> (linii, eroare, octeti)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.checked = {}   # cheia programului -> deterministic(...)
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def key(program, inputs, passes):
+        # rularile cu alte pase nu impart rezultatele, ca in cheia din progcache
+        text = f"{FORMAT}\0{program}\0{','.join(passes)}\0{inputs!r}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """(linii, eroare) memorate pentru cheie, sau None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, key, lines, error=None):
+        size = ENTRY_BYTES + len(key) + sum(map(len, lines)) + len(error or "")
+        if size > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[2]
+        self.entries[key] = (list(lines), error, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, _, dropped) = self.entries.popitem(last=False)
+            self.bytes -= dropped
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    # ---------- EXECUTIE ----------
+
+    def run_source(self, engine, text, ctx):
+        """Engine.run_source cu memorare; rularile fara cheie trec direct."""
+        inputs = input_key(ctx)
+        if inputs is None:
+            engine.run(engine.load_source(text), ctx)
+            return
+        pkey = program_key(text)
+        key = self.key(pkey, inputs, engine.passes)
+        hit = self.get(key)
+        if hit is not None:
+            self.replay(hit, ctx)
+            return
+
+        program = engine.load_source(text)
+        ok = self.checked.get(pkey)
+        if ok is None:
+            ok = self.checked[pkey] = deterministic(program)
+        if not ok:
+            engine.run(program, ctx)
+            return
+
+        output = ctx.output
+        if type(output) is list:
+            # lista: liniile noi se iau direct din ea, fara intermediar
+            start, recorder = len(output), None
+        else:
+            recorder = ctx.output = Recorder(output, self.max_bytes)
+        try:
+            engine.run(program, ctx)
+        except TRANSIENT:
+            raise
+        except Exception as e:
+            self.store(key, output, start if recorder is None else recorder, str(e))
+            raise
+        finally:
+            ctx.output = output
+        self.store(key, output, start if recorder is None else recorder, None)
+
+    def store(self, key, output, source, error):
+        lines = output[source:] if type(source) is int else source.lines
+        if lines is not None:
+            self.put(key, lines, error)
+
+    @staticmethod
+    def replay(hit, ctx):
+        lines, error = hit
+        output = ctx.output
+        if type(output) is list:
+            output += lines
+        else:
+            for line in lines:
+                output.append(line)
+            flush = getattr(output, "flush", None)
+            if flush is not None:
+                flush()
+        if error is not None:
+            raise Exception(error)
+
+    # ---------- PERSISTENTA ----------
+
+    def save(self, path=None):
+        """Scrie intrarile (in ordinea LRU) ca JSON lines; atomic."""
+        import json
+        path = path or self.path
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for key, (lines, error, _) in self.entries.items():
+                f.write(json.dumps({"key": key, "output": lines, "error": error}, ensure_ascii=False))
+                f.write("\n")
+        os.replace(tmp, path)
+
+    def load(self, path):
+        import json
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.put(entry["key"], entry["output"], entry["error"])
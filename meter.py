@@ -0,0 +1,36 @@
+# kalk/meter.py
+#
+# Contorul de pasi al unei rulari. Codul generat in varianta "metered"
+# (transpiler.from_source(..., metered=True)) aduna intr-o variabila locala
+# lungimea corpului fiecarei iteratii si o preda lui tick() o data la
+# transpiler.QUANTUM pasi, deci masurarea costa o adunare pe iteratie.
+# tick() e si locul in care o rulare poate fi oprita din alt fir.
+#
+#     ctx.meter = Meter()
+#     engine = Engine("python", metered=True)
+#     ...                      # din alt fir:
+#     ctx.meter.steps          # pasi executati pana acum
+#     ctx.meter.stop()         # rularea se opreste cu Stopped
+
+
+class Stopped(Exception):
+    """Rularea a fost oprita din afara (ex. butonul Stop din GUI)."""
+
+
+class Meter:
+    __slots__ = ("steps", "stopped")
+
+    def __init__(self):
+        self.steps = 0
+        self.stopped = False
+
+    def tick(self, n):
+        """Apelat din codul masurat cu pasii adunati; intoarce noul contor local."""
+        self.steps += n
+        if self.stopped:
+            raise Stopped("Executie oprita")
+        return 0
+
+    def stop(self):
+        # citit de firul rularii la urmatorul tick
+        self.stopped = True
@@ -0,0 +1,122 @@
+# kalk/numfmt.py
+#
+# Afisarea intregilor foarte mari. str(int) e patratic in numarul de cifre
+# si refuza numerele peste limita sys.get_int_max_str_digits() (4300 de
+# cifre implicit), deci SCRIE pe fib(100000) esua. Aici conversia se face
+# prin injumatatire: n = hi * 2**w + lo, cu hi si lo convertite recursiv
+# la decimal.Decimal, unde inmultirile mari sunt subpatratice (libmpdec).
+# Acelasi algoritm ca _pylong din CPython 3.12.
+
+import math
+
+# sub atatia biti str() e deja rapid si sub limita de cifre
+BIG_BITS = 12000
+# frunzele recursiei
+LEAF_BITS = 128
+
+
+def to_decimal(n):
+    """Scrierea in baza 10 a unui int de orice marime."""
+    if -(1 << BIG_BITS) < n < (1 << BIG_BITS):
+        return str(n)
+    # importat aici: pornirea (python -m kalk run) nu plateste pentru el
+    import decimal
+    D = decimal.Decimal
+    powers = {}
+
+    def pow2(w):
+        # 2**w ca Decimal, refolosind puterile deja calculate
+        result = powers.get(w)
+        if result is None:
+            if w <= LEAF_BITS:
+                result = D(1 << w)
+            elif w - 1 in powers:
+                result = powers[w - 1] * 2
+            else:
+                half = w >> 1
+                result = pow2(half) * pow2(w - half)
+            powers[w] = result
+        return result
+
+    def convert(n, w):
+        if w <= LEAF_BITS:
+            return D(n)
+        half = w >> 1
+        hi = n >> half
+        lo = n - (hi << half)
+        return convert(lo, half) + convert(hi, w - half) * pow2(half)
+
+    with decimal.localcontext() as ctx:
+        ctx.prec = decimal.MAX_PREC
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        ctx.traps[decimal.Inexact] = True
+        text = str(convert(abs(n), n.bit_length()))
+    return "-" + text if n < 0 else text
+
+
+def format_value(value):
+    """Textul afisat de SCRIE pentru o valoare."""
+    if type(value) is int and value.bit_length() > BIG_BITS:
+        return to_decimal(value)
+    return str(value)
+
+
+# ---------- AFISARE PRESCURTATA ----------
+
+def digit_count(n):
+    """Numarul de cifre zecimale ale lui n, fara conversia completa."""
+    n = abs(n)
+    if n < 10:
+        return 1
+    # n >= 2**(biti-1), deci estimarea e exacta sau cu 1 prea mica (la
+    # rotunjirea float-ului se poate abate si in sus)
+    guess = int((n.bit_length() - 1) * math.log10(2)) + 1
+    if n >= 10 ** guess:
+        return guess + 1
+    if n < 10 ** (guess - 1):
+        return guess - 1
+    return guess
+
+
+def scientific(n, precision=6):
+    """n in notatie stiintifica (ex. 2.597875e+20898), fara conversia completa."""
+    if type(n) is not int or abs(n) < 10 ** (precision + 1):
+        return str(n)
+    exp = digit_count(n) - 1
+    # primele cifre: impartire la o putere a lui 10 mult mai mica decat n
+    lead = abs(n) // 10 ** (exp - precision)
+    digits = str(lead)
+    sign = "-" if n < 0 else ""
+    return f"{sign}{digits[0]}.{digits[1:precision + 1]}e+{exp}"
+
+
+def abbreviate(line, limit=80, keep=20):
+    """O linie de iesire scurtata pentru afisare: primele si ultimele keep
+    caractere ale unui numar lung, cu numarul de cifre intre ele."""
+    if len(line) <= limit:
+        return line
+    digits = len(line) - (line[0] == "-")
+    return f"{line[:keep]}...{line[-keep:]} ({digits} cifre)"
+
+
+def scientific_line(line, precision=6):
+    """Ca scientific, dar pe textul deja scris al unui intreg."""
+    digits = line.lstrip("-")
+    if not digits.isdigit() or len(digits) <= precision + 1:
+        return line
+    sign = line[:len(line) - len(digits)]
+    return f"{sign}{digits[0]}.{digits[1:precision + 1]}e+{len(digits) - 1}"
+
+
+DISPLAY_MODES = {
+    "complet": lambda line: line,
+    "prescurtat": abbreviate,
+    "stiintific": scientific_line,
+}
+
+
+def display(lines, mode="complet"):
+    """Liniile de iesire pregatite pentru panoul GUI, in modul de afisare dat."""
+    shorten = DISPLAY_MODES[mode]
+    return "\n".join(shorten(line) for line in lines)
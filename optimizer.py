@@ -0,0 +1,351 @@
+# kalk/optimizer.py
+#
+# Pase de optimizare peste un resolver.Program. Ruleaza inaintea oricarui
+# mod de executie, deci toate backend-urile profita fara modificari.
+# Fiecare pasa modifica programul pe loc (e o copie facuta de resolve) si
+# intoarce cate noduri a eliminat.
+
+from .ast_nodes import *
+from .induction import accelerate_loops
+from .typecheck import specialize_types
+
+# expresiile mai adanci sunt lasate neatinse (pasele sunt recursive pe expresii)
+MAX_DEPTH = 200
+
+
+# =========================================================
+# UTILITARE
+# =========================================================
+
+def bodies(body):
+    """Genereaza toate corpurile de instructiuni, inclusiv cele imbricate.
+
+    Copiii unui corp sunt cititi dupa ce apelantul l-a prelucrat, deci
+    corpul poate fi modificat pe loc intre doi pasi.
+    """
+    stack = [body]
+    while stack:
+        b = stack.pop()
+        yield b
+        for instr in b:
+            if isinstance(instr, IfInstr):
+                stack.append(instr.else_body)
+                stack.append(instr.then_body)
+            elif isinstance(instr, WhileInstr):
+                stack.append(instr.body)
+
+
+def count_nodes(body):
+    total = 0
+    todo = list(body)
+    while todo:
+        node = todo.pop()
+        total += 1
+        if isinstance(node, IfInstr):
+            todo += [node.cond, *node.then_body, *node.else_body]
+        elif isinstance(node, WhileInstr):
+            todo += [node.cond, *node.body]
+        elif isinstance(node, (BinExpr, CompareCond, LogicalCond)):
+            todo += [node.left, node.right]
+        elif getattr(node, "expr", None) is not None:
+            todo.append(node.expr)
+    return total
+
+
+def exprs_of(instr):
+    # numele atributelor care contin expresii evaluate direct de instructiune
+    if isinstance(instr, (IfInstr, WhileInstr)):
+        return ("cond",)
+    if isinstance(instr, (DeclInstr, AssignInstr, OutputInstr)):
+        return ("expr",)
+    return ()
+
+
+def set_expr(instr, attr, expr):
+    setattr(instr, attr, expr)
+    if attr == "expr":
+        instr.depth = expr.depth
+
+
+def node_key(node):
+    """Cheie structurala: expresii egale au aceeasi cheie."""
+    if isinstance(node, Number):
+        return ("#", node.value)
+    if isinstance(node, Variable):
+        return ("$", node.name)
+    return (node.op, node_key(node.left), node_key(node.right))
+
+
+def is_leaf(node):
+    return isinstance(node, (Number, Variable))
+
+
+def new_temp(program, prefix="_t"):
+    name = f"{prefix}{len(program.symbols)}"
+    program.symbols.append(name)
+    return name, len(program.symbols) - 1
+
+
+def replace_keys(node, temps):
+    # inlocuieste subexpresiile cu chei din temps cu variabila temporara
+    if node.depth > MAX_DEPTH or is_leaf(node):
+        return node
+    var = temps.get(node_key(node))
+    if var is not None:
+        return var
+    left = replace_keys(node.left, temps)
+    right = replace_keys(node.right, temps)
+    if left is node.left and right is node.right:
+        return node
+    return NODES[node.op](node.op, left, right)
+
+
+def assigned_slots(body):
+    slots = set()
+    for b in bodies(body):
+        for instr in b:
+            if isinstance(instr, (InputInstr, DeclInstr, AssignInstr)):
+                slots.add(instr.slot)
+    return slots
+
+
+# =========================================================
+# PASE
+# =========================================================
+
+def fold_constants(program):
+    """Calculeaza la compilare subarborii formati doar din constante."""
+    before = count_nodes(program.body)
+    for body in bodies(program.body):
+        for instr in body:
+            for attr in exprs_of(instr):
+                set_expr(instr, attr, fold(getattr(instr, attr)))
+    return before - count_nodes(program.body)
+
+
+def fold(node):
+    if node.depth > MAX_DEPTH or is_leaf(node):
+        return node
+    left, right = fold(node.left), fold(node.right)
+
+    if isinstance(node, LogicalCond):
+        if isinstance(left, Number):
+            # "a SI b" e b cand a e adevarat; "a SAU b" e b cand a e fals
+            if bool(left.value) == (node.op == "SI"):
+                return right
+            return Number(int(bool(left.value)))
+    elif isinstance(left, Number) and isinstance(right, Number):
+        ops = BIN_OPS if isinstance(node, BinExpr) else CMP_OPS
+        try:
+            value = ops[node.op](left.value, right.value)
+        except ArithmeticError:
+            # impartirea la zero ramane pentru executie
+            value = None
+        if value is not None:
+            return Number(int(value) if isinstance(node, CompareCond) else value)
+
+    if left is node.left and right is node.right:
+        return node
+    return NODES[node.op](node.op, left, right)
+
+
+def remove_dead_branches(program):
+    """Elimina ramurile DACA si buclele CATTIMP cu conditie constanta falsa."""
+    before = count_nodes(program.body)
+    for body in bodies(program.body):
+        kept = []
+        todo = list(reversed(body))
+        while todo:
+            instr = todo.pop()
+            if isinstance(instr, IfInstr) and isinstance(instr.cond, Number):
+                branch = instr.then_body if instr.cond.value else instr.else_body
+                todo += reversed(branch)
+            elif isinstance(instr, WhileInstr) and isinstance(instr.cond, Number) and not instr.cond.value:
+                continue
+            else:
+                kept.append(instr)
+        body[:] = kept
+    return before - count_nodes(program.body)
+
+
+def eliminate_common(program):
+    """Calculeaza o singura data subexpresiile repetate intr-o instructiune.
+
+    Intoarce numarul de noduri a caror evaluare repetata a fost eliminata.
+    """
+    removed = 0
+    for body in bodies(program.body):
+        out = []
+        for instr in body:
+            # conditia unei bucle e reevaluata la fiecare pas; o lasam
+            if isinstance(instr, WhileInstr):
+                out.append(instr)
+                continue
+            for attr in exprs_of(instr):
+                expr = getattr(instr, attr)
+                temps = repeated(expr, program)
+                if temps:
+                    for key, (var, node, count) in temps.items():
+                        out.append(SlotAssign(var.name, node, var.slot, instr.line))
+                        removed += (count - 1) * (count_nodes([node]) - 1)
+                    mapping = {key: var for key, (var, _, _) in temps.items()}
+                    set_expr(instr, attr, replace_keys(expr, mapping))
+            out.append(instr)
+        body[:] = out
+    return removed
+
+
+def repeated(expr, program):
+    # subexpresiile nebanale care apar de cel putin doua ori si sigur se
+    # evalueaza (nu in partea dreapta a unui SI/SAU); cele mai mari primele
+    if expr.depth > MAX_DEPTH:
+        return {}
+    counts = {}
+    nodes = {}
+
+    def walk(node, certain):
+        if is_leaf(node):
+            return
+        key = node_key(node)
+        counts[key] = counts.get(key, 0) + 1
+        if certain:
+            nodes.setdefault(key, node)
+        walk(node.left, certain)
+        walk(node.right, certain and not isinstance(node, LogicalCond))
+
+    walk(expr, True)
+    temps = {}
+    for key in sorted(nodes, key=lambda k: -count_nodes([nodes[k]])):
+        if counts[key] < 2 or isinstance(nodes[key], Condition):
+            continue
+        # o subexpresie a unui candidat deja ales dispare odata cu el
+        if any(contains(chosen, nodes[key]) for _, chosen, _ in temps.values()):
+            continue
+        name, slot = new_temp(program)
+        temps[key] = (SlotVar(name, slot), nodes[key], counts[key])
+    # ordinea de calcul: subexpresiile interioare inaintea celor care le contin
+    return dict(sorted(temps.items(), key=lambda kv: kv[1][1].depth))
+
+
+def contains(outer, inner):
+    if outer is inner:
+        return True
+    if is_leaf(outer):
+        return False
+    return contains(outer.left, inner) or contains(outer.right, inner)
+
+
+def has_io(instr):
+    """Instructiunea e (sau contine, oricat de adanc) un SCRIE sau CITESTE."""
+    for body in bodies([instr]):
+        for inner in body:
+            if isinstance(inner, (OutputInstr, InputInstr)):
+                return True
+    return False
+
+
+def hoist_invariants(program):
+    """Scoate din bucle expresiile care nu depind de variabilele modificate in ele.
+
+    Expresiile din conditie se calculeaza inaintea buclei; cele din corp doar
+    sub garda conditiei, ca sa nu fie evaluate daca bucla nu ruleaza deloc.
+    Intoarce numarul de noduri scoase din corpurile buclelor.
+    """
+    removed = 0
+    for body in bodies(program.body):
+        out = []
+        for instr in body:
+            if isinstance(instr, WhileInstr):
+                removed += hoist_loop(instr, program, out)
+            out.append(instr)
+        body[:] = out
+    return removed
+
+
+def hoist_loop(loop, program, out):
+    changed = assigned_slots(loop.body)
+
+    def invariant(node):
+        if isinstance(node, Number):
+            return True
+        if isinstance(node, Variable):
+            return node.slot not in changed
+        return invariant(node.left) and invariant(node.right)
+
+    found = {}
+
+    def collect(node, into):
+        if node.depth > MAX_DEPTH or is_leaf(node):
+            return
+        if not isinstance(node, Condition) and invariant(node):
+            key = node_key(node)
+            if key not in found:
+                found[key] = (node, into)
+            return
+        collect(node.left, into)
+        if not isinstance(node, LogicalCond):
+            collect(node.right, into)
+
+    entry, guarded = [], []
+    collect(loop.cond, entry)
+    # doar instructiunile de dinaintea primului SCRIE/CITESTE din corp (si
+    # din blocurile imbricate), ca o eroare mutata mai devreme sa nu schimbe
+    # ce s-a afisat deja
+    for instr in loop.body:
+        if has_io(instr):
+            break
+        for attr in exprs_of(instr):
+            collect(getattr(instr, attr), guarded)
+
+    if not found:
+        return 0
+
+    temps = {}
+    removed = 0
+    for key, (node, into) in found.items():
+        name, slot = new_temp(program)
+        temps[key] = SlotVar(name, slot)
+        into.append(SlotAssign(name, node, slot, loop.line))
+        removed += count_nodes([node]) - 1
+
+    for b in bodies(loop.body):
+        for instr in b:
+            for attr in exprs_of(instr):
+                set_expr(instr, attr, replace_keys(getattr(instr, attr), temps))
+    loop.cond = replace_keys(loop.cond, temps)
+
+    out += entry
+    if guarded:
+        out.append(IfInstr(loop.cond, guarded, [], loop.line))
+    return removed
+
+
+# =========================================================
+# MANAGER DE PASE
+# =========================================================
+
+PASSES = {
+    "types": specialize_types,
+    "fold": fold_constants,
+    "dead": remove_dead_branches,
+    "cse": eliminate_common,
+    "licm": hoist_invariants,
+    "closed": accelerate_loops,
+}
+
+DEFAULT_PASSES = ("types", "fold", "dead", "cse", "licm", "closed")
+
+
+def register_pass(name, fn):
+    PASSES[name] = fn
+
+
+def optimize(program, passes=DEFAULT_PASSES):
+    """Ruleaza pasele pe un resolver.Program; intoarce {pasa: noduri eliminate}."""
+    report = {}
+    for name in passes:
+        fn = PASSES.get(name)
+        if fn is None:
+            raise Exception(f"Pasa de optimizare necunoscuta: {name}")
+        report[name] = fn(program)
+    return report
@@ -1,18 +1,21 @@
 # kalk/parser.py
 
-from .lexer import Token
+from .lexer import Token, tokenize_file
 from .ast_nodes import *
 
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
-        self.pos = 0
+        # orice iterabil de tokeni care se termina cu EOF; tinem un singur
+        # token de lookahead, deci sursa poate fi un generator
+        self.tokens = iter(tokens)
+        self.tok = next(self.tokens)
 
     def cur(self):
-        return self.tokens[self.pos]
+        return self.tok
 
     def eat(self):
-        self.pos += 1
+        # dupa EOF ramanem pe EOF
+        self.tok = next(self.tokens, self.tok)
 
     def expect(self, t, v=None):
         tok = self.cur()
@@ -22,64 +25,93 @@ class Parser:
         return tok
 
     def parse_program(self):
-        instr = []
+        return list(self.statements())
+
+    def statements(self):
+        """Genereaza instructiunile de pe nivelul de sus pe masura ce sunt parsate."""
         while self.cur().type != "EOF":
-            instr.append(self.parse_statement())
-        return instr
+            yield self.parse_statement()
 
     def parse_statement(self):
+        # blocurile DACA/CATTIMP deschise stau pe o stiva explicita, nu pe
+        # stiva Python, deci imbricarea e limitata doar de memorie
+        stack = []
+        while True:
+            tok = self.cur()
+
+            if stack and tok.value in ("SFARSIT", "ALTFEL"):
+                node, body = stack[-1]
+                if tok.value == "ALTFEL":
+                    if not isinstance(node, IfInstr) or body is node.else_body:
+                        raise Exception(f"Eroare sintactica la {tok}")
+                    self.eat()
+                    stack[-1] = (node, node.else_body)
+                    continue
+                self.eat()
+                stack.pop()
+                instr = node
+            else:
+                instr = self.parse_head()
+                if isinstance(instr, IfInstr):
+                    stack.append((instr, instr.then_body))
+                    continue
+                if isinstance(instr, WhileInstr):
+                    stack.append((instr, instr.body))
+                    continue
+
+            if not stack:
+                return instr
+            stack[-1][1].append(instr)
+
+    def parse_head(self):
+        # o instructiune simpla, sau antetul unui bloc cu corpurile goale
         tok = self.cur()
+        line = tok.line
 
         if tok.value == "CITESTE":
             self.eat()
             name = self.expect("IDENT").value
-            return InputInstr(name)
+            kind = None
+            if self.cur().value == ":":
+                # tip declarat: valoarea citita e convertita sau respinsa
+                self.eat()
+                tok = self.expect("IDENT")
+                kind = tok.value.upper()
+                if kind not in INPUT_KINDS:
+                    raise Exception(f"Tip necunoscut: {tok.value} (se astepta {', '.join(INPUT_KINDS)})")
+            return InputInstr(name, kind, line)
 
         if tok.value == "DECLAR":
             self.eat()
             name = self.expect("IDENT").value
             self.expect("KEYWORD", "VALOARE")
             expr = self.parse_expr()
-            return DeclInstr(name, expr)
+            return DeclInstr(name, expr, line)
 
         if tok.value == "SCRIE":
             self.eat()
-            return OutputInstr(self.parse_expr())
+            return OutputInstr(self.parse_expr(), line)
 
         if tok.value == "DACA":
             self.eat()
             cond = self.parse_cond()
             self.expect("KEYWORD", "ATUNCI")
-            then_body = self.parse_block()
-            else_body = []
-            if self.cur().value == "ALTFEL":
-                self.eat()
-                else_body = self.parse_block()
-            self.expect("KEYWORD", "SFARSIT")
-            return IfInstr(cond, then_body, else_body)
+            return IfInstr(cond, [], [], line)
 
         if tok.value == "CATTIMP":
             self.eat()
             cond = self.parse_cond()
             self.expect("KEYWORD", "EXECUTA")
-            body = self.parse_block()
-            self.expect("KEYWORD", "SFARSIT")
-            return WhileInstr(cond, body)
+            return WhileInstr(cond, [], line)
 
         if tok.type == "IDENT":
             name = tok.value
             self.eat()
             self.expect("OP", "<-")
-            return AssignInstr(name, self.parse_expr())
+            return AssignInstr(name, self.parse_expr(), line)
 
         raise Exception(f"Instructiune necunoscuta: {tok}")
 
-    def parse_block(self):
-        body = []
-        while self.cur().value not in {"SFARSIT", "ALTFEL"}:
-            body.append(self.parse_statement())
-        return body
-
     # -------- CONDITII --------
     def parse_cond(self):
         left = self.parse_and()
@@ -99,9 +131,11 @@ class Parser:
 
     def parse_simple_cond(self):
         left = self.parse_expr()
-        op = self.expect("OP").value
+        tok = self.expect("OP")
+        if tok.value not in CMP_OPS:
+            raise Exception(f"Eroare sintactica la {tok}")
         right = self.parse_expr()
-        return CompareCond(op, left, right)
+        return CompareCond(tok.value, left, right)
 
     # -------- EXPRESII --------
     def parse_expr(self):
@@ -131,3 +165,7 @@ class Parser:
             self.eat()
             return Variable(tok.value)
         raise Exception("Factor invalid")
+
+
+def parse_file(path, encoding="utf-8"):
+    return Parser(tokenize_file(path, encoding)).parse_program()
@@ -0,0 +1,282 @@
+# kalk/profiler.py
+#
+# Profilare per linie a programelor KALK. Doua variante, date motorului:
+#
+#     engine = Engine("python", profiler=LineProfiler())
+#     engine.run_source(text, ctx)
+#     engine.profiler.result.lines()      # {linie: LineStat}
+#
+#   - LineProfiler: exact; codul generat numara si cronometreaza fiecare
+#     instructiune (de cateva ori mai lent decat rularea normala);
+#   - SamplingProfiler: codul numara doar intrarile in blocuri (o adunare per
+#     iteratie), iar un fir citeste periodic linia curenta a codului generat
+#     (sys._current_frames); potrivit pentru rulari lungi. CPython lasa alt
+#     fir sa ruleze doar la capatul unei iteratii sau la un apel, deci
+#     esantioanele cad pe antetul buclei; timpul unei bucle e impartit apoi
+#     intre instructiunile ei dupa executari si marimea expresiilor.
+#
+# Rezultatul (Profile) se poate exporta ca JSON sau ca stive "collapsed"
+# pentru flamegraph.pl / speedscope (o stiva pe linie: cadre;cadre valoare).
+
+import json
+import sys
+import threading
+import time
+from bisect import bisect_right
+
+from .ast_nodes import IfInstr, InputInstr, WhileInstr
+from . import transpiler
+
+# intervalul dintre doua esantioane, in secunde; in practica firul rularii
+# cedeaza GIL-ul cel mult o data la sys.getswitchinterval()
+SAMPLE_INTERVAL = 0.001
+
+
+class LineStat:
+    __slots__ = ("line", "count", "self", "total")
+
+    def __init__(self, line, count=0, self_time=0.0, total=0.0):
+        self.line = line
+        self.count = count     # executari
+        self.self = self_time  # secunde petrecute in instructiunile liniei
+        self.total = total     # inclusiv corpurile blocurilor incepute pe linie
+
+    def __repr__(self):
+        return f"LineStat({self.line}, {self.count}, {self.self:.6f}s)"
+
+
+class Profile:
+    """Rezultatul unei rulari profilate, per instructiune si per linie.
+
+    In varianta exacta times sunt timpii cumulati (instructiunea cu tot ce
+    contine). La esantionare counts sunt intrarile in blocuri (firsts da
+    prima instructiune din blocul fiecareia), iar times timpii esantionati
+    pe instructiunea curenta, inca neimpartiti in interiorul buclelor. (Daca
+    rularea a fost intrerupta, restul blocului curent apare ca executat.)
+    """
+
+    def __init__(self, mode, instrs, counts, times, elapsed, source=None, firsts=None):
+        self.mode = mode           # "exact" sau "sample"
+        self.instrs = instrs       # instructiunile, in ordinea sondelor
+        self.elapsed = elapsed     # durata rularii, in secunde
+        self.source = source.splitlines() if source is not None else None
+        self.parents = parents(instrs)
+        if mode == "exact":
+            self.counts = list(counts)
+            self.total = list(times)
+            self.self = list(times)
+            for k, parent in enumerate(self.parents):
+                if parent >= 0:
+                    self.self[parent] -= times[k]
+        else:
+            self.counts = [counts[first] for first in firsts]
+            self.self = self.spread(times)
+            self.total = list(self.self)
+            # parintii au indici mai mici: un singur drum de la coada la cap
+            for k in range(len(instrs) - 1, -1, -1):
+                parent = self.parents[k]
+                if parent >= 0:
+                    self.total[parent] += self.total[k]
+
+    def spread(self, times):
+        """Imparte timpul esantionat al fiecarei bucle intre conditia ei si
+        instructiunile din corp (fara buclele interioare, care au esantioanele
+        lor), proportional cu executari * marimea expresiilor."""
+        result = list(times)
+        groups = {}
+        for k in range(len(self.instrs)):
+            # bucla cea mai apropiata care contine instructiunea
+            loop = self.parents[k]
+            while loop >= 0 and not isinstance(self.instrs[loop], WhileInstr):
+                loop = self.parents[loop]
+            if loop >= 0 and not isinstance(self.instrs[k], WhileInstr):
+                groups.setdefault(loop, []).append(k)
+
+        for loop, members in groups.items():
+            instr = self.instrs[loop]
+            # conditia e evaluata o data in plus fata de corp, la fiecare intrare
+            iterations = self.counts[members[0]]
+            weights = {loop: (iterations + self.counts[loop]) * cost(instr)}
+            for k in members:
+                weights[k] = self.counts[k] * cost(self.instrs[k])
+            total = sum(weights.values())
+            spent = times[loop]
+            if not total or not spent:
+                continue
+            for k, weight in weights.items():
+                result[k] = (times[k] if k != loop else 0.0) + spent * weight / total
+        return result
+
+    def lines(self):
+        """{linie: LineStat}, cu instructiunile de pe aceeasi linie adunate."""
+        stats = {}
+        for k, instr in enumerate(self.instrs):
+            line = instr.line
+            stat = stats.get(line)
+            if stat is None:
+                stat = stats[line] = LineStat(line)
+            stat.count += self.counts[k]
+            stat.self += max(self.self[k], 0.0)
+            parent = self.parents[k]
+            # un bloc scris pe o singura linie nu e numarat de doua ori
+            if parent < 0 or self.instrs[parent].line != line:
+                stat.total += self.total[k]
+        return stats
+
+    def label(self, k):
+        line = self.instrs[k].line
+        if self.source is not None and 0 < line <= len(self.source):
+            text = " ".join(self.source[line - 1].split())
+            return f"{line}: {text}".replace(";", ",")
+        return f"linia {line}: {type(self.instrs[k]).__name__}"
+
+    # ---------- EXPORT ----------
+
+    def to_json(self):
+        return {
+            "mode": self.mode,
+            "elapsed": self.elapsed,
+            "lines": [
+                {"line": s.line, "count": s.count, "self": s.self, "total": s.total}
+                for s in sorted(self.lines().values(), key=lambda s: s.line)
+            ],
+        }
+
+    def collapsed(self):
+        """Stivele in formatul "collapsed": cadrele de la program la
+        instructiune, separate prin ";", si timpul propriu in microsecunde."""
+        out = []
+        for k in range(len(self.instrs)):
+            value = int(self.self[k] * 1e6)
+            if value <= 0:
+                continue
+            frames = []
+            i = k
+            while i >= 0:
+                frames.append(self.label(i))
+                i = self.parents[i]
+            frames.append("program")
+            out.append(";".join(reversed(frames)) + f" {value}")
+        return "\n".join(out) + "\n" if out else ""
+
+    def save(self, path):
+        """Scrie profilul: .json ca JSON, orice altceva ca stive collapsed."""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_json(), f, ensure_ascii=False, indent=1)
+            else:
+                f.write(self.collapsed())
+
+
+def parents(instrs):
+    """Pentru fiecare instructiune, indicele blocului care o contine (-1 la
+    nivelul de sus); instrs e in ordinea emiterii, deci parintii sunt inainte."""
+    index = {id(instr): k for k, instr in enumerate(instrs)}
+    result = [-1] * len(instrs)
+    for k, instr in enumerate(instrs):
+        if isinstance(instr, IfInstr):
+            children = instr.then_body + instr.else_body
+        elif isinstance(instr, WhileInstr):
+            children = instr.body
+        else:
+            continue
+        for child in children:
+            j = index.get(id(child))
+            if j is not None:
+                result[j] = k
+    return result
+
+
+def cost(instr):
+    """Marimea aproximativa a unei instructiuni: nodurile expresiei ei."""
+    if isinstance(instr, (IfInstr, WhileInstr)):
+        todo = [instr.cond]
+    elif isinstance(instr, InputInstr):
+        return 1
+    else:
+        todo = [instr.expr]
+    count = 0
+    while todo:
+        node = todo.pop()
+        count += 1
+        left = getattr(node, "left", None)
+        if left is not None:
+            todo += (left, node.right)
+    return count
+
+
+def compiled(program, key, metered, timed):
+    """(PyProgram, Probes) pentru profilare, tinute in program.compiled."""
+    key = (key, metered)
+    entry = program.compiled.get(key)
+    if entry is None:
+        probes = transpiler.Probes(timed)
+        prog = transpiler.compile_program(program, metered, probes)
+        if prog is None:
+            raise Exception("Programul are o imbricare prea adanca pentru profilare")
+        entry = program.compiled[key] = (prog, probes)
+    return entry
+
+
+class LineProfiler:
+    """Profilare exacta: numarul de executari si timpul fiecarei instructiuni."""
+
+    def __init__(self):
+        self.result = None
+        self.source = None   # textul programului, pentru etichete (Engine.run_source)
+
+    def run(self, engine, program, ctx):
+        prog, probes = compiled(program, "profile", engine.metered, True)
+        counts = [0] * len(probes.instrs)
+        times = [0.0] * len(probes.instrs)
+        start = time.perf_counter()
+        try:
+            prog.fn(ctx, counts, times)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.result = Profile("exact", probes.instrs, counts, times, elapsed, self.source)
+
+
+class SamplingProfiler:
+    """Profilare prin esantionare: codul ruleaza nemodificat, iar un fir
+    separat noteaza instructiunea curenta la fiecare interval."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.result = None
+        self.source = None
+
+    def run(self, engine, program, ctx):
+        prog, probes = compiled(program, "sample", engine.metered, False)
+        counts = [0] * len(probes.instrs)
+        times = [0.0] * len(probes.instrs)
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self.sample, name="kalk-sampler", daemon=True,
+            args=(threading.get_ident(), prog.fn.__code__, probes.starts, times, stop))
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            prog.fn(ctx, counts, None)
+        finally:
+            stop.set()
+            sampler.join()
+            elapsed = time.perf_counter() - start
+            self.result = Profile("sample", probes.instrs, counts, times, elapsed,
+                                  self.source, probes.firsts)
+
+    def sample(self, thread, code, starts, times, stop):
+        frames = sys._current_frames
+        last = time.perf_counter()
+        while not stop.wait(self.interval):
+            frame = frames().get(thread)
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            # din _fmt, _coerce sau o bucla in forma inchisa urcam pana la program
+            while frame is not None and frame.f_code is not code:
+                frame = frame.f_back
+            if frame is None:
+                continue
+            k = bisect_right(starts, frame.f_lineno) - 1
+            if k >= 0:
+                times[k] += elapsed
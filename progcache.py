@@ -0,0 +1,243 @@
+# kalk/progcache.py
+#
+# Cache pe disc al programelor compilate, comun pentru GUI, biblioteca de
+# programe, `python -m kalk` si runner: un program deja vazut (dupa
+# continutul sursei) sare peste lexer, parser, resolver si optimizer, iar
+# in modul "python" si peste generarea si compilarea codului.
+#
+# O intrare e un fisier <cheie>.kpc: antetul MAGIC + FORMAT, apoi, comprimat
+# cu zlib, pickle-ul programului rezolvat si optimizat si, daca exista,
+# codul Python generat (serializat cu marshal). Cheia cuprinde sursa,
+# pasele si versiunea interpretorului: Python-ul (pentru marshal) si
+# fisierele pachetului (pentru forma AST-ului), deci orice modificare a
+# lor invalideaza intrarile vechi. Evictia e LRU dupa mtime (atinsa la
+# fiecare citire), cand dimensiunea totala trece de max_bytes.
+#
+#     KALK_CACHE_DIR=/alt/director   # implicit ~/.cache/kalk
+#     KALK_CACHE_DIR=                # cache dezactivat
+
+import os
+import struct
+import sys
+
+from .lexer import tokenize
+from .optimizer import optimize
+from .parser import Parser
+from .resolver import Program, resolve
+
+MAGIC = b"KALKPC"
+FORMAT = 2
+SUFFIX = ".kpc"
+MAX_BYTES = 64 << 20
+
+_default = None
+_version = None
+
+
+def cache_dir():
+    """Directorul implicit, sau None daca cache-ul e dezactivat."""
+    path = os.environ.get("KALK_CACHE_DIR")
+    if path is not None:
+        return path or None
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "kalk")
+
+
+def interpreter_version():
+    """Amprenta Python-ului si a fisierelor pachetului, calculata o data."""
+    global _version
+    if _version is None:
+        here = os.path.dirname(os.path.abspath(__file__))
+        parts = [sys.implementation.cache_tag or "", str(sys.hexversion), str(FORMAT)]
+        for name in sorted(os.listdir(here)):
+            if name.endswith(".py"):
+                st = os.stat(os.path.join(here, name))
+                parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+        _version = "\n".join(parts)
+    return _version
+
+
+class CachedProgram:
+    __slots__ = ("program", "python")
+
+    def __init__(self, program, python=None):
+        self.program = program   # resolver.Program, rezolvat si optimizat
+        self.python = python     # (sursa Python, code object, bucle) sau None
+
+
+class ProgramCache:
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        self.directory = directory or cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # estimarea dimensiunii directorului: scanat o data, apoi doar adunat,
+        # ca put() sa nu listeze directorul de fiecare data
+        self.total = None
+
+    def key(self, text, passes=()):
+        import hashlib
+        h = hashlib.sha256()
+        h.update(interpreter_version().encode())
+        h.update(b"\0" + ",".join(passes).encode() + b"\0")
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    # ---------- CITIRE / SCRIERE ----------
+
+    def get(self, text, passes=()):
+        """CachedProgram pentru sursa, sau None la ratare."""
+        path = self.path(self.key(text, passes))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            entry = self.loads(data)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # intrare corupta sau scrisa de alta versiune: o refacem
+            self.misses += 1
+            self.discard(path)
+            return None
+        try:
+            os.utime(path)   # LRU: intrarea tocmai a fost folosita
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, text, passes, program, python=None):
+        """Salveaza programul; erorile de scriere sunt ignorate (cache-ul e optional)."""
+        try:
+            data = self.dumps(program, python)
+        except RecursionError:
+            # expresii prea adanci pentru pickle: raman necache-uite
+            return
+        path = self.path(self.key(text, passes))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(data)
+            # atomic: alt proces (ex. workerii runner-ului) nu vede o intrare partiala
+            os.replace(tmp, path)
+        except OSError:
+            self.discard(tmp)
+            return
+        if self.total is None:
+            self.total = self.size()
+        else:
+            self.total += len(data)
+        if self.total > self.max_bytes:
+            self.evict()
+
+    @staticmethod
+    def dumps(program, python=None):
+        import marshal
+        import pickle
+        import zlib
+        if python is not None:
+            source, code, loops = python
+            python = (source, marshal.dumps(code), loops)
+        payload = pickle.dumps((program.symbols, program.body, python), pickle.HIGHEST_PROTOCOL)
+        return MAGIC + struct.pack("<H", FORMAT) + zlib.compress(payload)
+
+    @staticmethod
+    def loads(data):
+        import marshal
+        import pickle
+        import zlib
+        if data[:len(MAGIC)] != MAGIC:
+            raise Exception("Fisierul nu e o intrare de cache KALK")
+        version, = struct.unpack_from("<H", data, len(MAGIC))
+        if version != FORMAT:
+            raise Exception(f"Format de cache nesuportat: {version}")
+        symbols, body, python = pickle.loads(zlib.decompress(data[len(MAGIC) + 2:]))
+        if python is not None:
+            source, code, loops = python
+            python = (source, marshal.loads(code), loops)
+        return CachedProgram(Program(body, symbols), python)
+
+    # ---------- EVICTIE ----------
+
+    def entries(self):
+        """(mtime, marime, cale) pentru fiecare intrare."""
+        try:
+            it = os.scandir(self.directory)
+        except OSError:
+            return []
+        with it:
+            result = []
+            for e in it:
+                if e.name.endswith(SUFFIX):
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    result.append((st.st_mtime_ns, st.st_size, e.path))
+            return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self.discard(path)
+                total -= size
+        self.total = total
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.discard(path)
+        self.total = 0
+
+    @staticmethod
+    def discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def default_cache():
+    """Cache-ul comun al procesului, sau None daca e dezactivat."""
+    global _default
+    if _default is False:
+        return None
+    if _default is None:
+        directory = cache_dir()
+        if directory is None:
+            return None
+        _default = ProgramCache(directory)
+    return _default
+
+
+def set_default(cache):
+    """Inlocuieste cache-ul comun; None il dezactiveaza pentru tot procesul."""
+    global _default
+    _default = cache if cache is not None else False
+
+
+def load_program(text, passes=(), cache=None):
+    """resolver.Program optimizat pentru sursa, din cache cand se poate."""
+    cache = cache or default_cache()
+    if cache is not None:
+        entry = cache.get(text, passes)
+        if entry is not None:
+            return entry.program
+    program = resolve(Parser(tokenize(text)).parse_program())
+    if passes:
+        optimize(program, passes)
+    if cache is not None:
+        cache.put(text, passes, program)
+    return program
@@ -0,0 +1,91 @@
+# kalk/resolver.py
+
+from .ast_nodes import *
+
+
+class Program:
+    """Program rezolvat: corpul cu noduri specializate si tabela de simboluri."""
+    __slots__ = ("body", "symbols", "compiled")
+
+    def __init__(self, body, symbols):
+        self.body = body
+        self.symbols = symbols   # numele variabilelor, in ordinea sloturilor
+        self.compiled = {}       # forma compilata, per mod de executie
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def __len__(self):
+        return len(self.body)
+
+
+def resolve(program):
+    """Inlocuieste nodurile generice cu noduri per operator si sloturi de variabile."""
+    if isinstance(program, Program):
+        return program
+
+    symbols = {}
+
+    def slot_of(name):
+        idx = symbols.get(name)
+        if idx is None:
+            idx = symbols[name] = len(symbols)
+        return idx
+
+    body = []
+    # la fel ca in Parser, blocurile stau pe o stiva explicita
+    stack = [(iter(program), body)]
+    while stack:
+        src, dst = stack[-1]
+        for instr in src:
+            if isinstance(instr, IfInstr):
+                new = IfInstr(resolve_expr(instr.cond, slot_of), [], [], instr.line)
+                dst.append(new)
+                stack.append((iter(instr.else_body), new.else_body))
+                stack.append((iter(instr.then_body), new.then_body))
+                break
+            if isinstance(instr, WhileInstr):
+                new = WhileInstr(resolve_expr(instr.cond, slot_of), [], instr.line)
+                dst.append(new)
+                stack.append((iter(instr.body), new.body))
+                break
+            dst.append(resolve_instr(instr, slot_of))
+        else:
+            stack.pop()
+
+    return Program(body, list(symbols))
+
+
+def resolve_instr(instr, slot_of):
+    if isinstance(instr, InputInstr):
+        return SlotInput(instr.var, slot_of(instr.var), instr.kind, instr.line)
+    if isinstance(instr, DeclInstr):
+        return SlotDecl(instr.var, resolve_expr(instr.expr, slot_of), slot_of(instr.var), instr.line)
+    if isinstance(instr, AssignInstr):
+        return SlotAssign(instr.var, resolve_expr(instr.expr, slot_of), slot_of(instr.var), instr.line)
+    if isinstance(instr, OutputInstr):
+        return OutputInstr(resolve_expr(instr.expr, slot_of), instr.line)
+    raise Exception(f"Instructiune necunoscuta: {instr}")
+
+
+def resolve_expr(node, slot_of):
+    # parcurgere in postordine cu stiva explicita; lanturile lungi de
+    # operatori dau arbori adanci pe stanga
+    out = []
+    todo = [(node, False)]
+    while todo:
+        n, ready = todo.pop()
+        if isinstance(n, (BinExpr, CompareCond, LogicalCond)):
+            if ready:
+                right = out.pop()
+                left = out.pop()
+                out.append(NODES[n.op](n.op, left, right))
+            else:
+                todo.append((n, True))
+                todo.append((n.right, False))
+                todo.append((n.left, False))
+        elif isinstance(n, Variable):
+            out.append(SlotVar(n.name, slot_of(n.name)))
+        else:
+            out.append(n)
+    return out[0]
@@ -0,0 +1,236 @@
+# kalk/runner.py
+#
+# Rulare fara interfata grafica: un program .kalk executat pentru fiecare
+# inregistrare dintr-un fisier CSV sau JSONL (cheile sunt numele variabilelor
+# din CITESTE). Programul e compilat o data in procesul principal (erorile
+# apar inainte de pornirea workerilor) si cel mult o data per worker; rularile sunt trimise pe bucati unui
+# ProcessPoolExecutor, iar rezultatele sunt scrise in ordinea intrarilor.
+# Cu --sandbox (sau oricare dintre limite) rularile merg in workerii izolati
+# din sandbox.py, cu limita de pasi, de timp si de memorie per rulare.
+#
+#     python -m kalk.runner programs/prim.kalk intrari.csv -j 8 -o rezultate.jsonl
+#     python -m kalk.runner user_programs/x.kalk intrari.csv --max-steps 1000000 --timeout 2
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from .ast_nodes import Context
+from .channels import KeyedInput, parse_number
+from .engine import Engine
+from .memo import ResultCache, program_key
+from .optimizer import DEFAULT_PASSES
+from .sandbox import LIMIT_ERRORS, MEMORY, SandboxPool
+from . import transpiler
+
+CHUNK_SIZE = 256
+# cate bucati pot astepta in paralel pentru fiecare worker
+WINDOW = 4
+PROGRESS_EVERY = 1.0
+
+
+def parse_value(text):
+    # ca StdinInput.parse: numar daca se poate, altfel textul ramane text
+    try:
+        return parse_number(text)
+    except ValueError:
+        return text
+
+
+def read_records(path, fmt=None):
+    """Genereaza inregistrarile (dict variabila -> valoare) dintr-un fisier."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(f):
+                yield {k: parse_value(v.strip()) for k, v in row.items()}
+
+
+# ---------- WORKER ----------
+
+# programul compilat, o data per proces
+_program = None
+
+
+def init_worker(source):
+    global _program
+    _program = transpiler.from_source(source, DEFAULT_PASSES)
+
+
+def run_record(engine, program, record):
+    ctx = Context(channel=KeyedInput(record))
+    try:
+        engine.run(program, ctx)
+        return ctx.output, None
+    except Exception as e:
+        return ctx.output, str(e)
+
+
+def run_chunk(records):
+    engine = Engine("python")
+    return [run_record(engine, _program, record) for record in records]
+
+
+# ---------- PROCES PRINCIPAL ----------
+
+def chunks(records, size):
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Chunk:
+    """O bucata de inregistrari; cele gasite in memo au rezultatul gata,
+    restul (todo) sunt trimise la rulare."""
+
+    def __init__(self, records, memo=None, pkey=None):
+        self.results = [None] * len(records)
+        self.todo = []
+        self.where = []   # (indice in bucata, cheia memo) pentru fiecare din todo
+        for i, record in enumerate(records):
+            key = None
+            if memo is not None:
+                inputs = KeyedInput(record).memo_key()
+                if inputs is not None:
+                    key = memo.key(pkey, inputs, DEFAULT_PASSES)
+                    hit = memo.get(key)
+                    if hit is not None:
+                        self.results[i] = hit
+                        continue
+            self.todo.append(record)
+            self.where.append((i, key))
+
+    def finish(self, results, memo=None):
+        for (i, key), (output, error) in zip(self.where, results):
+            self.results[i] = output, error
+            # depasirile de limite tin de rulare, nu de program
+            if key is not None and error not in LIMIT_ERRORS:
+                memo.put(key, output, error)
+        return self.results
+
+
+def run_file(source, records, workers=None, chunk_size=CHUNK_SIZE, memo=None,
+             sandbox=None, steps=None, seconds=None):
+    """Genereaza (output, eroare) pentru fiecare inregistrare, in ordine.
+
+    memo: un memo.ResultCache; inregistrarile deja vazute nu mai sunt rulate.
+    sandbox: un sandbox.SandboxPool; rularile au limitele steps si seconds.
+    """
+    workers = workers or os.cpu_count() or 1
+    pkey = program_key(source) if memo is not None else None
+    if workers == 1 and sandbox is None:
+        init_worker(source)
+        for records in chunks(records, chunk_size):
+            chunk = Chunk(records, memo, pkey)
+            yield from chunk.finish(run_chunk(chunk.todo), memo)
+        return
+
+    if sandbox is not None:
+        # un fir per worker izolat; firele doar asteapta dupa pipe
+        pool = ThreadPoolExecutor(workers)
+        submit = lambda todo: pool.submit(sandbox.run_many, source, todo, steps, seconds)
+    else:
+        pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(source,))
+        submit = lambda todo: pool.submit(run_chunk, todo)
+
+    with pool:
+        # fereastra marginita: fisierul de intrare nu e citit tot in memorie
+        pending = deque()
+        for records in chunks(records, chunk_size):
+            chunk = Chunk(records, memo, pkey)
+            pending.append((chunk, submit(chunk.todo) if chunk.todo else None))
+            if len(pending) >= workers * WINDOW:
+                yield from finish(*pending.popleft(), memo)
+        while pending:
+            yield from finish(*pending.popleft(), memo)
+
+
+def finish(chunk, future, memo):
+    return chunk.finish(future.result() if future is not None else [], memo)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="kalk.runner", description="Ruleaza un program KALK pe un fisier de intrari.")
+    ap.add_argument("program", help="fisierul .kalk")
+    ap.add_argument("inputs", help="fisier CSV sau JSONL, o inregistrare per rulare")
+    ap.add_argument("--format", choices=("csv", "jsonl"), help="formatul intrarilor (implicit dupa extensie)")
+    ap.add_argument("-o", "--output", help="fisierul de rezultate JSONL (implicit stdout)")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="numarul de procese (implicit: nucleele)")
+    ap.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="rulari trimise odata unui worker")
+    ap.add_argument("--memo", action="store_true", help="nu rula de doua ori aceeasi inregistrare")
+    ap.add_argument("--memo-file", help="memo pastrat pe disc intre rulari (implica --memo)")
+    ap.add_argument("--sandbox", action="store_true", help="ruleaza in procese izolate (sandbox.py)")
+    ap.add_argument("--max-steps", type=int, help="limita de pasi per rulare (implica --sandbox)")
+    ap.add_argument("--timeout", type=float, help="limita de timp per rulare, in secunde (implica --sandbox)")
+    ap.add_argument("--max-memory", type=int, help="memoria per worker, in MiB (implica --sandbox)")
+    ap.add_argument("-q", "--quiet", action="store_true", help="fara progres pe stderr")
+    args = ap.parse_args(argv)
+
+    with open(args.program, encoding="utf-8") as f:
+        source = f.read()
+    try:
+        # cu fork, workerii mostenesc programul compilat din cache
+        transpiler.from_source(source, DEFAULT_PASSES)
+    except Exception as e:
+        print(f"{args.program}: {e}", file=sys.stderr)
+        return 2
+
+    memo = None
+    if args.memo or args.memo_file:
+        memo = ResultCache(path=args.memo_file)
+
+    sandbox = None
+    if args.sandbox or args.max_steps or args.timeout or args.max_memory:
+        memory = args.max_memory << 20 if args.max_memory else MEMORY
+        sandbox = SandboxPool(args.jobs, memory=memory)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = last = time.perf_counter()
+    count = failed = 0
+    try:
+        records = read_records(args.inputs, args.format)
+        results = run_file(source, records, args.jobs, args.chunk, memo,
+                           sandbox, args.max_steps, args.timeout)
+        for index, (output, error) in enumerate(results):
+            out.write(json.dumps({"index": index, "output": output, "error": error}, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+            failed += error is not None
+            now = time.perf_counter()
+            if not args.quiet and now - last >= PROGRESS_EVERY:
+                last = now
+                print(f"\r{count} rulari, {count / (now - start):.0f}/s", end="", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if memo is not None and args.memo_file:
+            memo.save()
+        if sandbox is not None:
+            sandbox.close()
+
+    if not args.quiet:
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        print(f"\r{count} rulari ({failed} cu erori) in {elapsed:.2f}s, {rate:.0f}/s", file=sys.stderr)
+        if memo is not None:
+            stats = memo.stats()
+            print(f"memo: {stats['hits']} gasite, {stats['misses']} rulate, "
+                  f"{stats['entries']} intrari ({stats['bytes']} octeti)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
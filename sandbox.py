@@ -0,0 +1,369 @@
+# kalk/sandbox.py
+#
+# Rulari izolate in procese worker pregatite dinainte. Fiecare worker are
+# interpretorul deja importat (pornesc dintr-un forkserver care a incarcat
+# kalk) si pastreaza programele compilate intre rulari, deci o rulare costa
+# doar drumul prin pipe. Fiecare rulare are limite:
+#   - pasi: codul masurat (meter.py) numara iteratiile buclelor si e oprit
+#     la depasire; verificarea se face o data la transpiler.QUANTUM pasi;
+#   - timp: verificat tot la tick si, ca rezerva pentru operatiile lungi din
+#     C (ex. inmultiri de numere uriase), procesul e omorat de parinte;
+#   - memorie: RLIMIT_AS in worker; MemoryError devine eroarea rularii.
+# Un worker omorat sau cazut e inlocuit imediat, fara sa afecteze procesul
+# principal.
+#
+#     pool = SandboxPool(4, memory=256 << 20)
+#     output, error = pool.run(text, {"n": 30}, steps=10 ** 7, seconds=2)
+#     Engine -> SandboxEngine(pool): run_source cu iesire si CITESTE pe loc
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from .ast_nodes import Context
+from .channels import KeyedInput, ListInput
+from .engine import Engine
+from .meter import Meter, Stopped
+from .optimizer import DEFAULT_PASSES
+from .sinks import CallbackSink
+
+# memoria pe care o poate folosi o rulare, peste cea a workerului gol
+MEMORY = 512 << 20
+# rezerva data workerului peste limita de timp, inainte sa fie omorat
+GRACE = 0.5
+# cat de des verifica parintele oprirea (Stop) cat asteapta un worker
+POLL = 0.05
+# rularile cu iesire pe loc trimit pasii si liniile noi o data la atatea secunde
+PROGRESS = 0.1
+# rezultatele unui lot sunt trimise parintelui grupat, o data la atatea secunde
+FLUSH = 0.02
+
+STEPS_EXCEEDED = "Limita de pasi depasita"
+TIME_EXCEEDED = "Timp depasit"
+MEMORY_EXCEEDED = "Limita de memorie depasita"
+WORKER_DIED = "Procesul de executie s-a oprit neasteptat"
+# erorile care tin de limitele rularii, nu de program (nu sunt memorate)
+LIMIT_ERRORS = (STEPS_EXCEEDED, TIME_EXCEEDED, MEMORY_EXCEEDED, WORKER_DIED)
+
+
+# ---------- WORKER ----------
+
+class LimitMeter(Meter):
+    """Meter cu limita de pasi si termen; optional raporteaza progresul."""
+    __slots__ = ("budget", "deadline", "report", "next")
+
+    def __init__(self, budget=None, deadline=None, report=None):
+        super().__init__()
+        self.budget = budget
+        self.deadline = deadline
+        self.report = report      # report(pasi), apelat cel mult o data la PROGRESS
+        self.next = time.monotonic() + PROGRESS
+
+    def tick(self, n):
+        self.steps += n
+        if self.budget is not None and self.steps > self.budget:
+            raise Exception(STEPS_EXCEEDED)
+        if self.deadline is not None or self.report is not None:
+            now = time.monotonic()
+            if self.deadline is not None and now > self.deadline:
+                raise Exception(TIME_EXCEEDED)
+            if self.report is not None and now >= self.next:
+                self.next = now + PROGRESS
+                self.report(self.steps)
+        return 0
+
+
+def limit_memory(extra):
+    """Limiteaza spatiul de adrese al procesului la cel curent plus extra."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return
+    try:
+        with open("/proc/self/statm") as f:
+            base = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        base = 0
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = base + extra
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        # ex. macOS nu accepta RLIMIT_AS; raman limitele de pasi si timp
+        pass
+
+
+def channel(inputs):
+    if isinstance(inputs, dict):
+        return KeyedInput(inputs)
+    if inputs is None:
+        return None
+    return ListInput(inputs)
+
+
+def run_one(engine, program, inputs, steps, seconds, conn=None):
+    """O rulare in worker: (output, eroare, pasi). Cu conn, iesirea si
+    CITESTE trec pe loc prin pipe (pentru SandboxEngine)."""
+    deadline = time.monotonic() + seconds if seconds is not None else None
+    if conn is None:
+        ctx = Context(channel=channel(inputs))
+        ctx.meter = LimitMeter(steps, deadline)
+    else:
+        sink = CallbackSink(lambda lines: conn.send(("out", lines)))
+
+        def report(count):
+            sink.flush()
+            conn.send(("steps", count))
+
+        def ask(var=None):
+            # iesirea de pana acum ajunge inaintea intrebarii
+            sink.flush()
+            conn.send(("input", var))
+            return conn.recv()
+
+        ctx = Context(input_provider=ask, channel=channel(inputs), output=sink)
+        ctx.meter = LimitMeter(steps, deadline, report)
+    try:
+        engine.run(program, ctx)
+        error = None
+    except MemoryError:
+        error = MEMORY_EXCEEDED
+    except Exception as e:
+        error = str(e)
+    output = [] if conn is not None else ctx.output
+    return output, error, ctx.meter.steps
+
+
+def serve(conn, memory, passes):
+    """Bucla unui worker: (sursa, intrari, pasi, secunde, pe_loc, grupare) ->
+    rezultate, trimise in grupuri o data la cel mult grupare secunde."""
+    limit_memory(memory)
+    engine = Engine("python", passes=passes, metered=True)
+    try:
+        conn.send(("ready",))
+        while True:
+            job = conn.recv()
+            if job is None:
+                return
+            source, records, steps, seconds, live, flush = job
+            try:
+                program = engine.load_source(source)
+            except MemoryError:
+                program, error = None, MEMORY_EXCEEDED
+            except Exception as e:
+                program, error = None, str(e)
+            done, last = [], time.monotonic()
+            for inputs in records:
+                if program is None:
+                    done.append(([], error, 0))
+                else:
+                    done.append(run_one(engine, program, inputs, steps, seconds, conn if live else None))
+                now = time.monotonic()
+                if now - last >= flush:
+                    conn.send(("results", done))
+                    done, last = [], now
+            if done:
+                conn.send(("results", done))
+    except (EOFError, BrokenPipeError):
+        # parintele a inchis pipe-ul (SandboxPool.close)
+        return
+
+
+# ---------- PROCES PRINCIPAL ----------
+
+def start_method():
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" not in methods:
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # workerii noi pornesc dintr-un proces care are deja kalk importat
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+class Worker:
+    __slots__ = ("process", "conn", "ready")
+
+    def __init__(self, context, memory, passes):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=serve, args=(child, memory, passes),
+                                       name="kalk-sandbox", daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def wait(self):
+        # pornirea nu se pune la socoteala limitei de timp a primei rulari
+        if not self.ready:
+            if self.conn.recv() != ("ready",):
+                raise Exception(WORKER_DIED)
+            self.ready = True
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class SandboxPool:
+    """Workeri izolati, refolositi intre rulari; sigur de folosit din mai multe fire."""
+
+    def __init__(self, workers=None, memory=MEMORY, passes=DEFAULT_PASSES):
+        self.context = start_method()
+        self.memory = memory
+        self.passes = tuple(passes)
+        self.idle = queue.SimpleQueue()
+        self.workers = set()
+        self.lock = threading.Lock()
+        self.closed = False
+        for _ in range(workers or os.cpu_count() or 1):
+            self.idle.put(self.spawn())
+
+    def spawn(self):
+        worker = Worker(self.context, self.memory, self.passes)
+        with self.lock:
+            self.workers.add(worker)
+        return worker
+
+    def replace(self, worker):
+        worker.kill()
+        with self.lock:
+            self.workers.discard(worker)
+        return self.spawn()
+
+    # -------- RULARI --------
+
+    def run(self, source, inputs=None, steps=None, seconds=None):
+        """(output, eroare) pentru o rulare cu intrarile date (dict sau lista)."""
+        return self.run_many(source, [inputs], steps, seconds)[0]
+
+    def run_many(self, source, records, steps=None, seconds=None):
+        """(output, eroare) pentru fiecare inregistrare, pe un singur worker."""
+        return [(output, error) for output, error, _ in self.execute(source, records, steps, seconds)]
+
+    def execute(self, source, records, steps=None, seconds=None, ctx=None):
+        """(output, eroare, pasi) pentru fiecare inregistrare. Cu ctx, rularea
+        (una singura) isi scrie iesirea in ctx.output pe masura ce apare,
+        citeste prin ctx.read si se opreste la ctx.meter.stop()."""
+        if self.closed:
+            raise Exception("Sandbox inchis")
+        records = list(records)
+        results = []
+        # rezultate una cate una: la o cadere se stie ce rulare a cauzat-o
+        careful = ctx is not None or len(records) == 1
+        worker = self.idle.get()
+        try:
+            while len(results) < len(records):
+                worker.wait()
+                todo = records[len(results):]
+                worker.conn.send((source, todo, steps, seconds, ctx is not None, 0 if careful else FLUSH))
+                done, error = self.collect(worker, len(todo), seconds, ctx)
+                results += done
+                if error is not None:
+                    # worker omorat sau cazut: restul inregistrarilor merg pe unul
+                    # nou; daca rezultatele veneau grupat, vinovata se afla abia
+                    # la reluarea una cate una
+                    worker = self.replace(worker)
+                    if careful:
+                        results.append(([], error, None))
+                    careful = True
+        except BaseException:
+            worker = self.replace(worker)
+            raise
+        finally:
+            self.idle.put(worker)
+        return results
+
+    def collect(self, worker, count, seconds, ctx):
+        """(rezultate, None) de la worker, sau (rezultatele de pana atunci,
+        eroare) daca a depasit timpul sau a cazut."""
+        conn = worker.conn
+        results = []
+        limit = seconds + GRACE if seconds is not None else None
+        start = time.monotonic()
+        waited = 0.0   # timp petrecut asteptand CITESTE, nu se pune la socoteala
+        while len(results) < count:
+            stopped = ctx is not None and ctx.meter is not None and ctx.meter.stopped
+            if stopped:
+                raise Stopped("Executie oprita")
+            if not conn.poll(POLL):
+                if limit is not None and time.monotonic() - start - waited > limit:
+                    return results, TIME_EXCEEDED
+                continue
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                worker.process.join(GRACE)
+                # SIGKILL fara sa-l fi omorat noi: de obicei OOM killer-ul
+                return results, MEMORY_EXCEEDED if worker.process.exitcode == -9 else WORKER_DIED
+            kind = message[0]
+            if kind == "results":
+                results += message[1]
+                start, waited = time.monotonic(), 0.0
+            elif kind == "out":
+                append = ctx.output.append
+                for line in message[1]:
+                    append(line)
+            elif kind == "steps":
+                ctx.meter.steps = message[1]
+            elif kind == "input":
+                asked = time.monotonic()
+                conn.send(ctx.read(message[1]))
+                waited += time.monotonic() - asked
+        return results, None
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            workers, self.workers = self.workers, set()
+        for worker in workers:
+            worker.close()
+        for worker in workers:
+            worker.process.join(GRACE)
+            if worker.process.is_alive():
+                worker.process.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SandboxEngine:
+    """Inlocuitor pentru Engine.run_source care ruleaza intr-un SandboxPool.
+
+    Iesirea ajunge in ctx.output pe loturi, CITESTE trece prin ctx.read, iar
+    ctx.meter (daca exista) primeste pasii si poate opri rularea.
+    """
+
+    def __init__(self, pool, steps=None, seconds=None):
+        self.pool = pool
+        self.steps = steps
+        self.seconds = seconds
+
+    def run_source(self, text, ctx):
+        if ctx.meter is None:
+            ctx.meter = Meter()
+        try:
+            (_, error, steps), = self.pool.execute(
+                text, [None], self.steps, self.seconds, ctx)
+        finally:
+            flush = getattr(ctx.output, "flush", None)
+            if flush is not None:
+                flush()
+        if steps is not None:
+            ctx.meter.steps = steps
+        if error is not None:
+            raise Exception(error)
@@ -0,0 +1,373 @@
+# kalk/service.py
+#
+# Serviciu local de executie, fara interfata grafica: JSON lines peste un
+# socket Unix (sau TCP pe localhost), o cerere pe linie, un raspuns pe linie.
+#
+#     {"id": 1, "source": "CITESTE n\nSCRIE n * n\n", "inputs": {"n": 7}}
+#     {"id": 2, "program": "fib.kalk", "inputs": {"n": 30}, "timeout": 2}
+#     {"op": "stats"}
+#
+#     -> {"id": 1, "output": ["49"], "error": null, "ms": 0.41}
+#
+# Programele sunt parsate si compilate o singura data in procesul serviciului
+# (cererile simultane pentru acelasi program asteapta aceeasi compilare),
+# iar forma compilata ajunge la workeri prin cache-ul de pe disc
+# (progcache). Cererile pentru acelasi program sosite impreuna sunt trimise
+# unui worker ca un singur lot. Limita de timp a unei cereri e impusa si in
+# worker, deci un program care nu se termina nu ocupa procesul la nesfarsit.
+#
+#     python -m kalk.service --socket /tmp/kalk.sock -j 4
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .ast_nodes import Context
+from .channels import KeyedInput
+from .engine import Engine
+from .optimizer import DEFAULT_PASSES
+from . import transpiler
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+LIBRARY_DIRS = (os.path.join(PACKAGE_DIR, "programs"), os.path.join(PACKAGE_DIR, "user_programs"))
+DEFAULT_TIMEOUT = 10.0
+# cererile pentru acelasi program sunt trimise pe loturi de cel mult atatea
+BATCH_SIZE = 64
+# programe compilate tinute minte (dupa hash-ul sursei)
+PREPARED = 1024
+# un lot pierdut cand i-a murit workerul e reluat de atatea ori
+RETRIES = 1
+# latentele ultimelor atatea cereri, pentru percentile
+LATENCY_WINDOW = 4096
+PERCENTILES = (50, 90, 99)
+
+
+# ---------- WORKER ----------
+
+class Timeout(Exception):
+    pass
+
+
+def expire(signum, frame):
+    raise Timeout("Timp depasit")
+
+
+def run_batch(source, passes, batch):
+    """Ruleaza programul pentru fiecare (intrari, termen); (output, eroare) pe rand.
+
+    Termenul (time.time()) e impus in worker cu un timer SIGALRM, deci o
+    bucla infinita nu blocheaza procesul dupa ce cererea a expirat.
+    """
+    program = transpiler.from_source(source, passes)
+    engine = Engine("python")
+    timer = hasattr(signal, "setitimer")
+    if timer:
+        signal.signal(signal.SIGALRM, expire)
+    results = []
+    for inputs, deadline in batch:
+        ctx = Context(channel=KeyedInput(inputs))
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            results.append(([], "Timp depasit"))
+            continue
+        try:
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, remaining)
+            try:
+                engine.run(program, ctx)
+            finally:
+                # oprit inainte de a scrie rezultatul: o alarma intarziata ar
+                # adauga un al doilea rezultat si ar decala restul lotului
+                if timer:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+        except Exception as e:
+            results.append((ctx.output, str(e)))
+        else:
+            results.append((ctx.output, None))
+    return results
+
+
+# ---------- SERVICIU ----------
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Service:
+    def __init__(self, workers=None, pool=None, library=LIBRARY_DIRS,
+                 timeout=DEFAULT_TIMEOUT, batch_size=BATCH_SIZE, passes=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = pool if pool is not None else self.new_pool()
+        self.library = library
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.passes = tuple(DEFAULT_PASSES if passes is None else passes)
+        self.prepared = OrderedDict()   # hash -> asyncio.Future cu compilarea
+        self.batches = {}               # hash -> [(sursa, intrari, future)]
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.active = 0                 # cereri primite si inca fara raspuns
+        self.running = 0                # loturi trimise workerilor, neterminate
+        self.counts = {"requests": 0, "errors": 0, "timeouts": 0, "parses": 0,
+                       "coalesced": 0, "batches": 0, "restarts": 0}
+
+    def new_pool(self):
+        # compilarile ruleaza in fire; un fork facut cat un fir tine un lock
+        # (ex. de import) ar lasa workerul blocat, deci workerii pornesc
+        # dintr-un proces separat, curat
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        return ProcessPoolExecutor(self.workers, mp_context=context)
+
+    def restart(self, pool):
+        """Inlocuieste executorul stricat (un worker a murit, ex. ucis de OOM);
+        apelat o singura data pentru toate loturile pierdute odata cu el."""
+        if pool is self.pool:
+            self.pool = self.new_pool()
+            self.counts["restarts"] += 1
+            # lucrarile ramase pe el au primit deja BrokenProcessPool
+            pool.shutdown(wait=False)
+
+    # -------- COMPILARE --------
+
+    def compile(self, source):
+        # ruleaza intr-un fir: scrie forma compilata in cache-ul de pe disc
+        transpiler.compile_source(source, self.passes)
+
+    async def prepare(self, source):
+        """Compileaza sursa o data; cererile simultane asteapta aceeasi compilare."""
+        key = transpiler.source_key(source)
+        future = self.prepared.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.prepared[key] = loop.run_in_executor(None, self.compile, source)
+            self.counts["parses"] += 1
+            if len(self.prepared) > PREPARED:
+                self.prepared.popitem(last=False)
+        else:
+            self.prepared.move_to_end(key)
+            self.counts["coalesced"] += 1
+        await asyncio.shield(future)
+        return key
+
+    def library_source(self, name):
+        if os.path.basename(name) != name or not name.endswith(".kalk"):
+            raise Exception(f"Nume de program invalid: {name}")
+        for directory in self.library:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                with open(path, encoding="utf-8") as f:
+                    return f.read()
+        raise Exception(f"Program necunoscut: {name}")
+
+    # -------- LOTURI --------
+
+    def enqueue(self, key, source, inputs, deadline):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.batches.get(key)
+        if batch is None:
+            batch = self.batches[key] = []
+            # cererile sosite in aceeasi iteratie a buclei intra in acelasi lot
+            loop.call_soon(self.flush, key)
+        batch.append((source, (inputs, deadline), future))
+        if len(batch) >= self.batch_size:
+            self.flush(key)
+        return future
+
+    def flush(self, key):
+        batch = self.batches.pop(key, None)
+        if not batch:
+            return
+        self.submit(batch, 0)
+
+    def submit(self, batch, attempt):
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            return
+        source = batch[0][0]
+        pool = self.pool
+        try:
+            future = pool.submit(run_batch, source, self.passes, [inputs for _, inputs, _ in batch])
+        except BrokenProcessPool:
+            self.restart(pool)
+            self.submit(batch, attempt)
+            return
+        self.running += 1
+        self.counts["batches"] += 1
+        done = asyncio.wrap_future(future)
+        done.add_done_callback(lambda f: self.deliver(batch, f, pool, attempt))
+
+    def deliver(self, batch, done, pool, attempt):
+        self.running -= 1
+        if done.cancelled():
+            error = Exception("Executie anulata")
+        else:
+            error = done.exception()
+        if isinstance(error, BrokenProcessPool):
+            # toate loturile in curs pe executorul stricat primesc eroarea, nu
+            # doar cel care a omorat workerul: sunt reluate pe unul nou, iar
+            # un lot care il omoara din nou esueaza
+            self.restart(pool)
+            if attempt < RETRIES:
+                self.submit(batch, attempt + 1)
+                return
+            error = Exception("Workerul s-a oprit neasteptat (ex. memorie insuficienta)")
+        for i, (_, _, future) in enumerate(batch):
+            if future.done():
+                # cererea a expirat intre timp
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+
+    # -------- CERERI --------
+
+    async def execute(self, request):
+        """Raspunsul (dict) pentru o cerere de rulare."""
+        start = time.perf_counter()
+        self.active += 1
+        self.counts["requests"] += 1
+        response = {"id": request.get("id")}
+        try:
+            if "source" in request:
+                source = request["source"]
+            else:
+                source = self.library_source(request.get("program", ""))
+            timeout = request.get("timeout", self.timeout)
+            inputs = request.get("inputs") or {}
+            deadline = time.time() + timeout
+
+            async def run():
+                key = await self.prepare(source)
+                return await self.enqueue(key, source, inputs, deadline)
+
+            output, error = await asyncio.wait_for(run(), timeout)
+            response["output"] = output
+            response["error"] = error
+        except asyncio.TimeoutError:
+            self.counts["timeouts"] += 1
+            response["output"] = []
+            response["error"] = f"Timp depasit ({timeout} s)"
+        except Exception as e:
+            response["output"] = []
+            response["error"] = str(e)
+        finally:
+            self.active -= 1
+        if response["error"] is not None:
+            self.counts["errors"] += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        self.latencies.append(elapsed)
+        response["ms"] = round(elapsed, 3)
+        return response
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {
+            **self.counts,
+            "active": self.active,
+            "queued": sum(len(b) for b in self.batches.values()),
+            "running_batches": self.running,
+            "latency_ms": {f"p{p}": percentile(latencies, p) for p in PERCENTILES},
+        }
+
+    async def respond(self, line, writer):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("cererea trebuie sa fie un obiect JSON")
+        except ValueError as e:
+            response = {"id": None, "output": [], "error": f"Cerere invalida: {e}"}
+        else:
+            if request.get("op") == "stats":
+                response = {"id": request.get("id"), "stats": self.stats()}
+            else:
+                response = await self.execute(request)
+        writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    async def handle(self, reader, writer):
+        # cererile unei conexiuni ruleaza concurent; raspunsurile pot veni in
+        # alta ordine, deci clientii le potrivesc dupa "id"
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                if writer.transport.get_write_buffer_size() > 1 << 20:
+                    await writer.drain()
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path=None, host="127.0.0.1", port=None):
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------- CLIENT ----------
+
+def call(path, request):
+    """Trimite o cerere unui serviciu pe socket Unix si intoarce raspunsul (sincron)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="kalk.service", description="Serviciu local de executie KALK.")
+    where = ap.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", help="calea socket-ului Unix")
+    where.add_argument("--port", type=int, help="port TCP pe 127.0.0.1")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="numarul de procese (implicit: nucleele)")
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="limita implicita per cerere, in secunde")
+    ap.add_argument("--batch", type=int, default=BATCH_SIZE, help="cereri trimise odata unui worker")
+    args = ap.parse_args(argv)
+
+    service = Service(args.jobs, timeout=args.timeout, batch_size=args.batch)
+    where = args.socket or f"127.0.0.1:{args.port}"
+    print(f"kalk.service asculta pe {where}", file=sys.stderr)
+    try:
+        asyncio.run(service.serve(args.socket, port=args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# kalk/sinks.py
+#
+# Destinatii pentru SCRIE. Toate backend-urile scriu prin ctx.output.append
+# (linia, fara "\n"), deci orice obiect cu append poate fi pus in Context;
+# lista implicita le pastreaza pe toate. Engine.run apeleaza flush() la
+# final, daca destinatia il are.
+#
+#     ctx = Context(output=StreamSink("rezultat.txt"))
+#     ctx = Context(output=RingSink(1000))          # doar ultimele 1000 de linii
+#     ctx = Context(output=CallbackSink(afiseaza))  # afiseaza(linii) pe loturi
+
+import sys
+from collections import deque
+
+BATCH = 1024
+
+
+class BufferedSink:
+    """Aduna liniile si le preda pe loturi de batch linii (la flush)."""
+
+    def __init__(self, batch=BATCH):
+        self.batch = batch
+        self.buffer = []
+        self.count = 0   # linii predate pana acum
+
+    def append(self, line):
+        buffer = self.buffer
+        buffer.append(line)
+        if len(buffer) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            lines, self.buffer = self.buffer, []
+            self.count += len(lines)
+            self.deliver(lines)
+
+    def deliver(self, lines):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamSink(BufferedSink):
+    """Scrie liniile intr-un fisier (dat prin cale) sau flux text, pe loturi."""
+
+    def __init__(self, target=None, batch=BATCH, encoding="utf-8"):
+        super().__init__(batch)
+        if isinstance(target, str):
+            self.stream = open(target, "w", encoding=encoding)
+            self.owned = True
+        else:
+            self.stream = target if target is not None else sys.stdout
+            self.owned = False
+
+    def deliver(self, lines):
+        lines.append("")
+        self.stream.write("\n".join(lines))
+
+    def flush(self):
+        super().flush()
+        self.stream.flush()
+
+    def close(self):
+        super().flush()
+        if self.owned:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class RingSink(deque):
+    """Pastreaza doar ultimele limit linii; memoria nu creste cu iesirea."""
+
+    def __init__(self, limit):
+        super().__init__(maxlen=limit)
+
+    def lines(self):
+        return list(self)
+
+    def drain(self):
+        """Scoate si intoarce liniile adunate; sigur cat timp alt fir scrie."""
+        return [self.popleft() for _ in range(len(self))]
+
+
+class CallbackSink(BufferedSink):
+    """Trimite liniile unui consumator incremental: callback(linii) pe loturi."""
+
+    def __init__(self, callback, batch=BATCH):
+        super().__init__(batch)
+        self.callback = callback
+
+    def deliver(self, lines):
+        self.callback(lines)
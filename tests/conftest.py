@@ -0,0 +1,25 @@
+# Directorul depozitului e pachetul "kalk" (importuri relative), deci
+# testele il fac importabil sub acest nume oricum s-ar numi directorul:
+# un director temporar cu legatura kalk -> depozit, pus si in PYTHONPATH
+# pentru procesele worker. Tot acolo sta si cache-ul de pe disc (progcache).
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TMP = tempfile.mkdtemp(prefix="kalk-test-")
+atexit.register(shutil.rmtree, TMP, True)
+
+if os.path.basename(ROOT) == "kalk":
+    PARENT = os.path.dirname(ROOT)
+else:
+    PARENT = TMP
+    os.symlink(ROOT, os.path.join(TMP, "kalk"))
+
+sys.path.insert(0, PARENT)
+os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, (PARENT, os.environ.get("PYTHONPATH"))))
+os.environ["KALK_CACHE_DIR"] = os.path.join(TMP, "cache")
@@ -0,0 +1,94 @@
+# Rulari de referinta pentru testele diferentiale: interpretorul pe arbore,
+# fara nicio pasa de optimizare, si un generator de programe aleatoare.
+
+import random
+
+from kalk.ast_nodes import Context
+from kalk.channels import KeyedInput
+from kalk.engine import Engine
+from kalk.lexer import tokenize
+from kalk.parser import Parser
+
+
+def parse(text):
+    return Parser(tokenize(text)).parse_program()
+
+
+def run(text, mode="tree", passes=(), inputs=None):
+    """(liniile scrise, mesajul erorii sau None)."""
+    ctx = Context(channel=KeyedInput(inputs or {}))
+    try:
+        Engine(mode, passes=passes).run(parse(text), ctx)
+    except Exception as e:
+        return list(ctx.output), str(e)
+    return list(ctx.output), None
+
+
+def reference(text, inputs=None):
+    return run(text, "tree", (), inputs)
+
+
+# ---------- PROGRAME ALEATOARE ----------
+
+VARS = ("a", "b", "c")
+OPS = ("+", "-", "*", "/", "%")
+CMPS = ("<", "<=", ">", ">=", "==", "!=")
+
+
+def random_program(seed, max_depth=3):
+    """Sursa unui program aleator, determinat de seed, cu intrarile lui.
+
+    Buclele au un contor propriu (k0, k1, ...) modificat doar la sfarsitul
+    corpului, deci se termina mereu. / si % pot imparti la zero, iar
+    inmultirea are mereu o constanta, ca numerele sa ramana mici.
+    """
+    rnd = random.Random(seed)
+    lines = []
+    inputs = {}
+    counters = iter(range(1 << 30))
+
+    def expr(depth=0):
+        if depth >= 2 or rnd.random() < 0.4:
+            return rnd.choice(VARS) if rnd.random() < 0.6 else str(rnd.randint(0, 9))
+        op = rnd.choice(OPS)
+        if op == "*":
+            return f"{expr(depth + 1)} * {rnd.randint(0, 3)}"
+        return f"{expr(depth + 1)} {op} {expr(depth + 1)}"
+
+    def cond():
+        text = f"{expr(1)} {rnd.choice(CMPS)} {expr(1)}"
+        if rnd.random() < 0.2:
+            text += f" {rnd.choice(('SI', 'SAU'))} {expr(1)} {rnd.choice(CMPS)} {expr(1)}"
+        return text
+
+    def block(indent, depth):
+        pad = "    " * indent
+        for _ in range(rnd.randint(1, 4)):
+            r = rnd.random()
+            if depth < max_depth and r < 0.2:
+                lines.append(f"{pad}DACA {cond()} ATUNCI")
+                block(indent + 1, depth + 1)
+                if rnd.random() < 0.5:
+                    lines.append(f"{pad}ALTFEL")
+                    block(indent + 1, depth + 1)
+                lines.append(f"{pad}SFARSIT")
+            elif depth < max_depth and r < 0.4:
+                k = f"k{next(counters)}"
+                lines.append(f"{pad}{k} <- 0")
+                lines.append(f"{pad}CATTIMP {k} < {rnd.randint(0, 4)} EXECUTA")
+                block(indent + 1, depth + 1)
+                lines.append(f"{pad}    {k} <- {k} + 1")
+                lines.append(f"{pad}SFARSIT")
+            elif r < 0.75:
+                lines.append(f"{pad}SCRIE {expr()}")
+            else:
+                lines.append(f"{pad}{rnd.choice(VARS)} <- {expr()}")
+
+    for var in VARS:
+        if rnd.random() < 0.3:
+            lines.append(f"CITESTE {var}")
+            inputs[var] = rnd.randint(-3, 3)
+        else:
+            lines.append(f"DECLAR {var} VALOARE {rnd.randint(0, 3)}")
+    block(0, 0)
+    return "\n".join(lines) + "\n", inputs
@@ -0,0 +1,67 @@
+# run_batch trebuie sa dea pe fiecare banda exact ce da o rulare separata
+# a programului neoptimizat cu intrarile benzii.
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from kalk.batch import run_batch
+
+from helpers import parse, random_program, reference
+
+LANES = 8
+
+
+def lane_inputs(inputs, seed):
+    rnd = random.Random(seed)
+    columns = {var: [value] + [rnd.randint(-3, 3) for _ in range(LANES - 1)]
+               for var, value in inputs.items()}
+    count = LANES if columns else 1
+    return columns, [{var: col[lane] for var, col in columns.items()} for lane in range(count)]
+
+
+@pytest.mark.parametrize("passes", [(), None], ids=["fara-pase", "pase-implicite"])
+def test_lanes_match_reference(passes):
+    for seed in range(300):
+        text, inputs = random_program(seed)
+        columns, lanes = lane_inputs(inputs, seed)
+        if passes is None:
+            result = run_batch(parse(text), columns)
+        else:
+            result = run_batch(parse(text), columns, passes)
+        assert len(result) == len(lanes)
+        for lane, values in enumerate(lanes):
+            output, error = reference(text, values)
+            assert result.outputs[lane] == output, (text, values)
+            assert (result.errors[lane] is not None) == (error is not None), (text, values)
+
+
+def test_int64_overflow_falls_back_to_python_ints():
+    text = """CITESTE n
+DECLAR x VALOARE 1
+DECLAR i VALOARE 0
+CATTIMP i < n EXECUTA
+    x <- x * 3
+    i <- i + 1
+SFARSIT
+SCRIE x
+"""
+    ns = [1, 10, 39, 40, 80]
+    result = run_batch(parse(text), {"n": ns}, ())
+    for lane, n in enumerate(ns):
+        assert result.outputs[lane] == reference(text, {"n": n})[0] == [str(3 ** n)]
+        assert result.errors[lane] is None
+
+
+def test_error_stops_only_its_lane():
+    text = """CITESTE d
+SCRIE 1
+SCRIE 12 / d
+SCRIE 2
+"""
+    result = run_batch(parse(text), {"d": [3, 0, 4]})
+    assert result.outputs == [["1", "4", "2"], ["1"], ["1", "3", "2"]]
+    assert result.errors[0] is None and result.errors[2] is None
+    assert result.errors[1] is not None
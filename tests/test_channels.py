@@ -0,0 +1,20 @@
+import io
+
+from kalk.ast_nodes import Context
+from kalk.channels import StdinInput
+from kalk.main import parse_vars
+
+WORDS = ["7", "-2", "+4", "3.5", "1e3", "--5", "+-3", "abc"]
+EXPECTED = [7, -2, 4, 3.5, 1000.0, "--5", "+-3", "abc"]
+
+
+def test_stdin_and_command_line_parse_the_same():
+    read = StdinInput(io.StringIO(" ".join(WORDS) + "\n")).reader("x")
+    assert [read() for _ in WORDS] == EXPECTED
+    assert list(parse_vars([f"v{i}={w}" for i, w in enumerate(WORDS)]).values()) == EXPECTED
+
+
+def test_stdin_values_reach_citeste():
+    ctx = Context(channel=StdinInput(io.StringIO("--5\n12\n")))
+    assert ctx.read("a") == "--5"
+    assert ctx.read("b") == 12
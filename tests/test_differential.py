@@ -0,0 +1,72 @@
+# Fiecare mod de executie si fiecare pasa de optimizare trebuie sa scrie
+# acelasi lucru ca interpretorul pe arbore neoptimizat, inclusiv liniile
+# scrise inainte de o eroare.
+
+import pytest
+
+from kalk.engine import Engine
+from kalk.optimizer import DEFAULT_PASSES
+
+from helpers import random_program, reference, run
+
+SEEDS = range(1000)
+
+
+def outcome(result):
+    # mesajul erorii poate diferi intre moduri; conteaza ca a aparut
+    output, error = result
+    return output, error is not None
+
+
+@pytest.mark.parametrize("mode", Engine.MODES)
+def test_modes_with_default_passes(mode):
+    for seed in SEEDS:
+        text, inputs = random_program(seed)
+        expected = outcome(reference(text, inputs))
+        assert outcome(run(text, mode, DEFAULT_PASSES, inputs)) == expected, text
+
+
+@pytest.mark.parametrize("name", DEFAULT_PASSES)
+def test_each_pass_alone(name):
+    for seed in SEEDS:
+        text, inputs = random_program(seed)
+        expected = outcome(reference(text, inputs))
+        assert outcome(run(text, "tree", (name,), inputs)) == expected, text
+
+
+def test_modes_without_passes():
+    for seed in SEEDS:
+        text, inputs = random_program(seed)
+        expected = outcome(reference(text, inputs))
+        for mode in Engine.MODES:
+            assert outcome(run(text, mode, (), inputs)) == expected, (mode, text)
+
+
+def deep_loops(levels):
+    # fiecare bucla ruleaza o singura data
+    lines = []
+    for level in range(levels):
+        lines.append(f"DECLAR a{level} VALOARE 1")
+        lines.append(f"CATTIMP a{level} > 0 EXECUTA")
+        lines.append(f"a{level} <- 0")
+    lines.append("SCRIE 7")
+    lines += ["SFARSIT"] * levels
+    return "\n".join(lines)
+
+
+def long_chain(terms):
+    return "SCRIE " + " + ".join("1" for _ in range(terms))
+
+
+# "tree" e recursiv prin definitie; referinta aici e walker-ul cu stiva explicita
+DEEP = [deep_loops(600), long_chain(1500)]
+DEEP_MODES = [mode for mode in Engine.MODES if mode != "tree"]
+
+
+@pytest.mark.parametrize("mode", DEEP_MODES)
+@pytest.mark.parametrize("text", DEEP, ids=["loops", "chain"])
+def test_deep_programs(mode, text):
+    expected = run(text, "stack")
+    assert expected[1] is None
+    assert run(text, mode, DEFAULT_PASSES) == expected
+    assert run(text, mode, ()) == expected
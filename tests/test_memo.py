@@ -0,0 +1,20 @@
+from kalk.ast_nodes import Context
+from kalk.channels import KeyedInput
+from kalk.engine import Engine
+from kalk.memo import ResultCache
+from kalk.optimizer import DEFAULT_PASSES
+
+TEXT = "CITESTE n\nSCRIE n * 2\n"
+
+
+def test_key_depends_on_passes():
+    assert ResultCache.key("p", (("n", 1),), ()) != ResultCache.key("p", (("n", 1),), DEFAULT_PASSES)
+
+
+def test_runs_with_other_passes_do_not_share_results():
+    memo = ResultCache()
+    for passes in ((), DEFAULT_PASSES, DEFAULT_PASSES):
+        ctx = Context(channel=KeyedInput({"n": 4}))
+        Engine("stack", passes=passes, memo=memo).run_source(TEXT, ctx)
+        assert ctx.output == ["8"]
+    assert (memo.hits, memo.misses) == (1, 2)
@@ -0,0 +1,63 @@
+import pytest
+
+from kalk.ast_nodes import Context
+from kalk.engine import Engine
+from kalk.optimizer import DEFAULT_PASSES
+
+from helpers import parse, reference, run
+
+# un invariant care da eroare (10 % d, cu d = 0) dupa un SCRIE aflat intr-un
+# DACA sau intr-o bucla interioara nu trebuie mutat inaintea buclei
+HOIST_AFTER_NESTED_OUTPUT = [
+    """DECLAR i VALOARE 0
+DECLAR d VALOARE 0
+DECLAR y VALOARE 0
+CATTIMP i < 2 EXECUTA
+    DACA i >= 0 ATUNCI
+        SCRIE 0
+    SFARSIT
+    y <- 10 % d
+    i <- i + 1
+SFARSIT
+""",
+    """DECLAR i VALOARE 0
+DECLAR j VALOARE 0
+DECLAR d VALOARE 0
+DECLAR y VALOARE 0
+CATTIMP i < 2 EXECUTA
+    j <- 0
+    CATTIMP j < 3 EXECUTA
+        SCRIE j
+        j <- j + 1
+    SFARSIT
+    y <- i + 7 / d
+    i <- i + 1
+SFARSIT
+""",
+]
+
+
+@pytest.mark.parametrize("mode", Engine.MODES)
+@pytest.mark.parametrize("text", HOIST_AFTER_NESTED_OUTPUT, ids=["daca", "bucla"])
+def test_hoisting_keeps_output_before_error(text, mode):
+    expected = reference(text, None)
+    assert expected[1] is not None
+    assert run(text, mode, DEFAULT_PASSES, None) == expected
+
+
+def test_invariant_still_hoisted_before_output():
+    # SCRIE dupa invariant: mutarea lui nu schimba ce se afiseaza
+    text = """DECLAR i VALOARE 0
+DECLAR a VALOARE 6
+DECLAR y VALOARE 0
+CATTIMP i < 3 EXECUTA
+    y <- y + a * a
+    SCRIE y
+    i <- i + 1
+SFARSIT
+"""
+    engine = Engine("tree", passes=("licm",))
+    ctx = Context()
+    engine.run(parse(text), ctx)
+    assert engine.report["licm"] > 0
+    assert (ctx.output, None) == reference(text) == (["36", "72", "108"], None)
@@ -0,0 +1,14 @@
+from kalk.runner import read_records
+
+from helpers import run
+
+PROGRAM = "CITESTE a\nCITESTE b\nSCRIE a * 2\nSCRIE b"
+
+
+def test_csv_values_parse_like_stdin(tmp_path):
+    path = tmp_path / "intrari.csv"
+    path.write_text("a,b\n-3,x\n4, 2.5\n+7,-0.5\n", encoding="utf-8")
+    records = list(read_records(str(path)))
+    assert records == [{"a": -3, "b": "x"}, {"a": 4, "b": 2.5}, {"a": 7, "b": -0.5}]
+    assert type(records[0]["a"]) is int
+    assert run(PROGRAM, inputs=records[0]) == (["-6", "x"], None)
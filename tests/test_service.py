@@ -0,0 +1,104 @@
+# Serviciul (workeri in procese separate, cereri grupate pe loturi) trebuie
+# sa raspunda fiecarei cereri cu iesirea rularii ei, ca o rulare locala.
+
+import asyncio
+import time
+
+import pytest
+
+from kalk.service import Service, run_batch
+
+from helpers import random_program, reference
+
+LOOP_FOREVER = """DECLAR i VALOARE 0
+CATTIMP i >= 0 EXECUTA
+    i <- i + 1
+SFARSIT
+"""
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = Service(workers=2, timeout=30)
+    yield service
+    service.close()
+
+
+def run_all(service, requests):
+    async def main():
+        return await asyncio.gather(*(service.execute(r) for r in requests))
+    return asyncio.run(main())
+
+
+def test_batched_requests_match_reference(service):
+    requests, expected = [], []
+    # acelasi program cu intrari diferite ajunge in acelasi lot
+    for seed in range(40):
+        text, inputs = random_program(seed)
+        for shift in range(3):
+            values = {var: value + shift for var, value in inputs.items()}
+            requests.append({"id": len(requests), "source": text, "inputs": values})
+            expected.append(reference(text, values))
+
+    responses = run_all(service, requests)
+    for request, response, (output, error) in zip(requests, responses, expected):
+        assert response["id"] == request["id"]
+        assert response["output"] == output, request
+        assert (response["error"] is not None) == (error is not None), request
+
+
+def test_timeout_does_not_affect_other_requests(service):
+    requests = [
+        {"id": 0, "source": LOOP_FOREVER, "timeout": 0.5},
+        {"id": 1, "source": "CITESTE n\nSCRIE n * n\n", "inputs": {"n": 7}},
+    ]
+    slow, fast = run_all(service, requests)
+    assert slow["output"] == [] and slow["error"].startswith("Timp depasit")
+    assert fast["output"] == ["49"] and fast["error"] is None
+
+
+def test_library_program_and_invalid_name(service):
+    good, bad = run_all(service, [
+        {"id": 0, "program": "factorial.kalk", "inputs": {"n": 5}},
+        {"id": 1, "program": "../factorial.kalk"},
+    ])
+    assert good["error"] is None and good["output"] == ["120"]
+    assert bad["output"] == [] and "invalid" in bad["error"]
+
+
+def test_run_batch_gives_one_result_per_request():
+    # intrarile lotului sunt (intrari, termen); un termen depasit sau o
+    # bucla oprita de alarma nu decaleaza rezultatele celorlalte cereri
+    now = time.time()
+    batch = [({"n": k}, now + 5) for k in range(20)]
+    batch[3] = ({"n": 3}, now - 1)
+    results = run_batch("CITESTE n\nSCRIE n * n\n", (), batch)
+    assert len(results) == len(batch)
+    assert results[3] == ([], "Timp depasit")
+    assert [out for out, _ in results[4:]] == [[str(k * k)] for k in range(4, 20)]
+
+    results = run_batch(LOOP_FOREVER, (), [({}, time.time() + 0.2), ({}, time.time() + 0.2)])
+    assert len(results) == 2
+    assert all(error == "Timp depasit" for _, error in results)
+
+
+def test_dead_worker_is_replaced():
+    service = Service(workers=1, timeout=30)
+    try:
+        async def main():
+            # prima cerere tine workerul ocupat pana il omoram
+            slow = asyncio.create_task(service.execute(
+                {"id": 0, "source": LOOP_FOREVER, "timeout": 2}))
+            await asyncio.sleep(0.5)
+            for process in list(service.pool._processes.values()):
+                process.kill()
+            first = await slow
+            after = await service.execute({"id": 1, "source": "SCRIE 6 * 7\n"})
+            return first, after
+
+        first, after = asyncio.run(main())
+        assert first["output"] == [] and first["error"] is not None
+        assert after["output"] == ["42"] and after["error"] is None
+        assert service.stats()["restarts"] == 1
+    finally:
+        service.close()
@@ -0,0 +1,41 @@
+import pytest
+
+from kalk.ast_nodes import Context
+from kalk.engine import Engine
+from kalk.meter import Meter, Stopped
+
+from helpers import parse, reference, run
+
+# nume KALK care, scrise direct in Python, s-ar contopi prin normalizarea
+# NFKC a identificatorilor sau n-ar fi identificatori valizi
+UNICODE_NAMES = [
+    "DECLAR ﬁ VALOARE 1\nDECLAR fi VALOARE 2\nSCRIE ﬁ\nSCRIE fi\n",
+    "DECLAR a² VALOARE 3\nCITESTE x\nSCRIE a² * x\n",
+    "CITESTE ﬁ\nCITESTE fi\nSCRIE ﬁ - fi\n",
+]
+
+
+@pytest.mark.parametrize("text", UNICODE_NAMES, ids=["ligatura", "exponent", "citeste"])
+def test_python_mode_keeps_variables_apart(text):
+    inputs = {"x": 2, "ﬁ": 10, "fi": 3}
+    expected = reference(text, inputs)
+    assert expected[1] is None
+    assert run(text, "python", inputs=inputs) == expected
+    assert run(text, "python", ("types", "fold", "cse", "licm"), inputs) == expected
+
+
+LOOP = "DECLAR i VALOARE 0\nCATTIMP i < 5000 EXECUTA\ni <- i + 1\nSFARSIT\nSCRIE i\n"
+
+
+def test_parsed_program_is_metered():
+    ctx = Context()
+    ctx.meter = Meter()
+    Engine("python", passes=(), metered=True).run(parse(LOOP), ctx)
+    assert ctx.output == ["5000"]
+    assert ctx.meter.steps > 0
+
+    ctx = Context()
+    ctx.meter = Meter()
+    ctx.meter.stop()
+    with pytest.raises(Stopped):
+        Engine("python", passes=(), metered=True).run(parse(LOOP), ctx)
@@ -0,0 +1,46 @@
+import time
+
+from kalk.resolver import resolve
+from kalk import typecheck
+
+from helpers import parse
+
+
+def nested_loops(levels):
+    lines = []
+    for k in range(levels):
+        lines.append(f"v{k} <- v{k} + 1")
+        lines.append(f"CATTIMP v{k} < 3 EXECUTA")
+    lines.append("SCRIE 1")
+    lines += ["SFARSIT"] * levels
+    return "\n".join(lines) + "\n"
+
+
+def test_nested_loops_are_linear():
+    # fiecare bucla isi calculeaza punctul fix o data; inainte, 20 de niveluri
+    # cereau zeci de secunde
+    program = resolve(parse(nested_loops(40)))
+    start = time.perf_counter()
+    report = typecheck.check(program)
+    assert time.perf_counter() - start < 1.0
+    assert report.errors == [] and report.analyzed
+    assert report.int_vars() == sorted(f"v{k}" for k in range(40))
+
+
+def test_loop_types_reach_fixpoint_through_inner_loop():
+    text = """CITESTE r : REAL
+DECLAR x VALOARE 1
+DECLAR y VALOARE 1
+DECLAR i VALOARE 0
+CATTIMP i < 3 EXECUTA
+    CATTIMP y < 3 EXECUTA
+        y <- x + 1
+    SFARSIT
+    x <- r
+    i <- i + 1
+SFARSIT
+"""
+    report = typecheck.check(resolve(parse(text)))
+    assert report.types["x"] == frozenset((int, float))
+    assert report.types["y"] == frozenset((int, float))
+    assert report.int_vars() == ["i"]
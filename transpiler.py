@@ -0,0 +1,298 @@
+# kalk/transpiler.py
+#
+# Traduce un program rezolvat in cod sursa Python: variabilele devin
+# locale, CATTIMP devine while, DACA/ALTFEL devine if/else. Functia e
+# compilata o singura data cu compile() si rulata direct de CPython.
+
+import time
+from collections import OrderedDict
+
+from .ast_nodes import *
+from .induction import InductionLoop
+from .lexer import tokenize
+from .parser import Parser
+from .optimizer import bodies, optimize
+from .resolver import resolve
+from . import progcache
+
+# CPython accepta cel mult 20 de blocuri imbricate static; functia si
+# try/finally ocupa doua
+MAX_NESTING = 16
+# peste aceasta adancime compilatorul CPython poate depasi stiva
+MAX_DEPTH = 200
+
+CACHE_SIZE = 256
+
+# varianta masurata: contorul local e predat lui ctx.meter.tick dupa atatia pasi
+QUANTUM = 1024
+
+PY_OPS = {"/": "//", "SI": "and", "SAU": "or"}
+
+PREC = {
+    "SAU": 1, "SI": 2,
+    "==": 3, "!=": 3, "<": 3, "<=": 3, ">": 3, ">=": 3,
+    "+": 4, "-": 4,
+    "*": 5, "/": 5, "%": 5,
+}
+
+
+class PyProgram:
+    __slots__ = ("symbols", "source", "code", "loops", "fn")
+
+    def __init__(self, symbols, source, code, loops=()):
+        self.symbols = symbols   # numele variabilelor, in ordinea sloturilor
+        self.source = source     # codul Python generat
+        self.code = code
+        self.loops = loops       # InductionLoop-urile apelate din cod
+        namespace = {}
+        exec(code, {"_coerce": coerce, "_fmt": format_value, "_loops": [l.jump for l in loops],
+                    "_clock": time.perf_counter}, namespace)
+        self.fn = namespace["kalk_main"]
+
+    def run(self, ctx):
+        self.fn(ctx)
+
+
+class Probes:
+    """Instructiunile unui program in ordinea in care sunt emise, cu linia din
+    codul Python generat pe care incepe fiecare (pentru profiler.py).
+
+    kalk_main primeste listele _N si _T, indexate ca instrs. Cu timed, codul
+    numara executarile si cronometreaza fiecare instructiune; altfel numara
+    doar intrarile in fiecare bloc, in _N[prima instructiune a blocului].
+    """
+
+    def __init__(self, timed=False):
+        self.timed = timed
+        self.instrs = []
+        self.starts = []
+        self.firsts = []   # pentru fiecare instructiune: prima din blocul ei
+
+    def add(self, instr, start, first=None):
+        k = len(self.instrs)
+        self.instrs.append(instr)
+        self.starts.append(start)
+        self.firsts.append(k if first is None else first)
+        return k
+
+
+def supported(program):
+    """Verifica limitele lui CPython pentru imbricare si adancimea expresiilor."""
+    stack = [(program.body, 0)]
+    while stack:
+        body, level = stack.pop()
+        for instr in body:
+            if isinstance(instr, IfInstr):
+                if level >= MAX_NESTING or instr.cond.depth > MAX_DEPTH:
+                    return False
+                stack.append((instr.then_body, level + 1))
+                stack.append((instr.else_body, level + 1))
+            elif isinstance(instr, WhileInstr):
+                # forma inchisa pune bucla de rezerva intr-un else
+                extra = isinstance(instr, InductionLoop)
+                if level + extra >= MAX_NESTING or instr.cond.depth > MAX_DEPTH:
+                    return False
+                stack.append((instr.body, level + 1 + extra))
+            elif instr.depth > MAX_DEPTH:
+                return False
+    return True
+
+
+def to_python(program, loops=None, metered=False, probes=None):
+    """Codul sursa Python pentru un resolver.Program.
+
+    Buclele InductionLoop sunt adaugate in loops (daca e dat) si apelate
+    prin _loops[k]; altfel sunt traduse ca bucle obisnuite. Cu metered,
+    fiecare iteratie aduna lungimea corpului intr-un contor local, predat
+    lui ctx.meter (meter.Meter) o data la QUANTUM pasi. Cu probes
+    (Probes), instructiunile sunt inregistrate pe masura ce sunt emise.
+    """
+    names = [local(slot) for slot in range(len(program.symbols))]
+    header = "def kalk_main(ctx, _N, _T):" if probes is not None else "def kalk_main(ctx):"
+    lines = [header, "    _out = ctx.output.append"]
+    if metered:
+        lines.append("    _tick = ctx.meter.tick")
+        lines.append("    _n = 0")
+
+    if names:
+        count = len(names)
+        unpack = ", ".join(names) + ","
+        lines.append("    _s = ctx.slots")
+        lines.append(f"    {unpack} = _s[:{count}]")
+        # cititorii pentru CITESTE, legati o data: o citire e un singur apel
+        read = sorted({(i.slot, i.var) for b in bodies(program.body) for i in b if isinstance(i, InputInstr)})
+        for slot, name in read:
+            lines.append(f"    {reader(slot)} = ctx.reader({name!r})")
+        lines.append("    try:")
+        emit_body(program.body, 2, lines, loops, (unpack, count), metered, probes)
+        lines.append("    finally:")
+        lines.append(f"        _s[:{count}] = {unpack}")
+        if metered:
+            lines.append("        ctx.meter.steps += _n")
+    elif metered:
+        lines.append("    try:")
+        emit_body(program.body, 2, lines, metered=True, probes=probes)
+        lines.append("    finally:")
+        lines.append("        ctx.meter.steps += _n")
+    else:
+        emit_body(program.body, 1, lines, probes=probes)
+
+    return "\n".join(lines) + "\n"
+
+
+# numele Python vin din slot, nu din numele KALK: Python normalizeaza
+# identificatorii (NFKC), deci "ﬁ" si "fi" ar deveni aceeasi variabila, iar
+# un nume ca "a²" nici nu e un identificator valid
+def local(slot):
+    return f"k_{slot}"
+
+
+def reader(slot):
+    return f"_in_{slot}"
+
+
+def emit_body(body, level, lines, loops=None, sync=None, metered=False, probes=None):
+    pad = "    " * level
+    if not body:
+        lines.append(pad + "pass")
+        return
+
+    timed = probes is not None and probes.timed
+    first = None
+    for instr in body:
+        if timed:
+            # un cronometru per nivel: instructiunile imbricate nu il suprascriu
+            lines.append(f"{pad}_t{level} = _clock()")
+        if probes is not None:
+            k = probes.add(instr, len(lines) + 1, first)
+            if timed or first is None:
+                lines.append(f"{pad}_N[{k}] += 1")
+            if first is None:
+                first = k
+
+        if isinstance(instr, InputInstr):
+            value = f"{reader(instr.slot)}()"
+            if instr.kind:
+                value = f"_coerce({value}, {instr.kind!r}, {instr.var!r})"
+            lines.append(f"{pad}{local(instr.slot)} = {value}")
+        elif isinstance(instr, (DeclInstr, AssignInstr)):
+            lines.append(f"{pad}{local(instr.slot)} = {expr_source(instr.expr)}")
+        elif isinstance(instr, OutputInstr):
+            lines.append(f"{pad}_out(_fmt({expr_source(instr.expr)}))")
+        elif isinstance(instr, IfInstr):
+            lines.append(f"{pad}if {expr_source(instr.cond)}:")
+            emit_body(instr.then_body, level + 1, lines, loops, sync, metered, probes)
+            if instr.else_body:
+                lines.append(f"{pad}else:")
+                emit_body(instr.else_body, level + 1, lines, loops, sync, metered, probes)
+        elif isinstance(instr, InductionLoop) and loops is not None and sync:
+            # forma inchisa lucreaza pe sloturi: locale -> sloturi -> locale
+            unpack, count = sync
+            lines.append(f"{pad}_s[:{count}] = {unpack}")
+            lines.append(f"{pad}if _loops[{len(loops)}](ctx):")
+            lines.append(f"{pad}    {unpack} = _s[:{count}]")
+            lines.append(f"{pad}else:")
+            loops.append(instr)
+            emit_loop(instr, level + 1, lines, loops, sync, metered, probes)
+        elif isinstance(instr, WhileInstr):
+            emit_loop(instr, level, lines, loops, sync, metered, probes)
+        else:
+            raise Exception(f"Instructiune necunoscuta: {instr}")
+
+        if timed:
+            lines.append(f"{pad}_T[{k}] += _clock() - _t{level}")
+
+
+def emit_loop(loop, level, lines, loops=None, sync=None, metered=False, probes=None):
+    pad = "    " * level
+    lines.append(f"{pad}while {expr_source(loop.cond)}:")
+    if metered:
+        # un pas pentru conditie si cate unul pentru fiecare instructiune din corp
+        lines.append(f"{pad}    if (_n := _n + {len(loop.body) + 1}) > {QUANTUM}:")
+        lines.append(f"{pad}        _n = _tick(_n)")
+    emit_body(loop.body, level + 1, lines, loops, sync, metered, probes)
+
+
+def expr_source(node):
+    if isinstance(node, Number):
+        return repr(node.value) if node.value >= 0 else f"({node.value!r})"
+    if isinstance(node, Variable):
+        return local(node.slot)
+
+    prec = PREC[node.op]
+    left = expr_source(node.left)
+    right = expr_source(node.right)
+    # operatorii sunt asociativi la stanga, ca in Python
+    if PREC.get(getattr(node.left, "op", None), 9) < prec:
+        left = f"({left})"
+    if PREC.get(getattr(node.right, "op", None), 9) <= prec:
+        right = f"({right})"
+    return f"{left} {PY_OPS.get(node.op, node.op)} {right}"
+
+
+def compile_program(program, metered=False, probes=None):
+    """PyProgram pentru un resolver.Program, sau None daca depaseste limitele."""
+    if not supported(program):
+        return None
+    loops = []
+    source = to_python(program, loops, metered, probes)
+    code = compile(source, "<kalk>", "exec")
+    return PyProgram(list(program.symbols), source, code, loops)
+
+
+# ---------- CACHE DUPA SURSA ----------
+
+_cache = OrderedDict()
+
+
+def source_key(text):
+    import hashlib
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compile_source(text, passes=()):
+    """(resolver.Program, PyProgram sau None) pentru sursa, prin cache-ul de pe
+    disc. Nu atinge cache-ul din memorie, deci poate rula dintr-un fir de
+    fundal (ex. precompilarea din library.py)."""
+    disk = progcache.default_cache()
+    entry = disk.get(text, passes) if disk is not None else None
+    if entry is not None and entry.python is not None:
+        source, code, loops = entry.python
+        return entry.program, PyProgram(list(entry.program.symbols), source, code, loops)
+
+    if entry is not None:
+        # salvat de alt mod de executie, fara codul Python
+        program = entry.program
+    else:
+        program = resolve(Parser(tokenize(text)).parse_program())
+        if passes:
+            optimize(program, passes)
+    prog = compile_program(program)
+    if disk is not None:
+        python = (prog.source, prog.code, prog.loops) if prog is not None else None
+        disk.put(text, passes, program, python)
+    return program, prog
+
+
+def from_source(text, passes=(), metered=False):
+    """PyProgram pentru textul unui program KALK; sare peste lexer/parser la a doua
+    rulare (si intre procese, prin cache-ul de pe disc din progcache).
+
+    Varianta metered (numara pasii in ctx.meter) e compilata doar in memorie.
+    """
+    key = (source_key(text), tuple(passes), metered)
+    prog = _cache.get(key)
+    if prog is not None:
+        _cache.move_to_end(key)
+        return prog
+
+    program, prog = compile_source(text, passes)
+    if metered:
+        prog = compile_program(program, metered=True)
+    if prog is None:
+        # nu incape in limitele CPython: pastram programul rezolvat
+        prog = program
+    _cache[key] = prog
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return prog
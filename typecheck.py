@@ -0,0 +1,297 @@
+# kalk/typecheck.py
+#
+# Inferenta de tipuri sensibila la flux peste un resolver.Program. Tipul
+# unei variabile intr-un punct e multimea tipurilor Python posibile acolo
+# (int, float, str). Valorile intra doar prin CITESTE: fara tip declarat
+# pot fi orice, cu "CITESTE n : INTREG" sunt int (conversia de la citire e
+# singura garda). O operatie imposibila pentru toate combinatiile de tipuri
+# e o eroare raportata inainte de executie; una imposibila doar pentru
+# unele e un avertisment.
+
+from .ast_nodes import *
+
+# analiza e recursiva pe blocuri si expresii; peste aceste limite programul
+# e lasat nespecializat
+MAX_NESTING = 64
+MAX_DEPTH = 200
+
+INT = frozenset((int,))
+ANY = frozenset((int, float, str))
+NOTHING = frozenset()
+
+KIND_TYPES = {"INTREG": INT, "REAL": frozenset((float,)), "TEXT": frozenset((str,))}
+TYPE_NAMES = {int: "INTREG", float: "REAL", str: "TEXT"}
+
+
+class TypeReport:
+    __slots__ = ("errors", "warnings", "types", "analyzed")
+
+    def __init__(self):
+        self.errors = []     # operatii care esueaza sigur
+        self.warnings = []   # operatii care pot esua, dupa valorile citite
+        self.types = {}      # variabila -> tipurile posibile oriunde in program
+        self.analyzed = True
+
+    def int_vars(self):
+        """Variabilele dovedite int in tot programul."""
+        return sorted(name for name, types in self.types.items() if types <= INT)
+
+
+def type_names(types):
+    return "|".join(TYPE_NAMES[t] for t in (int, float, str) if t in types) or "-"
+
+
+def binary_result(op, a, b):
+    """Tipul rezultatului pentru operanzi de tip a si b, sau None daca esueaza."""
+    if op == "+" and a is str and b is str:
+        return str
+    if op == "*" and {a, b} == {int, str}:
+        return str
+    if op == "%" and a is str:
+        # formatare printf; nu o putem verifica static
+        return str
+    if a is not str and b is not str:
+        return int if a is int and b is int else float
+    return None
+
+
+def compare_ok(op, a, b):
+    if op in ("==", "!="):
+        return True
+    return (a is str) == (b is str)
+
+
+def nesting(body):
+    deepest = 0
+    stack = [(body, 1)]
+    while stack:
+        b, level = stack.pop()
+        deepest = max(deepest, level)
+        for instr in b:
+            if isinstance(instr, IfInstr):
+                stack += [(instr.then_body, level + 1), (instr.else_body, level + 1)]
+            elif isinstance(instr, WhileInstr):
+                stack.append((instr.body, level + 1))
+    return deepest
+
+
+class Inference:
+    """Un parcurs al programului; cu report=None doar calculeaza tipurile."""
+
+    def __init__(self, symbols, report=None, rewrite=False, fixed=None):
+        self.symbols = symbols
+        self.report = report
+        self.rewrite = rewrite
+        self.rewritten = 0
+        # bucla -> (tipurile la intrare, punctul fix), comun tuturor parcursurilor
+        self.fixed = {} if fixed is None else fixed
+
+    def join(self, a, b):
+        return {slot: a[slot] | b[slot] for slot in a}
+
+    def problem(self, node, a, b, failed, total):
+        msg = f"{type_names(a)} {node.op} {type_names(b)}"
+        if failed == total:
+            self.report.errors.append(f"Eroare de tip: {msg}")
+        else:
+            self.report.warnings.append(f"Posibila eroare de tip: {msg}")
+
+    # -------- EXPRESII --------
+    def expr(self, node, env, quiet=False):
+        if isinstance(node, Number):
+            return frozenset((type(node.value),))
+        if isinstance(node, Variable):
+            return env[node.slot]
+        if node.depth > MAX_DEPTH:
+            return ANY
+
+        a = self.expr(node.left, env, quiet)
+        b = self.expr(node.right, env, quiet)
+        if isinstance(node, LogicalCond):
+            return INT
+
+        results, failed = set(), 0
+        for x in a:
+            for y in b:
+                if isinstance(node, CompareCond):
+                    ok = compare_ok(node.op, x, y)
+                    result = int
+                else:
+                    result = binary_result(node.op, x, y)
+                    ok = result is not None
+                if ok:
+                    results.add(result)
+                else:
+                    failed += 1
+        if failed and not quiet and self.report is not None:
+            self.problem(node, a, b, failed, len(a) * len(b))
+        return frozenset(results)
+
+    def check(self, instr, attr, env):
+        node = getattr(instr, attr)
+        types = self.expr(node, env)
+        if self.rewrite:
+            new = self.specialize(node, env)
+            if new is not node:
+                setattr(instr, attr, new)
+                if attr == "expr":
+                    instr.depth = new.depth
+        return types
+
+    # -------- INSTRUCTIUNI --------
+    def body(self, body, env):
+        for instr in body:
+            if isinstance(instr, InputInstr):
+                env[instr.slot] = KIND_TYPES.get(instr.kind, ANY)
+            elif isinstance(instr, (DeclInstr, AssignInstr)):
+                env[instr.slot] = self.check(instr, "expr", env)
+            elif isinstance(instr, OutputInstr):
+                self.check(instr, "expr", env)
+            elif isinstance(instr, IfInstr):
+                self.check(instr, "cond", env)
+                then_env = self.body(instr.then_body, dict(env))
+                else_env = self.body(instr.else_body, dict(env))
+                env = self.join(then_env, else_env)
+            elif isinstance(instr, WhileInstr):
+                env = self.loop(instr, env)
+            if self.report is not None:
+                for slot, types in env.items():
+                    seen = self.report.types.get(self.symbols[slot], NOTHING)
+                    self.report.types[self.symbols[slot]] = seen | types
+        return env
+
+    def loop(self, loop, env):
+        env = self.fixpoint(loop, env)
+        if self.report is not None or self.rewrite:
+            # parcursul final, pe tipurile stabile; buclele interioare isi
+            # gasesc punctul fix deja calculat
+            self.check(loop, "cond", env)
+            self.body(loop.body, dict(env))
+        return env
+
+    def fixpoint(self, loop, env):
+        """Tipurile stabile la intrarea in corpul buclei, pornind de la env.
+
+        Parcursul fara raportare al corpului ar recalcula punctul fix al
+        fiecarei bucle interioare la fiecare iteratie, deci costul ar creste
+        exponential cu imbricarea. Punctul fix ramane tinut per bucla: aceleasi
+        tipuri la intrare nu mai parcurg corpul, iar tipuri mai largi pornesc
+        de la punctul fix anterior (care e sub cel nou).
+        """
+        start = dict(env)
+        cached = self.fixed.get(loop)
+        if cached is not None:
+            entry, result = cached
+            if entry == env:
+                # body() modifica env pe loc: punctul fix tinut nu e dat mai departe
+                return dict(result)
+            if all(entry[slot] <= env[slot] for slot in env):
+                env = self.join(env, result)
+        silent = Inference(self.symbols, fixed=self.fixed)
+        while True:
+            after = silent.body(loop.body, dict(env))
+            joined = self.join(env, after)
+            if joined == env:
+                break
+            env = joined
+        self.fixed[loop] = (start, dict(env))
+        return env
+
+    # -------- SPECIALIZARE --------
+    def specialize(self, node, env):
+        """Simplificari valabile doar pentru int (x * 0, x - x, x % 1, x == x ...)."""
+        if isinstance(node, (Number, Variable)) or node.depth > MAX_DEPTH:
+            return node
+        left = self.specialize(node.left, env)
+        right = self.specialize(node.right, env)
+        if left is not node.left or right is not node.right:
+            node = NODES[node.op](node.op, left, right)
+        if isinstance(node, LogicalCond):
+            return node
+        if not (self.expr(left, env, True) <= INT and self.expr(right, env, True) <= INT):
+            return node
+
+        new = int_identity(node)
+        if new is not node:
+            self.rewritten += 1
+        return new
+
+
+def pure(node):
+    # se evalueaza fara exceptii (fara / si %)
+    if isinstance(node, (Number, Variable)):
+        return True
+    return node.op not in ("/", "%") and pure(node.left) and pure(node.right)
+
+
+def same(a, b):
+    if isinstance(a, Number) and isinstance(b, Number):
+        return a.value == b.value
+    if isinstance(a, Variable) and isinstance(b, Variable):
+        return a.name == b.name
+    if isinstance(a, (Number, Variable)) or isinstance(b, (Number, Variable)):
+        return False
+    return a.op == b.op and same(a.left, b.left) and same(a.right, b.right)
+
+
+def const(node, value):
+    return isinstance(node, Number) and node.value == value
+
+
+def int_identity(node):
+    op, left, right = node.op, node.left, node.right
+    if isinstance(node, CompareCond):
+        if same(left, right) and pure(left):
+            return Number(int(op in ("==", "<=", ">=")))
+        return node
+    if op == "+":
+        if const(right, 0):
+            return left
+        if const(left, 0):
+            return right
+    elif op == "-":
+        if const(right, 0):
+            return left
+        if same(left, right) and pure(left):
+            return Number(0)
+    elif op == "*":
+        if const(right, 1):
+            return left
+        if const(left, 1):
+            return right
+        if (const(right, 0) and pure(left)) or (const(left, 0) and pure(right)):
+            return Number(0)
+    elif op == "/":
+        if const(right, 1):
+            return left
+    elif op == "%":
+        if const(right, 1) and pure(left):
+            return Number(0)
+    return node
+
+
+def check(program):
+    """TypeReport pentru un resolver.Program, fara sa-l modifice."""
+    report = TypeReport()
+    if nesting(program.body) > MAX_NESTING:
+        report.analyzed = False
+        return report
+    env = {slot: INT for slot in range(len(program.symbols))}
+    Inference(program.symbols, report).body(program.body, env)
+    return report
+
+
+def specialize_types(program):
+    """Pasa de optimizare: raporteaza erorile de tip si aplica simplificarile int.
+
+    Intoarce numarul de noduri simplificate.
+    """
+    report = TypeReport()
+    if nesting(program.body) > MAX_NESTING:
+        return 0
+    env = {slot: INT for slot in range(len(program.symbols))}
+    inference = Inference(program.symbols, report, rewrite=True)
+    inference.body(program.body, env)
+    if report.errors:
+        raise Exception("\n".join(report.errors))
+    return inference.rewritten